@@ -0,0 +1,197 @@
+"""Compare the codec engines: the reflective annotation walk, the precompiled codec plans and the generated
+functions.
+
+Usage:
+    python benchmarks/bench_codec_plans.py [-n REPEAT] [PATH ...]
+
+Each PATH may be an MBIN file or a directory which will be searched recursively for MBIN files (such as an
+unpacked PCBANKS folder). Any file whose header namehash isn't a known struct is skipped.
+If no paths are provided a synthetic instance of a few common structs and a synthetic scene are used instead.
+"""
+
+import argparse
+import os
+import os.path as op
+import sys
+import time
+from io import BytesIO
+
+sys.path.insert(0, op.join(op.dirname(op.dirname(op.abspath(__file__))), "src", "addon", "nmsdk"))
+
+from serialization.cereal_bin import structdata  # noqa: E402
+from serialization.NMS_Structures import MBINHeader  # noqa: E402
+from serialization.NMS_Structures.Structures import (  # noqa: E402
+    STRUCT_MAPPING,
+    TkAnimationAction,
+    TkAnimationData,
+    TkAnimationGameData,
+    TkAnimationMask,
+    TkMaterialData,
+    TkMaterialFlags,
+    TkMaterialSampler,
+    TkMaterialUniform_Float,
+    TkResourceDescriptorData,
+    TkSceneNodeData,
+)
+from synthetic import synthetic_scene  # noqa: E402
+
+
+def synthetic_structs() -> list:
+    """ A single instance of some commonly used structs. """
+    return [
+        synthetic_scene(0),
+        TkMaterialData(
+            Flags=[TkMaterialFlags(i) for i in range(4)],
+            FxFlags=[],
+            Link="",
+            Metamaterial="",
+            Name="TESTMAT",
+            Samplers=[
+                TkMaterialSampler("", f"TEXTURES/{i}.DDS", "gDiffuseMap", 0, 1, 2, False, True, True, True)
+                for i in range(3)
+            ],
+            Shader="SHADERS/UBERSHADER.SHADER.BIN",
+            Uniforms_Float=[
+                TkMaterialUniform_Float((1.0, 2.0, 3.0, 4.0), [], f"gUniform{i}Vec4") for i in range(4)
+            ],
+            Uniforms_UInt=[],
+            ShaderMillDataHash=0,
+            TransparencyLayerID=-1,
+            Class="Opaque",
+            CastShadow=True,
+            CreateFur=False,
+            DisableZTest=False,
+            EnableLodFade=True,
+        ),
+        TkAnimationData(
+            Mask="",
+            Actions=[TkAnimationAction(f"ACTION{i}", 10.0, 0.0) for i in range(3)],
+            AdditionalMasks=[TkAnimationMask("UPPERBODY", 1)],
+            AdditiveBaseAnim="",
+            Anim="IDLE",
+            ExtraStartNodes=["Root"],
+            Filename="MODELS/TEST/ANIMS/IDLE.ANIM.MBIN",
+            Notifies=[],
+            GameData=TkAnimationGameData(0, False, 0),
+            ActionFrame=-1.0,
+            ActionStartFrame=0.0,
+            AdditiveBaseFrame=0.0,
+            AnimType=1,
+            CreatureSize=0,
+            Delay=0.0,
+            FrameEnd=0,
+            FrameEndGame=0,
+            FrameStart=0,
+            OffsetMax=0.0,
+            OffsetMin=0.0,
+            Priority=0,
+            Speed=1.0,
+            StartNode="",
+            Active=True,
+            Additive=False,
+            AnimGroupOverride=False,
+            Has30HzFrames=False,
+            Mirrored=False,
+        ),
+        TkResourceDescriptorData(
+            Id="_TEST_A",
+            Children=[],
+            ReferencePaths=["MODELS/TEST/PARTS/PART_A.SCENE.MBIN"],
+            Chance=0.0,
+            Name="_Test_A",
+        ),
+    ]
+
+
+def iter_files(paths: list[str]):
+    for path in paths:
+        if op.isdir(path):
+            for root, _, files in os.walk(path):
+                for fname in files:
+                    if ".MBIN" in fname.upper():
+                        yield op.join(root, fname)
+        else:
+            yield path
+
+
+def load(path: str):
+    """ Return the struct type and the raw body of an MBIN file, or None if the struct isn't known. """
+    with open(path, "rb") as f:
+        data = f.read()
+    buf = BytesIO(data)
+    header = MBINHeader.read(buf)
+    if header.header_namehash not in STRUCT_MAPPING:
+        return None
+    return STRUCT_MAPPING[header.header_namehash], data[0x20:]
+
+
+def best_of(func, repeat: int, number: int) -> float:
+    """ The best time of ``repeat`` runs of ``number`` calls of ``func``, per call. """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append(time.perf_counter() - start)
+    return min(times) / number
+
+
+def bench(cls, body: bytes, repeat: int, number: int = 1) -> dict:
+    results = {}
+    for engine in structdata.CODEC_ENGINES:
+        structdata.CODEC_ENGINE = engine
+        obj = cls.read(BytesIO(body))
+        results[engine] = (
+            best_of(lambda: cls.read(BytesIO(body)), repeat, number),
+            # The walk has no in-memory reader and uses the plans instead.
+            best_of(lambda: cls.from_buffer(body), repeat, number),
+            best_of(obj.write, repeat, number),
+            obj.write().getvalue(),
+        )
+    structdata.CODEC_ENGINE = "plan"
+    for engine, result in results.items():
+        if result[3] != results["walk"][3]:
+            raise ValueError(f"The {engine} output for {cls.__name__} differs from the reflective walk")
+    return results
+
+
+def report(name: str, size: int, results: dict):
+    """ Print the times of each engine along with the speedup relative to the codec plans. """
+    print(f"{name} ({size:,d} bytes)")
+    plan = results["plan"]
+    for engine, result in results.items():
+        times = "  ".join(
+            f"{op} {t * 1e6:10.1f}us ({p / t:4.1f}x)"
+            for op, t, p in zip(("read", "from_buffer", "write"), result[:3], plan[:3])
+        )
+        print(f"    {engine:<8} {times}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("paths", nargs="*")
+    parser.add_argument("-n", "--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if not args.paths:
+        for obj in synthetic_structs():
+            body = obj.write().getvalue()
+            name = f"synthetic {type(obj).__name__}"
+            report(name, len(body), bench(type(obj), body, args.repeat, number=1000))
+        body = synthetic_scene(7).write().getvalue()
+        report("synthetic TkSceneNodeData tree", len(body), bench(TkSceneNodeData, body, args.repeat))
+        return
+
+    for path in iter_files(args.paths):
+        loaded = load(path)
+        if loaded is None:
+            print(f"Skipping {path}: unknown struct")
+            continue
+        cls, body = loaded
+        report(op.basename(path), len(body), bench(cls, body, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
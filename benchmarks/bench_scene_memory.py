@@ -0,0 +1,116 @@
+"""Measure the memory used by loading a large scene tree.
+
+Usage:
+    python benchmarks/bench_scene_memory.py [-d DEPTH] [PATH]
+
+PATH is a SCENE.MBIN file. If it isn't provided a synthetic scene is written to a temporary file, where every
+node has 3 children down to the given depth (the default of 10 gives 88,573 nodes).
+The scene is loaded in a fresh process so that the numbers only include the interpreter, the serialization
+code and the scene itself. The resident set size is reported before and after loading the scene along with
+the peak. Run this against different revisions to compare them.
+"""
+
+import argparse
+import gc
+import os
+import os.path as op
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, op.join(op.dirname(op.dirname(op.abspath(__file__))), "src", "addon", "nmsdk"))
+
+from serialization.NMS_Structures import MBINHeader  # noqa: E402
+from serialization.NMS_Structures.Structures import (  # noqa: E402
+    NAMEHASH_MAPPING,
+    TkSceneNodeData,
+)
+from synthetic import synthetic_scene  # noqa: E402
+
+
+def rss() -> int:
+    """ The current resident set size in bytes, or 0 if it can't be determined. """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return 0
+
+
+def peak_rss() -> int:
+    """ The peak resident set size in bytes, or 0 if it can't be determined. """
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset
+        except (ImportError, AttributeError):
+            return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports the size in KiB, macOS in bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def count_nodes(node: TkSceneNodeData) -> int:
+    return 1 + sum(count_nodes(child) for child in node.Children)
+
+
+def measure(path: str):
+    """ Load the scene and report the memory used. """
+    gc.collect()
+    before = rss()
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        f.seek(0x20)
+        scene = TkSceneNodeData.read(f)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    after = rss()
+    nodes = count_nodes(scene)
+    mib = 1024 * 1024
+    print(f"Loaded {nodes:,d} nodes in {elapsed:.2f}s")
+    print(f"RSS before: {before / mib:8.1f} MiB")
+    print(f"RSS after:  {after / mib:8.1f} MiB ({(after - before) / nodes:.0f} bytes per node)")
+    print(f"Peak RSS:   {peak_rss() / mib:8.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("path", nargs="?")
+    parser.add_argument("-d", "--depth", type=int, default=10)
+    parser.add_argument("--generate", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--measure", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.generate:
+        with open(args.path, "wb") as f:
+            MBINHeader(header_namehash=NAMEHASH_MAPPING["TkSceneNodeData"]).write(f)
+            synthetic_scene(args.depth).write(f)
+        return
+    if args.measure:
+        measure(args.path)
+        return
+
+    # Both generating and measuring are done in their own process, as the peak RSS of a process starts off as
+    # the RSS of its parent.
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = args.path
+        if path is None:
+            path = op.join(tmpdir, "SYNTHETIC.SCENE.MBIN")
+            cmd = [sys.executable, __file__, "--generate", "-d", str(args.depth), path]
+            subprocess.run(cmd, check=True)
+            print(f"Wrote synthetic scene of {op.getsize(path):,d} bytes")
+        subprocess.run([sys.executable, __file__, "--measure", path], check=True)
+
+
+if __name__ == "__main__":
+    main()
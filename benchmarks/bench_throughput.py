@@ -0,0 +1,245 @@
+"""Measure the read and write throughput of the serialization code on synthetic MBINs.
+
+Usage:
+    python benchmarks/bench_throughput.py [-s SCALE] [-n REPEAT] [-o OUTPUT] [-c BASELINE] [CASE ...]
+
+The cases are:
+    scene       A TkSceneNodeData tree where every node has 3 children.
+    geometry    A TkGeometryData with a large index buffer and bounded hull.
+    stream      A TkGeometryStreamData with many meshes.
+    anim        A TkAnimMetadata with many frames of many nodes.
+
+SCALE multiplies the size of every case (roughly linearly). For each case the time taken to write it, read it
+from a stream and read it from memory is reported as MB/s and objects/s (nodes, indices, meshes or node
+frames), along with the peak memory allocated while doing so.
+The results can be saved as JSON with -o, and the results of an earlier run can be compared against with -c
+so that regressions show up between commits. No blender modules are needed.
+"""
+
+import argparse
+import json
+import os.path as op
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+from typing import Callable
+
+import numpy as np
+
+sys.path.insert(0, op.join(op.dirname(op.dirname(op.abspath(__file__))), "src", "addon", "nmsdk"))
+
+from serialization.cereal_bin import structdata  # noqa: E402
+from serialization.NMS_Structures.Structures import (  # noqa: E402
+    TkAnimMetadata,
+    TkAnimNodeData,
+    TkAnimNodeFrameData,
+    TkGeometryData,
+    TkGeometryStreamData,
+    TkMeshData,
+    TkMeshMetaData,
+    TkSceneNodeData,
+    TkVertexElement,
+    TkVertexLayout,
+)
+from synthetic import synthetic_scene  # noqa: E402
+
+
+def scene_case(scale: float) -> tuple[TkSceneNodeData, int]:
+    # Each extra level of depth triples the number of nodes.
+    depth = max(1, 7 + round(np.log(scale) / np.log(3)))
+    return synthetic_scene(depth), (3 ** (depth + 1) - 1) // 2
+
+
+def geometry_case(scale: float) -> tuple[TkGeometryData, int]:
+    index_count = int(3_000_000 * scale)
+    mesh_count = int(100 * scale) or 1
+    layout = TkVertexLayout(
+        [TkVertexElement(0, 0x140B, 0, 0, 0, 4), TkVertexElement(0, 0x140B, 0, 8, 1, 4)], 0, 2, 0x10
+    )
+    rng = np.random.default_rng(0)
+    geometry = TkGeometryData(
+        PositionVertexLayout=layout,
+        VertexLayout=layout,
+        BoundHullVertEd=np.arange(1, mesh_count + 1, dtype=np.int32) * 8,
+        BoundHullVerts=rng.random((mesh_count * 8, 4), dtype=np.float32),
+        BoundHullVertSt=np.arange(mesh_count, dtype=np.int32) * 8,
+        IndexBuffer=rng.integers(0, 1 << 16, index_count, dtype=np.int32),
+        JointBindings=[],
+        JointExtents=[],
+        JointMirrorAxes=[],
+        JointMirrorPairs=np.empty(0, np.int32),
+        MeshAABBMax=np.ones((mesh_count, 4), np.float32),
+        MeshAABBMin=-np.ones((mesh_count, 4), np.float32),
+        MeshBaseSkinMat=np.zeros(mesh_count, np.int32),
+        MeshVertREnd=np.arange(mesh_count, dtype=np.int32),
+        MeshVertRStart=np.arange(mesh_count, dtype=np.int32),
+        ProcGenNodeNames=[f"NODE_{i}" for i in range(mesh_count)],
+        ProcGenParentId=np.full(mesh_count, -1, np.int32),
+        SkinMatrixLayout=np.empty(0, np.int32),
+        StreamMetaDataArray=[
+            TkMeshMetaData(f"MESH{i}", 0x10, 0, 0x18, 0x18, 0x40, 0x58, 0x20, False)
+            for i in range(mesh_count)
+        ],
+        CollisionIndexCount=0,
+        IndexCount=index_count,
+        Indices16Bit=0,
+        VertexCount=1 << 16,
+    )
+    return geometry, index_count
+
+
+def stream_case(scale: float) -> tuple[TkGeometryStreamData, int]:
+    mesh_count = int(2000 * scale) or 1
+    rng = np.random.default_rng(0)
+    meshes = [
+        TkMeshData(
+            f"MODELS/TEST/MESH{i}",
+            rng.integers(0, 256, 0x1000, dtype=np.uint8),
+            rng.integers(0, 256, 0x400, dtype=np.uint8),
+            i,
+            0x400,
+            0xC00,
+            0x400,
+        )
+        for i in range(mesh_count)
+    ]
+    return TkGeometryStreamData(meshes), mesh_count
+
+
+def anim_case(scale: float) -> tuple[TkAnimMetadata, int]:
+    frame_count = int(300 * scale) or 1
+    node_count = 60
+    rng = np.random.default_rng(0)
+    quats = rng.normal(size=(node_count, 4))
+    quats /= np.linalg.norm(quats, axis=1, keepdims=True)
+    scales = np.ones((node_count, 4), np.float32)
+    translations = rng.random((node_count, 4), dtype=np.float32)
+    frames = [TkAnimNodeFrameData(quats, scales, translations) for _ in range(frame_count)]
+    anim = TkAnimMetadata(
+        StillFrameData=TkAnimNodeFrameData(quats, scales, translations),
+        AnimFrameData=frames,
+        NodeData=[TkAnimNodeData(f"Joint{i}", i, i, i) for i in range(node_count)],
+        FrameCount=frame_count,
+        NodeCount=node_count,
+        Has30HzFrames=False,
+    )
+    return anim, frame_count * node_count
+
+
+CASES: dict[str, Callable[[float], tuple]] = {
+    "scene": scene_case,
+    "geometry": geometry_case,
+    "stream": stream_case,
+    "anim": anim_case,
+}
+
+
+def best_time(func: Callable, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def peak_memory(func: Callable) -> int:
+    """ The peak number of bytes allocated by python (and numpy) while running the function. """
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench(name: str, scale: float, repeat: int) -> dict:
+    obj, objects = CASES[name](scale)
+    cls = type(obj)
+    body = obj.write().getvalue()
+    ops = {
+        "write": obj.write,
+        "read": lambda: cls.read(BytesIO(body)),
+        "from_buffer": lambda: cls.from_buffer(body),
+    }
+    result = {"bytes": len(body), "objects": objects}
+    for op_name, func in ops.items():
+        # Measuring the memory also warms up any caches (such as the codec plans) before the timing.
+        peak = peak_memory(func)
+        seconds = best_time(func, repeat)
+        result[op_name] = {
+            "seconds": seconds,
+            "mb_per_s": len(body) / seconds / 1e6,
+            "objects_per_s": objects / seconds,
+            "peak_bytes": peak,
+        }
+    return result
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=op.dirname(op.abspath(__file__)), capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def report(name: str, result: dict, baseline: dict):
+    print(f"{name} ({result['bytes']:,d} bytes, {result['objects']:,d} objects)")
+    for op_name in ("write", "read", "from_buffer"):
+        r = result[op_name]
+        line = (
+            f"    {op_name:<12} {r['mb_per_s']:9.1f} MB/s {r['objects_per_s']:14,.0f} objects/s"
+            f" {r['peak_bytes'] / 1024 / 1024:9.1f} MiB peak"
+        )
+        if (base := baseline.get(name)) is not None and base["bytes"] == result["bytes"]:
+            line += f"  ({base[op_name]['seconds'] / r['seconds']:.2f}x vs baseline)"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("cases", nargs="*", metavar="CASE")
+    parser.add_argument("-s", "--scale", type=float, default=1.0)
+    parser.add_argument("-n", "--repeat", type=int, default=3)
+    parser.add_argument("-o", "--output", help="Write the results to this JSON file")
+    parser.add_argument("-c", "--compare", help="Compare against the results in this JSON file")
+    args = parser.parse_args()
+    for name in args.cases:
+        if name not in CASES:
+            parser.error(f"Unknown case {name!r}, expected one of {', '.join(CASES)}")
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+
+    results = {}
+    for name in args.cases or CASES:
+        results[name] = bench(name, args.scale, args.repeat)
+        report(name, results[name], baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "revision": git_revision(),
+                    "python": platform.python_version(),
+                    "engine": structdata.CODEC_ENGINE,
+                    "scale": args.scale,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
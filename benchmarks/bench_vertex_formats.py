@@ -0,0 +1,186 @@
+"""Compare the per-vertex and vectorized encoders for the vertex stream formats.
+
+Usage:
+    python benchmarks/bench_vertex_formats.py [-v VERTICES ...] [-n REPEAT] [CASE ...]
+
+The cases are:
+    half        Positions (4 floats per vertex) written as binary16.
+    normals     Normals (4 floats per vertex) written as INT_2_10_10_10_REV.
+    colours     Vertex colours (3 ints per vertex) written as 4 unsigned bytes.
+    mesh        The whole vertex and position streams of a mesh as the exporter writes them, from lists of
+                tuples, using the layouts the exporter creates.
+
+For each case a mesh with each of the given numbers of vertices (1,000,000 by default) is encoded by both
+the per-vertex encoder the exporter used to use and the vectorized one, and the outputs are checked to be
+identical. The input data is chosen so that both encoders are exact, as they may round differently.
+No blender modules are needed.
+"""
+
+import argparse
+import os.path as op
+import sys
+import time
+from typing import Any, Callable, NamedTuple
+
+import numpy as np
+
+sys.path.insert(0, op.join(op.dirname(op.dirname(op.abspath(__file__))), "src", "addon", "nmsdk"))
+
+from serialization.formats import (  # noqa: E402
+    np_write_half,
+    np_write_int_2_10_10_10_rev,
+    np_write_ubytes,
+    np_write_vertex_layout,
+    ubytes_to_bytes,
+    write_half,
+    write_int_2_10_10_10_rev,
+)
+from serialization.formats.vertex_layout import (  # noqa: E402
+    GL_HALF_FLOAT,
+    GL_INT_2_10_10_10_REV,
+    GL_UNSIGNED_BYTE,
+)
+from serialization.NMS_Structures.Structures import TkVertexElement, TkVertexLayout  # noqa: E402
+
+VERTS, UVS, NORMS, TANGS, COLOURS = range(5)
+
+
+class Case(NamedTuple):
+    # Generate the data for the given number of vertices.
+    data: Callable[[int], Any]
+    # Encode the data one vertex at a time.
+    scalar: Callable[[Any], bytes]
+    # Encode the data all at once.
+    vector: Callable[[Any], bytes]
+
+
+def half_data(count: int) -> np.ndarray:
+    # Halves are exactly representable, so truncating and rounding give the same result.
+    rng = np.random.default_rng(0)
+    return rng.uniform(-100, 100, (count, 4)).astype(np.float16).astype(np.float64)
+
+
+def half_scalar(data: np.ndarray) -> bytes:
+    return b"".join(write_half(val) for vert in data.tolist() for val in vert)
+
+
+def normals_data(count: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    normals = rng.normal(size=(count, 4))
+    normals[:, :3] /= np.linalg.norm(normals[:, :3], axis=1, keepdims=True)
+    normals[:, 3] = 1
+    return normals
+
+
+def normals_scalar(data: np.ndarray) -> bytes:
+    return b"".join(write_int_2_10_10_10_rev(vert) for vert in data.tolist())
+
+
+def colours_data(count: int) -> list[tuple]:
+    rng = np.random.default_rng(0)
+    return [tuple(v) for v in rng.integers(0, 256, (count, 3)).tolist()]
+
+
+def colours_scalar(data: list[tuple]) -> bytes:
+    return b"".join(ubytes_to_bytes(colour) for colour in data)
+
+
+def make_layout(elements: list[tuple[int, int, int]], stride: int) -> TkVertexLayout:
+    return TkVertexLayout(
+        VertexElements=[
+            TkVertexElement(SemanticID=sid, Size=4, Type=type_, Offset=offset, Normalise=0, Instancing=0)
+            for sid, type_, offset in elements
+        ],
+        PlatformData=0,
+        ElementCount=len(elements),
+        Stride=stride,
+    )
+
+
+POSITION_LAYOUT = make_layout([(VERTS, GL_HALF_FLOAT, 0), (UVS, GL_HALF_FLOAT, 8)], 0x10)
+VERTEX_LAYOUT = make_layout(
+    [(NORMS, GL_INT_2_10_10_10_REV, 0), (TANGS, GL_INT_2_10_10_10_REV, 4), (COLOURS, GL_UNSIGNED_BYTE, 8)],
+    0xC,
+)
+
+
+def mesh_data(count: int) -> dict[int, list[tuple]]:
+    # The exporter gets lists of tuples from blender.
+    rng = np.random.default_rng(0)
+    return {
+        VERTS: [tuple(v) for v in half_data(count).tolist()],
+        UVS: [tuple(v) for v in rng.random((count, 4)).astype(np.float16).astype(np.float64).tolist()],
+        NORMS: [tuple(v) for v in normals_data(count).tolist()],
+        TANGS: [tuple(v) for v in normals_data(count).tolist()],
+        COLOURS: colours_data(count),
+    }
+
+
+def mesh_scalar(data: dict[int, list[tuple]]) -> bytes:
+    count = len(data[VERTS])
+    vertex_data = bytearray()
+    position_data = bytearray()
+    for i in range(count):
+        for sid in (NORMS, TANGS):
+            vertex_data.extend(write_int_2_10_10_10_rev(data[sid][i]))
+        vertex_data.extend(ubytes_to_bytes(data[COLOURS][i]))
+        for sid in (VERTS, UVS):
+            for val in data[sid][i]:
+                position_data.extend(write_half(val))
+    return bytes(vertex_data + position_data)
+
+
+def mesh_vector(data: dict[int, list[tuple]]) -> bytes:
+    count = len(data[VERTS])
+    return (
+        np_write_vertex_layout(VERTEX_LAYOUT, count, data).tobytes()
+        + np_write_vertex_layout(POSITION_LAYOUT, count, data).tobytes()
+    )
+
+
+CASES: dict[str, Case] = {
+    "half": Case(half_data, half_scalar, lambda data: np_write_half(data).tobytes()),
+    "normals": Case(normals_data, normals_scalar, lambda data: np_write_int_2_10_10_10_rev(data).tobytes()),
+    "colours": Case(colours_data, colours_scalar, lambda data: np_write_ubytes(data).tobytes()),
+    "mesh": Case(mesh_data, mesh_scalar, mesh_vector),
+}
+
+
+def best_time(func: Callable, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("cases", nargs="*", metavar="CASE")
+    parser.add_argument("-v", "--vertices", type=int, nargs="+", default=[1_000_000])
+    parser.add_argument("-n", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+    for name in args.cases:
+        if name not in CASES:
+            parser.error(f"Unknown case {name!r}, expected one of {', '.join(CASES)}")
+
+    for name in args.cases or CASES:
+        case = CASES[name]
+        for count in args.vertices:
+            data = case.data(count)
+            if case.scalar(data) != case.vector(data):
+                sys.exit(f"{name}: the scalar and vectorized encoders do not match")
+            # The scalar encoders are slow, so they are only run once.
+            scalar = best_time(lambda: case.scalar(data), 1)
+            vector = best_time(lambda: case.vector(data), args.repeat)
+            print(
+                f"{name:<12} {count:>10,d} vertices  scalar {scalar:8.3f} s  vectorized {vector:8.4f} s"
+                f"  ({scalar / vector:,.0f}x)  {count / vector:14,.0f} vertices/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
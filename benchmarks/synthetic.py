@@ -0,0 +1,25 @@
+"""Synthetic structs shared by the benchmarks.
+
+The serialization package must already be importable, so import this after the benchmark has added it to
+``sys.path``.
+"""
+
+from serialization.NMS_Structures.Structures import TkSceneNodeAttributeData, TkSceneNodeData, TkTransformData
+
+
+def synthetic_scene(depth: int, idx: int = 0) -> TkSceneNodeData:
+    """ A scene where every node is a mesh with 3 children, down to the given depth. """
+    return TkSceneNodeData(
+        Attributes=[
+            TkSceneNodeAttributeData("GEOMETRY", "MODELS/TEST.GEOMETRY.MBIN"),
+            TkSceneNodeAttributeData("BATCHSTART", str(idx)),
+            TkSceneNodeAttributeData("BATCHCOUNT", "36"),
+            TkSceneNodeAttributeData("VERTRSTART", str(idx)),
+            TkSceneNodeAttributeData("VERTREND", str(idx + 23)),
+        ],
+        Children=[synthetic_scene(depth - 1, 3 * idx + i + 1) for i in range(3)] if depth else [],
+        Name=f"Node{idx}",
+        Type="MESH",
+        Transform=TkTransformData(),
+        NameHash=idx,
+    )
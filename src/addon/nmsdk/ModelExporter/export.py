@@ -10,7 +10,6 @@ __author__ = "monkeyman192"
 __credits__ = ["monkeyman192", "gregkwaste"]
 
 import os
-import struct
 import subprocess
 from collections import OrderedDict as odict
 from itertools import accumulate
@@ -24,6 +23,7 @@ if TYPE_CHECKING:
 from ..NMS.classes import TkAttachmentData
 from ..NMS.classes.Object import Model, jenkins_one_at_a_time
 from ..NMS.LOOKUPS import SEMANTICS, STRIDES, UVS, VERTS
+from ..serialization.cereal_bin.codec import get_layout
 from ..serialization.NMS_Structures import MBINHeader
 from ..serialization.NMS_Structures.Structures import (
     TkGeometryData as TkGeometryData_new,
@@ -42,6 +42,10 @@ from .utils import traverse
 # Get the parent package name.
 _package = __package__.rpartition(".")[0]
 
+# The combined length of the paths passed to each MBINCompiler process. This leaves plenty of room under the
+# 32,767 character command line limit on Windows.
+_MAX_ARGS_LENGTH = 16384
+
 
 class Export():
     """ Export the data provided by blender to .mbin files.
@@ -91,6 +95,8 @@ class Export():
         self.n_stream = odict()
         self.t_stream = odict()
         self.c_stream = odict()
+        self.bi_stream = odict()
+        self.bw_stream = odict()
         self.chvertex_stream = odict()
         # mesh collision convex hull data
         self.mesh_coll_indexes = odict()
@@ -127,6 +133,8 @@ class Export():
             self.uv_stream[mesh.Name] = mesh.UVs
             self.n_stream[mesh.Name] = mesh.Normals
             self.t_stream[mesh.Name] = mesh.Tangents
+            self.bi_stream[mesh.Name] = mesh.BlendIndex
+            self.bw_stream[mesh.Name] = mesh.BlendWeight
             self.np_indexes.append(mesh.np_indexes)
             self.np_index_lenths.append(mesh.np_indexes.size)
             self.np_index_maxs.append(max(mesh.np_indexes) + 1)
@@ -172,6 +180,9 @@ class Export():
 
         self.preprocess_streams()
 
+        # this creates the VertexLayout and PositionVertexLayout properties
+        self.create_vertex_layouts()
+
         self.gstream_fpath = f"{os.path.join(self.basepath, self.scene_name)}.GEOMETRY.DATA.MBIN.PC"
 
         if (not self.preserve_node_info
@@ -191,9 +202,6 @@ class Export():
 
         self.get_bounds()
 
-        # this creates the VertexLayout and PositionVertexLayout properties
-        self.create_vertex_layouts()
-
         self.process_nodes()
         # make this last to make sure flattening each stream doesn't affect
         # other data.
@@ -279,14 +287,16 @@ class Export():
         for i, name in enumerate(self.mesh_names):
             count = len(self.vertex_stream[name])
             v_data = serialize_vertex_stream(
-                requires=self.stream_list,
+                self.GeometryData['VertexLayout'],
                 count=count,
                 Normals=self.n_stream[name],
                 Tangents=self.t_stream[name],
-                Colours=self.c_stream[name]
+                Colours=self.c_stream[name],
+                BlendIndex=self.bi_stream[name],
+                BlendWeight=self.bw_stream[name],
             )
             v_pos_data = serialize_vertex_stream(
-                requires=[VERTS, UVS],
+                self.GeometryData['PositionVertexLayout'],
                 count=count,
                 Vertices=self.vertex_stream[name],
                 UVs=self.uv_stream[name],
@@ -315,44 +325,32 @@ class Export():
             mesh_datas.append(md)
         gstream_data = TkGeometryStreamData(mesh_datas)
 
+        # The position in the file of the data of each list, keyed by the position of its header.
+        list_offsets: dict[int, int] = {}
         with open(self.gstream_fpath, "wb") as f:
             hdr = MBINHeader()
             hdr.header_namehash = 0x40025754
             hdr.header_guid = 0xCCB46895A8B36313
-            hdr.write(f)
-            gstream_data.write(f)
-
-        # This is a list of 3-tuples with the structure (vert_offset, index_offset_vert_pos_offset)
+            hdr.write_forward(f)
+            # The mesh data can be large, so write it sequentially instead of seeking back and forth.
+            gstream_data.write_forward(f, offsets=list_offsets)
+
+        def data_pos(header: int) -> int:
+            # Empty lists have no data, and an offset of 0 from their header.
+            return list_offsets.get(header, header)
+
+        # Find the vertex and position data of each mesh from where the writer put it.
+        stream_layout = get_layout(TkGeometryStreamData)
+        mesh_layout = get_layout(TkMeshData)
+        mesh_datas_start = data_pos(MBINHeader._size + stream_layout.offsets["StreamDataArray"])
+        # This is a list of 3-tuples with the structure (vert_offset, index_offset, vert_pos_offset)
         offsets = []
-
-        # A bit of a hack, but we need the offsets of the index and vert data. We'll use this code to get it
-        # since it works.
-        with open(self.gstream_fpath, "rb") as f:
-            # Read the number of TkMeshData's serialized.
-            f.seek(0x28, 0)
-            entries = struct.unpack("<I", f.read(4))[0]
-
-            TkMeshData_size = 0x48
-
-            # Then jump to the start of these.
-            f.seek(0x30, 0)
-            for i in range(entries):
-                entry_start = f.tell()
-                # First read the list header for MeshDataStream
-                f.seek(entry_start + 0x10, 0)
-                curr_pos = f.tell()
-                offset = struct.unpack("<Q", f.read(8))[0]
-                vert_data_pos = curr_pos + offset
-                f.seek(entry_start + 0x20, 0)
-                curr_pos = f.tell()
-                offset = struct.unpack("<Q", f.read(8))[0]
-                vert_pos_data_pos = curr_pos + offset
-                # To get the index start, we just need to get the size of the vertex data and add it to the
-                # start address of the vertex data since it's serialized in the same data.
-                f.seek(entry_start + 0x3C, 0)
-                vert_size = struct.unpack("<I", f.read(4))[0]
-                offsets.append((vert_data_pos, vert_size, vert_pos_data_pos))
-                f.seek(entry_start + TkMeshData_size, 0)
+        for i in range(len(mesh_datas)):
+            entry_start = mesh_datas_start + i * mesh_layout.size
+            vert_data_pos = data_pos(entry_start + mesh_layout.offsets["MeshDataStream"])
+            vert_pos_data_pos = data_pos(entry_start + mesh_layout.offsets["MeshPositionDataStream"])
+            # The index data is serialized in the same list straight after the vertex data.
+            offsets.append((vert_data_pos, vertex_sizes[i], vert_pos_data_pos))
 
         # while we are here we will generate the mesh metadata for the geometry
         # file.
@@ -664,7 +662,8 @@ class Export():
                                                       Offset=Offset,
                                                       Normalise=0,
                                                       Instancing=0))
-            elif sID == 4:
+            # colours and blend indices are unsigned bytes
+            elif sID in [4, 5]:
                 Offset = self.offsets[sID]
                 VertexElements.append(TkVertexElement(SemanticID=sID,
                                                       Size=4,
@@ -672,6 +671,15 @@ class Export():
                                                       Offset=Offset,
                                                       Normalise=0,
                                                       Instancing=0))
+            # blend weights are halves
+            elif sID == 6:
+                Offset = self.offsets[sID]
+                VertexElements.append(TkVertexElement(SemanticID=sID,
+                                                      Size=4,
+                                                      Type=5131,
+                                                      Offset=Offset,
+                                                      Normalise=0,
+                                                      Instancing=0))
 
         self.GeometryData['VertexLayout'] = TkVertexLayout(
             ElementCount=self.element_count,
@@ -827,17 +835,42 @@ class Export():
 
     def convert_to_mbin(self):
         """ Convert all .mxml file to .mbin files. """
-        print('Converting .mxml files to .mbin. Please wait.')
+        locations = []
         for directory, _, files in os.walk(self.basepath):
             for file in files:
                 location = os.path.join(directory, file)
                 if os.path.splitext(location)[1].lower() == '.mxml':
-                    # Force MBINCompiler to overwrite existing files and
-                    # ignore errors.
-                    addon_prefs: NMSDKPreferences = bpy.context.preferences.addons[_package].preferences
-                    mbincompiler_path = addon_prefs.mbincompiler_path
-                    retcode = subprocess.call([mbincompiler_path, "-y", "-f", "-Q", location])
-                    if retcode == 0:
-                        os.remove(location)
-                    else:
-                        print(f"MBINCompiler failed to run with error code {retcode}")
+                    locations.append(location)
+        if not locations:
+            return
+        print('Converting .mxml files to .mbin. Please wait.')
+        addon_prefs: NMSDKPreferences = bpy.context.preferences.addons[_package].preferences
+        mbincompiler_path = addon_prefs.mbincompiler_path
+        # Convert the files with as few MBINCompiler processes as the command line length allows, forcing it
+        # to overwrite existing files and ignore errors.
+        batch = []
+        batch_length = 0
+        for location in locations:
+            if batch and batch_length + len(location) + 3 > _MAX_ARGS_LENGTH:
+                self._run_mbincompiler(mbincompiler_path, batch)
+                batch = []
+                batch_length = 0
+            batch.append(location)
+            # Allow for the quotes and space around each argument.
+            batch_length += len(location) + 3
+        self._run_mbincompiler(mbincompiler_path, batch)
+        # A single failure fails the whole batch, so only remove the files which were actually converted.
+        for location in locations:
+            base = os.path.splitext(location)[0]
+            mxml_mtime = os.path.getmtime(location)
+            if any(os.path.exists(base + ext) and os.path.getmtime(base + ext) >= mxml_mtime
+                   for ext in ('.MBIN', '.mbin')):
+                os.remove(location)
+            else:
+                print(f"{location} was not converted to .mbin")
+
+    @staticmethod
+    def _run_mbincompiler(mbincompiler_path: str, locations: list[str]):
+        retcode = subprocess.call([mbincompiler_path, "-y", "-f", "-Q", *locations])
+        if retcode != 0:
+            print(f"MBINCompiler failed to run with error code {retcode}")
@@ -4,16 +4,23 @@ from typing import Optional, Type
 import numpy as np
 from mathutils import Euler, Matrix
 
-from ..serialization.NMS_Structures import TkSceneNodeData
+from ..serialization.scene_graph import SceneGraph
 
 
 class SceneNodeData():
     """ Our own internal representation of the TkSceneNodeData class.
     This makes no attempt to map fields directly to the fields in that class,
     but will instead be a version-independent representation of it.
+
+    The scene data itself is stored in a SceneGraph, and this holds the data
+    which is loaded for a single node of it while it is being imported.
+    Creating the root node creates the nodes for the whole scene.
     """
-    def __init__(self, info: TkSceneNodeData, parent: "Optional[SceneNodeData]" = None):
-        self.info = info
+    def __init__(self, graph: SceneGraph, index: int = 0,
+                 parent: "Optional[SceneNodeData]" = None,
+                 nodes: "Optional[list[SceneNodeData]]" = None):
+        self.graph = graph
+        self.index = index
         self.parent = parent
         self.verts: dict[str, list[tuple]] = dict()
         self.idxs = list()
@@ -31,33 +38,38 @@ class SceneNodeData():
         self.bounded_hull = list()
         # The metadata will be read from the geometry file later.
         self.metadata = None
-        self.children: list[SceneNodeData] = []
-        # Slightly wasteful but greatly simplifies things...
-        for child in self.info.Children:
-            self.children.append(SceneNodeData(child, self))
-        self.attributes = {x.Name: x.Value for x in self.info.Attributes}
+        if nodes is None:
+            # The nodes are in render order, so the parent of each node has
+            # always been created before it.
+            nodes = [self]
+            for idx in range(1, len(graph)):
+                nodes.append(SceneNodeData(graph, idx, nodes[graph.parents[idx]], nodes))
+        self._nodes = nodes
 
 # region public methods
 
     def Attribute(self, name, astype: Type = str):
         # Doesn't support AltID's
-        if (attrib := self.attributes.get(name)) is not None:
+        if (attrib := self.graph.attribute(self.index, name)) is not None:
             return astype(attrib)
 
     def iter(self):
         """ Returns an ordered iterable list of SceneNodeData objects. """
-        objs = [self]
-        for child in self.children:
-            objs.extend(child.iter())
-        return objs
+        return self._nodes[self.index:self.graph.ends[self.index]]
 
     def get(self, ID):
         """ Return the SceneNodeData object with the specified ID. """
-        for obj in self.iter():
-            # Sanitize input ID for safety
-            if isinstance(obj.Name, str):
-                if obj.Name.upper() == ID.upper():
-                    return obj
+        idx = self.graph.index(ID)
+        if idx is not None and self.index <= idx < self.graph.ends[self.index]:
+            return self._nodes[idx]
+
+    @property
+    def children(self) -> "list[SceneNodeData]":
+        return [self._nodes[idx] for idx in self.graph.children(self.index)]
+
+    @property
+    def attributes(self) -> dict[str, str]:
+        return self.graph.attributes(self.index)
 
 # region private methods
 
@@ -85,25 +97,22 @@ class SceneNodeData():
 
     @property
     def Name(self) -> str:
-        return self.info.Name
+        return self.graph.names[self.index]
+
+    @Name.setter
+    def Name(self, name: Optional[str]):
+        self.graph.rename(self.index, name)
 
     @property
     def Transform(self) -> dict:
-        trans = (
-            self.info.Transform.TransX,
-            self.info.Transform.TransY,
-            self.info.Transform.TransZ,
-        )
+        t = self.graph.transforms[self.index]
+        trans = (float(t['TransX']), float(t['TransY']), float(t['TransZ']))
         rot = (
-            math.radians(self.info.Transform.RotX),
-            math.radians(self.info.Transform.RotY),
-            math.radians(self.info.Transform.RotZ),
-        )
-        scale = (
-            self.info.Transform.ScaleX,
-            self.info.Transform.ScaleY,
-            self.info.Transform.ScaleZ,
+            math.radians(t['RotX']),
+            math.radians(t['RotY']),
+            math.radians(t['RotZ']),
         )
+        scale = (float(t['ScaleX']), float(t['ScaleY']), float(t['ScaleZ']))
         k = {'Trans': trans, 'Rot': rot, 'Scale': scale}
         return k
 
@@ -137,4 +146,4 @@ class SceneNodeData():
 
     @property
     def Type(self):
-        return self.info.Type
+        return self.graph.types[self.index]
@@ -26,6 +26,7 @@ from ..NMS.material_node import create_material_node
 
 if TYPE_CHECKING:
     from .. import NMSDKPreferences
+from ..serialization.cereal_bin.buffers import buffer_view
 from ..serialization.formats import np_read_int_2_10_10_10_rev
 from ..serialization.NMS_Structures.NMS_types import MBINHeader
 from ..serialization.NMS_Structures.Structures import (
@@ -40,6 +41,7 @@ from ..serialization.NMS_Structures.Structures import (
     TkSceneNodeData,
     ctx_nonignored_namehashes,
 )
+from ..serialization.scene_graph import SceneGraph
 from ..utils.bpyutils import SceneOp, edit_object, select_object
 from ..utils.io import base_path, get_NMS_dir, load_file, load_file_unsafe, post_path
 from ..utils.stopwitch import witch
@@ -175,9 +177,11 @@ class ImportScene():
         # This needs to be read from the mbin file, so ensure we are either
         # reading from it or construct the name.
         with witch.section("read_scene"):
-            with load_file(self.scene_path, self.root_dir, self.from_pak, self.pak_data_mapping) as f:
-                MBINHeader.read(f)
-                self._scene_node_data = TkSceneNodeData.read(f)
+            with (
+                load_file(self.scene_path, self.root_dir, self.from_pak, self.pak_data_mapping) as f,
+                buffer_view(f) as view,
+            ):
+                self._scene_node_data = TkSceneNodeData.from_buffer(view, MBINHeader._size)
                 self.scene_name = self._scene_node_data.Name
         print(f"Loading {self.scene_name}")
         shutil.rmtree(tmpdir)
@@ -204,7 +208,8 @@ class ImportScene():
         # Change to render with cycles
         self.scn.render.engine = RENDER_ENGINE
 
-        self.scene_node_data = SceneNodeData(self._scene_node_data)
+        self.scene_graph = SceneGraph(self._scene_node_data)
+        self.scene_node_data = SceneNodeData(self.scene_graph)
         # Once we have loaded this, we need to do a sanity check to make sure
         # that the scene file actually has an associated geometry file.
         # Some do not (such as emitter scenes, more of which were added in the
@@ -216,7 +221,7 @@ class ImportScene():
             self.directory = op.dirname(self.scene_node_data.Name)
             self.local_root_folder = base_path(self.local_directory, self.directory)
         # remove the name of the top level object
-        self.scene_node_data.info.Name = None
+        self.scene_node_data.Name = None
         # Try and find the geometry file locally.
         self.geometry_fname = self.scene_node_data.Attribute("GEOMETRY").lower() + ".pc"
         if not self.from_pak:
@@ -239,15 +244,17 @@ class ImportScene():
 
         # Get the information about what data the geometry file contains
         with witch.section("read_geometry"):
-            with load_file(self.geometry_fname, self.root_dir, self.from_pak, self.pak_data_mapping) as f:
-                header = MBINHeader.read(f)
+            with (
+                load_file(self.geometry_fname, self.root_dir, self.from_pak, self.pak_data_mapping) as f,
+                buffer_view(f) as view,
+            ):
+                header = MBINHeader.from_buffer(view)
                 assert header.header_namehash == NAMEHASH_MAPPING["TkGeometryData"]
-                geometry_data = TkGeometryData.read(f)
+                geometry_data = TkGeometryData.from_buffer(view, MBINHeader._size)
 
         if geometry_data.Indices16Bit:
-            self.mesh_indexes = []
-            for idx_val in geometry_data.IndexBuffer:
-                self.mesh_indexes.extend((idx_val & 0xFFFF, idx_val >> 16))
+            # Each int32 contains two little-endian 16 bit indexes.
+            self.mesh_indexes = geometry_data.IndexBuffer.view("<u2").astype(np.int32)
         else:
             self.mesh_indexes = geometry_data.IndexBuffer
         self.CollisionIndexCount = geometry_data.CollisionIndexCount
@@ -259,19 +266,19 @@ class ImportScene():
         for ve in geometry_data.PositionVertexLayout.VertexElements:
             self.position_vertex_elements.append(
                 {
-                    "semID": ve.SemanticID,
-                    "size": ve.Size,
-                    "type": ve.Type,
-                    "offset": ve.Offset,
+                    "semID": int(ve.SemanticID),
+                    "size": int(ve.Size),
+                    "type": int(ve.Type),
+                    "offset": int(ve.Offset),
                 }
             )
         for ve in geometry_data.VertexLayout.VertexElements:
             self.vertex_elements.append(
                 {
-                    "semID": ve.SemanticID,
-                    "size": ve.Size,
-                    "type": ve.Type,
-                    "offset": ve.Offset,
+                    "semID": int(ve.SemanticID),
+                    "size": int(ve.Size),
+                    "type": int(ve.Type),
+                    "offset": int(ve.Offset),
                 }
             )
 
@@ -315,9 +322,11 @@ class ImportScene():
         animation_data: dict[str, TkAnimationData] = {}
         ctx_nonignored_namehashes.set({0x6E59DA5E})
         for entity in self.entities:
-            with load_file(entity, self.root_dir, self.from_pak, self.pak_data_mapping) as f:
-                MBINHeader.read(f)
-                entity_data = TkAttachmentData.read(f)
+            with (
+                load_file(entity, self.root_dir, self.from_pak, self.pak_data_mapping) as f,
+                buffer_view(f) as view,
+            ):
+                entity_data = TkAttachmentData.from_buffer(view, MBINHeader._size)
                 anim_data: list[TkAnimationComponentData] = [att for att in entity_data.iter_attachments(TkAnimationComponentData)]
                 if anim_data:
                     print(f"{entity} has {len(entity_data.Components)} components which contains {len(anim_data)} TkAnimationComponentData's")
@@ -355,11 +364,13 @@ class ImportScene():
             # We can import just the idle animation data... Should be fairly quick...
             if (_idle_anim_data := animation_data.get("__idle__")) is not None:
                 if _idle_anim_data.Filename:
-                    with load_file(
-                        _idle_anim_data.Filename, self.root_dir, self.from_pak, self.pak_data_mapping
-                    ) as f:
-                        MBINHeader.read(f)
-                        idle_anim_data = TkAnimMetadata.read(f)
+                    with (
+                        load_file(
+                            _idle_anim_data.Filename, self.root_dir, self.from_pak, self.pak_data_mapping
+                        ) as f,
+                        buffer_view(f) as view,
+                    ):
+                        idle_anim_data = TkAnimMetadata.from_buffer(view, MBINHeader._size)
                     add_animation_to_scene(bpy.context.scene, "", idle_anim_data, True)
         return
 
@@ -427,10 +438,10 @@ class ImportScene():
                 self._clear_prev_scene()
             self._add_empty_to_scene(self.scene_node_data)
         # Get all the joints in the scene
-        for obj in self.scene_node_data.iter():
-            if obj.Type == 'JOINT':
-                self.joints.append(obj)
-                self.scn.nmsdk_anim_data.joints.append(obj.Name)
+        nodes = self.scene_node_data.iter()
+        for idx in self.scene_graph.of_type('JOINT'):
+            self.joints.append(nodes[idx])
+            self.scn.nmsdk_anim_data.joints.append(nodes[idx].Name)
         t1 = time.perf_counter()
 
         try:
@@ -699,9 +710,11 @@ class ImportScene():
 
             if descriptor_path is not None:
                 empty_obj.NMSReference_props.is_proc = True
-                with load_file(descriptor_path, self.root_dir, self.from_pak, self.pak_data_mapping) as f:
-                    MBINHeader.read(f)
-                    self.descriptor_data = TkModelDescriptorList.read(f)
+                with (
+                    load_file(descriptor_path, self.root_dir, self.from_pak, self.pak_data_mapping) as f,
+                    buffer_view(f) as view,
+                ):
+                    self.descriptor_data = TkModelDescriptorList.from_buffer(view, MBINHeader._size)
             else:
                 pass
             print(f"Adding {self.scene_basename} empty obj to local_objects")
@@ -2,6 +2,7 @@ import struct
 from io import BufferedReader
 from typing import NamedTuple
 
+from ..serialization.cereal_bin.buffers import buffer_view
 from ..serialization.list_header import ListHeader
 from ..serialization.NMS_Structures import NAMEHASH_MAPPING, MBINHeader, TkAnimMetadata, TkMaterialData
 
@@ -23,10 +24,10 @@ def read_anim(fname):  # TODO: FIX!
     """ Reads an anim file. """
     anim_data = dict()
 
-    with open(fname, "rb") as f:
-        header = MBINHeader.read(f)
+    with buffer_view(fname) as view:
+        header = MBINHeader.from_buffer(view)
         assert header.header_namehash == NAMEHASH_MAPPING["TkAnimMetadata"]
-        return TkAnimMetadata.read(f)
+        return TkAnimMetadata.from_buffer(view, MBINHeader._size)
 
     with open(fname, 'rb') as f:
         f.seek(0x60)
@@ -35,6 +35,8 @@ STRIDES = {
     NORMS: 4,
     TANGS: 4,
     COLOURS: 4,
+    BLENDINDEX: 4,
+    BLENDWEIGHT: 8,
 }
 
 # Material types
@@ -69,6 +71,8 @@ SERIALIZE_FMT_MAP = {
     NORMS: 1,
     TANGS: 1,
     COLOURS: 2,
+    BLENDINDEX: 2,
+    BLENDWEIGHT: 0,
 }
 
 SERIALIZE_FMT_MAP_NEW = {
@@ -77,6 +81,8 @@ SERIALIZE_FMT_MAP_NEW = {
     NORMS: 36255,
     TANGS: 36255,
     COLOURS: 5121,
+    BLENDINDEX: 5121,
+    BLENDWEIGHT: 5131,
 }
 
 VERT_TYPE_MAP = {
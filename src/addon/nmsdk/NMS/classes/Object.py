@@ -151,7 +151,8 @@ class Object():
         # which have been provided.
         # we will not include CHVerts as this will be given by default anyway
         # and we don't need to a semantic ID for it
-        for name in ['Vertices', 'Indexes', 'UVs', 'Normals', 'Tangents', 'Colours']:
+        for name in ['Vertices', 'Indexes', 'UVs', 'Normals', 'Tangents', 'Colours',
+                     'BlendIndex', 'BlendWeight']:
             if self.__dict__.get(name, None) is not None:
                 self.provided_streams = self.provided_streams.union(set([name]))
 
@@ -328,6 +329,10 @@ class Mesh(Object):
         self.Tangents = kwargs.get('Tangents', None)
         self.CHVerts = kwargs.get('CHVerts', None)
         self.Colours = kwargs.get('Colours', None)
+        # The joint indices and weights of skinned meshes. These are arrays
+        # with 4 columns as returned by np_write_blend_data.
+        self.BlendIndex = kwargs.get('BlendIndex', None)
+        self.BlendWeight = kwargs.get('BlendWeight', None)
         self.np_indexes = kwargs.get('np_indexes', None)
         self.IsMesh = True
         # this will be a list of length 2 with each element being a 4-tuple.
@@ -3,6 +3,7 @@ import os.path as op
 
 import bpy
 
+from ..serialization.cereal_bin.buffers import buffer_view
 from ..serialization.NMS_Structures import MBINHeader, TkMaterialData
 from ..utils.io import load_file, normalise_path, realize_path
 from .LOOKUPS import DIFFUSE, DIFFUSE2, MASKS, NORMAL
@@ -22,9 +23,8 @@ def create_material_node(
     else:
         if not op.exists(mat_path):
             return
-    with load_file(mat_path, local_root_directory, from_pak, pak_data) as f:
-        MBINHeader.read(f)
-        mat_data = TkMaterialData.read(f)
+    with load_file(mat_path, local_root_directory, from_pak, pak_data) as f, buffer_view(f) as view:
+        mat_data = TkMaterialData.from_buffer(view, MBINHeader._size)
     if mat_data is None:
         # no texture data so just exit this function.
         return
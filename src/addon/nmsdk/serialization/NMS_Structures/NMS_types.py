@@ -1,16 +1,43 @@
+from collections.abc import Sequence
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
-from io import BufferedWriter, BufferedReader
+from io import BufferedWriter, BufferedReader, BytesIO
 import struct
-from typing import Annotated, Type, TypeVar, Optional, Union
+from typing import Annotated, Any, Type, TypeVar, Optional, Union
 import types
 
-from ..utils import bytes_to_quat
+import numpy as np
+
+from ..utils import compress_quats, decompress_quats
+from ..cereal_bin.buffers import buffer_view
 from ..cereal_bin.structdata import datatype, Field
+from ..cereal_bin.writer import patch, record_offset, write_placeholder
 from ..cereal_bin import basic_types as bt
 
 
 T = TypeVar("T", bound=datatype)
 
+# The header of any pointer-like type: the offset relative to the header, the count or namehash, and the
+# end padding.
+HEADER = struct.Struct("<QII")
+# The type of the object exposing the internal buffer of a BytesIO.
+_BYTESIO_BUFFER = type(BytesIO().getbuffer().obj)
+
+# Whether lists of fixed-size primitive elements (ints, floats, Vector4f etc.) are read as numpy arrays.
+# Lists of vectors are read as 2D arrays with one row per element.
+ctx_numpy_lists: ContextVar[bool] = ContextVar("ctx_numpy_lists", default=True)
+
+
+@contextmanager
+def python_lists():
+    """ Read all lists as python lists instead of numpy arrays within this context. """
+    token = ctx_numpy_lists.set(False)
+    try:
+        yield
+    finally:
+        ctx_numpy_lists.reset(token)
+
 
 class VariableSizeString(datatype):
     _size = 0x10
@@ -41,11 +68,18 @@ class VariableSizeString(datatype):
         val = val.rstrip("\x00")
         buf.seek(ret)
         return val
-    
+
+    @classmethod
+    def deserialize_from(cls, view: memoryview, offset: int) -> tuple[str, int]:
+        ptr, size, _ = HEADER.unpack_from(view, offset)
+        start = offset + ptr
+        val = str(view[start:start + size], "utf-8").rstrip("\x00")
+        return val, offset + 0x10
+
     @classmethod
     def serialize(cls, buf: BufferedWriter, value: str):
         ptr = buf.tell()
-        buf.write(struct.pack("<QII", 0, 0, cls._end_padding))
+        write_placeholder(buf, HEADER.pack(0, 0, cls._end_padding))
         yield
         offset = buf.tell()
         if cls._pad_with and offset % 8 != 0:
@@ -57,8 +91,8 @@ class VariableSizeString(datatype):
         size = len(value)
         if size != 0:
             buf.write(struct.pack(f"{size + 1}s", value.encode() + b"\x00"))
-            buf.seek(ptr)
-            buf.write(struct.pack("<QI", offset - ptr, size + 1))
+            patch(buf, ptr, struct.pack("<QI", offset - ptr, size + 1))
+            record_offset(ptr, offset)
 
 
 class NMS_list(datatype):
@@ -81,30 +115,252 @@ class NMS_list(datatype):
         return _cls
 
     @classmethod
-    def deserialize(cls, buf: BufferedReader) -> list[int]:
+    def _array_info(cls) -> Optional[tuple[np.dtype, int]]:
+        """ The numpy dtype and number of values per element if the list can be read as an array. """
+        try:
+            return cls.__dict__["_array_dtype"]
+        except KeyError:
+            pass
+        info = None
+        list_type = cls._list_type
+        prim = list_type._primitive()
+        if prim is not None and prim.encoding is None and len(set(prim.fmt)) == 1:
+            dtype = np.dtype("<" + prim.fmt[0])
+            size = struct.calcsize("<" + prim.fmt)
+            # The elements must be tightly packed for the data to be read in one go.
+            if dtype.itemsize * prim.count == size and size % list_type.alignment == 0:
+                info = (dtype, prim.count)
+        elif (dtype := list_type.dtype()) is not None:
+            info = (dtype, 1)
+        cls._array_dtype = info
+        return info
+
+    @classmethod
+    def _array_shape(cls, size: int, count: int) -> tuple[int, ...]:
+        return (size, ) if count == 1 else (size, count)
+
+    @staticmethod
+    def _as_array(data: np.ndarray) -> np.ndarray:
+        # Lists of structs are returned as record arrays so that the fields can be accessed as attributes.
+        if data.dtype.names is not None:
+            return data.view(np.recarray)
+        return data
+
+    @classmethod
+    def deserialize(cls, buf: BufferedReader) -> Union[list, np.ndarray]:
+        start = buf.tell()
+        offset, size, _ = struct.unpack("<QII", buf.read(0x10))
+        ret = buf.tell()
+        buf.seek(start + offset)
+        if ctx_numpy_lists.get() and (info := cls._array_info()) is not None:
+            dtype, count = info
+            data = np.empty(cls._array_shape(size, count), dtype)
+            if size != 0:
+                cls._list_type._skip_padding(buf)
+                if buf.readinto(data.view(np.uint8)) != data.nbytes:
+                    raise EOFError(f"Not enough data to read {size} elements of {cls._list_type.__name__}")
+            data = cls._as_array(data)
+        else:
+            data = []
+            for _ in range(size):
+                data.append(cls._list_type._read(buf))
+        buf.seek(ret)
+        return data
+
+    @classmethod
+    def deserialize_from(cls, view: memoryview, offset: int) -> tuple[Union[list, np.ndarray], int]:
+        ptr, size, _ = HEADER.unpack_from(view, offset)
+        list_type = cls._list_type
+        pos = offset + ptr
+        if ctx_numpy_lists.get() and (info := cls._array_info()) is not None:
+            dtype, count = info
+            if size == 0:
+                return cls._as_array(np.empty(cls._array_shape(0, count), dtype)), offset + 0x10
+            pos += -pos % list_type.alignment
+            # Copy the data so that the array doesn't keep the view (and any file mapping) alive.
+            data = np.frombuffer(view, dtype, size * count, pos).reshape(cls._array_shape(size, count))
+            return cls._as_array(data.copy()), offset + 0x10
+        if size == 0:
+            return [], offset + 0x10
+        prim = list_type._primitive()
+        if prim is not None and prim.encoding is None:
+            # Fixed-size primitives can be unpacked all at once.
+            pos += -pos % list_type.alignment
+            if prim.count == 1:
+                data = list(struct.unpack_from(f"<{size}{prim.fmt}", view, pos))
+            else:
+                length = size * struct.calcsize("<" + prim.fmt)
+                data = list(struct.iter_unpack("<" + prim.fmt, view[pos:pos + length]))
+        else:
+            data = []
+            for _ in range(size):
+                value, pos = list_type._read_from(view, pos)
+                data.append(value)
+        return data, offset + 0x10
+
+    @classmethod
+    def deserialize_selected(cls, buf: BufferedReader, selection: dict) -> list:
         start = buf.tell()
         offset, size, _ = struct.unpack("<QII", buf.read(0x10))
         ret = buf.tell()
         buf.seek(start + offset)
         data = []
         for _ in range(size):
-            data.append(cls._list_type._read(buf))
+            data.append(cls._list_type._read_selected(buf, selection))
         buf.seek(ret)
         return data
 
+    @classmethod
+    def deserialize_selected_from(cls, view: memoryview, offset: int, selection: dict) -> tuple[list, int]:
+        ptr, size, _ = HEADER.unpack_from(view, offset)
+        pos = offset + ptr
+        data = []
+        for _ in range(size):
+            value, pos = cls._list_type._read_selected_from(view, pos, selection)
+            data.append(value)
+        return data, offset + 0x10
+
+    @classmethod
+    def deserialize_deferred(cls, view: memoryview, offset: int) -> tuple[Union["DeferredList", list], int]:
+        _, size, _ = HEADER.unpack_from(view, offset)
+        source = view.obj
+        # The internal buffer of a BytesIO is freed when it is closed, after which accessing it crashes, so
+        # only objects which keep their data alive (or fail cleanly once closed) can be kept.
+        if size != 0 and source is not None and not isinstance(source, _BYTESIO_BUFFER):
+            # The offsets are only valid later if the view covers all of the underlying object.
+            with buffer_view(source) as base:
+                covers = base.nbytes == view.nbytes
+            if covers:
+                return DeferredList(cls, source, offset, size), offset + 0x10
+        return cls.deserialize_from(view, offset)
+
     @classmethod
     def serialize(cls, buf: BufferedWriter, value):
         ptr = buf.tell()
-        buf.write(struct.pack("<QII", 0, 0, cls._end_padding))
+        write_placeholder(buf, HEADER.pack(0, 0, cls._end_padding))
         yield
+        if isinstance(value, DeferredList):
+            value = value.load()
         cls._list_type._write_padding(buf)
         offset = buf.tell()
-        size = len(value)
-        if size != 0:
+        if len(value) != 0:
+            size = cls._write_elements(buf, value)
+            patch(buf, ptr, struct.pack("<QI", offset - ptr, size))
+            record_offset(ptr, offset)
+
+    @classmethod
+    def _write_elements(cls, buf: BufferedWriter, value) -> int:
+        """ Write the elements of the list at the current position and return the number written. """
+        info = cls._array_info()
+        if info is not None and isinstance(value, np.ndarray):
+            dtype, count = info
+            data = np.ascontiguousarray(value, dtype)
+            buf.write(data.view(np.uint8))
+            return data.size // count
+        elif info is not None and info[0].itemsize == 1 and isinstance(value, (bytes, bytearray)):
+            buf.write(value)
+        else:
             for v in value:
                 cls._list_type._write(buf, v)
-            buf.seek(ptr)
-            buf.write(struct.pack("<QI", offset - ptr, size))
+        return len(value)
+
+
+class DeferredList(Sequence):
+    """ An NMS_list which is only deserialized once it is accessed.
+
+    Only the location of the list within the object it was read from is stored, so that object must remain
+    open and unchanged until the list is accessed (or ``load`` is called). Accessing the list after a
+    memory-mapped file has been closed raises a ValueError.
+    Indexing a list of fixed-size structs only reads the requested elements. Anything else reads the entire
+    list, which is then used for all subsequent accesses.
+    """
+    __slots__ = ("list_cls", "_source", "_offset", "_count", "_numpy", "_items", "_data")
+
+    def __init__(self, list_cls: Type[NMS_list], source: Any, offset: int, count: int):
+        self.list_cls = list_cls
+        self._source = source
+        # Offset of the list header within the source.
+        self._offset = offset
+        self._count = count
+        self._numpy = ctx_numpy_lists.get()
+        # Elements which have been read individually.
+        self._items: dict[int, Any] = {}
+        self._data: Union[list, np.ndarray, None] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._data is not None
+
+    def load(self) -> Union[list, np.ndarray]:
+        """ Read the entire list and return it. """
+        if self._data is None:
+            token = ctx_numpy_lists.set(self._numpy)
+            try:
+                with self._source_view() as view:
+                    data, _ = self.list_cls.deserialize_from(view, self._offset)
+            finally:
+                ctx_numpy_lists.reset(token)
+            # Keep any elements already read so that changes made to them aren't lost.
+            for idx, value in self._items.items():
+                data[idx] = value
+            self._data = data
+            self._source = None
+            self._items = {}
+        return self._data
+
+    def _source_view(self):
+        if getattr(self._source, "closed", False):
+            raise ValueError(
+                f"{self.list_cls.__name__} cannot be loaded as the file it was read from is closed"
+            )
+        return buffer_view(self._source)
+
+    def _read_item(self, idx: int) -> Any:
+        list_type = self.list_cls._list_type
+        with self._source_view() as view:
+            ptr, _, _ = HEADER.unpack_from(view, self._offset)
+            start = self._offset + ptr
+            start += -start % list_type.alignment
+            value, _ = list_type._read_from(view, start + idx * list_type.layout().size)
+        return value
+
+    def __len__(self) -> int:
+        if self._data is not None:
+            return len(self._data)
+        return self._count
+
+    def __getitem__(self, idx):
+        if self._data is not None:
+            return self._data[idx]
+        if (
+            isinstance(idx, slice)
+            or (self._numpy and self.list_cls._array_info() is not None)
+            or self.list_cls._list_type.layout().size is None
+        ):
+            return self.load()[idx]
+        if idx < 0:
+            idx += self._count
+        if not 0 <= idx < self._count:
+            raise IndexError("list index out of range")
+        if idx not in self._items:
+            self._items[idx] = self._read_item(idx)
+        return self._items[idx]
+
+    def __iter__(self):
+        return iter(self.load())
+
+    def __eq__(self, other):
+        if isinstance(other, DeferredList):
+            other = other.load()
+        return self.load() == other
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.load(), dtype)
+
+    def __repr__(self) -> str:
+        if self._data is not None:
+            return repr(self._data)
+        return f"<DeferredList of {self._count} {self.list_cls._list_type.__name__}>"
 
 
 class Vector4f(datatype):
@@ -122,32 +378,44 @@ class Vector4i(datatype):
 class Quaternion_list(datatype):
     _size = 0x10
 
+    @staticmethod
+    def _decompress(data: Union[bytes, memoryview]) -> Union[list, np.ndarray]:
+        # Each quaternion is compressed into 3 uint16's.
+        quats = decompress_quats(np.frombuffer(data, "<u2").reshape(-1, 3))
+        if ctx_numpy_lists.get():
+            return quats
+        return [tuple(q) for q in quats.tolist()]
+
     @classmethod
-    def deserialize(cls, buf: BufferedReader) -> list[int]:
+    def deserialize(cls, buf: BufferedReader) -> Union[list, np.ndarray]:
         start = buf.tell()
         offset, size, _ = struct.unpack("<QII", buf.read(0x10))
         ret = buf.tell()
         buf.seek(start + offset)
-        data = []
-        for _ in range(size // 3):
-            data.append(bytes_to_quat(buf))
+        data = buf.read(6 * (size // 3))
         buf.seek(ret)
-        return data
+        return cls._decompress(data)
 
-    # TODO: Write
-    # @classmethod
-    # def serialize(cls, buf: BufferedWriter, value):
-    #     ptr = buf.tell()
-    #     buf.write(struct.pack("<QII", 0, 0, 0xAAAAAA01))
-    #     yield
-    #     cls._list_type._write_padding(buf)
-    #     offset = buf.tell()
-    #     size = len(value)
-    #     if size != 0:
-    #         for v in value:
-    #             cls._list_type._write(buf, v)
-    #         buf.seek(ptr)
-    #         buf.write(struct.pack("<QI", offset - ptr, size))
+    @classmethod
+    def deserialize_from(cls, view: memoryview, offset: int) -> tuple[Union[list, np.ndarray], int]:
+        ptr, size, _ = HEADER.unpack_from(view, offset)
+        start = offset + ptr
+        return cls._decompress(view[start:start + 6 * (size // 3)]), offset + 0x10
+
+    @classmethod
+    def serialize(cls, buf: BufferedWriter, value: Union[list, np.ndarray]):
+        ptr = buf.tell()
+        write_placeholder(buf, HEADER.pack(0, 0, 0xAAAAAA01))
+        yield
+        if len(value) != 0:
+            data = compress_quats(value)
+            # Align to the compressed components.
+            if buf.tell() % 2 != 0:
+                buf.write(b"\x00")
+            offset = buf.tell()
+            buf.write(data.astype("<u2").view(np.uint8))
+            patch(buf, ptr, struct.pack("<QI", offset - ptr, data.size))
+            record_offset(ptr, offset)
 
 
 @dataclass
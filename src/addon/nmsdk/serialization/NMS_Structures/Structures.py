@@ -2,11 +2,15 @@ import struct
 from contextvars import ContextVar
 from dataclasses import dataclass
 from io import BufferedReader, BufferedWriter
-from typing import Annotated, Type
+from typing import Annotated, Optional, Type, Union
+
+import numpy as np
 
 from ..cereal_bin import basic_types as bt
 from ..cereal_bin.structdata import Field, datatype
+from ..cereal_bin.writer import patch, record_offset, write_placeholder
 from .NMS_types import (
+    HEADER,
     NMS_list,
     NMSString0x10,
     NMSString0x40,
@@ -45,21 +49,41 @@ class NMSTemplate(datatype):
         return data
 
     @classmethod
-    def serialize(cls, buf: BufferedWriter, value):
-        raise NotImplementedError()
-        # ptr = buf.tell()
-        # buf.write(struct.pack("<QII", 0, 0, cls._end_padding))
-        # yield
-        # cls._list_type._write_padding(buf)
-        # offset = buf.tell()
-        # size = len(value)
-        # if size != 0:
-        #     for v in value:
-        #         cls._list_type._write(buf, v)
-        #     buf.seek(ptr)
-        #     buf.write(struct.pack("<QI", offset - ptr, size))
+    def deserialize_from(cls, view: memoryview, offset: int) -> tuple[datatype, int]:
+        ptr, namehash, _ = HEADER.unpack_from(view, offset)
+        if namehash in STRUCT_MAPPING:
+            data, _ = STRUCT_MAPPING[namehash].read_from(view, offset + ptr)
+        else:
+            # If the namehash is in the non-ignored namehash list, then raise an error, otherwise ignore.
+            if namehash in ctx_nonignored_namehashes.get():
+                raise ValueError(f"Unknown struct with name hash 0x{namehash:X}")
+            data = None
+        return data, offset + 0x10
+
+    @classmethod
+    def serialize(cls, buf: BufferedWriter, value: Optional[datatype]):
+        ptr = buf.tell()
+        if value is None:
+            # An empty template has no data and a namehash of 0.
+            write_placeholder(buf, HEADER.pack(0, 0, cls._end_padding))
+            yield
+            return
+        type_ = type(value)
+        try:
+            namehash = NAMEHASH_MAPPING[type_.__name__]
+        except KeyError:
+            raise ValueError(f"Cannot write {type_.__name__} as a template as it has no name hash") from None
+        write_placeholder(buf, HEADER.pack(0, namehash, cls._end_padding))
+        yield
+        type_._write_padding(buf)
+        offset = buf.tell()
+        # Any pointers in the value are written at the end of the buffer as part of the same write.
+        value.write(buf, False)
+        patch(buf, ptr, struct.pack("<Q", offset - ptr))
+        record_offset(ptr, offset)
 
 
+@dataclass
 class LinkableNMSTemplate(datatype):
     Template: Annotated[NMSTemplate, Field(NMSTemplate)]
     Linked: Annotated[str, Field(VariableSizeString)]
@@ -81,14 +105,14 @@ class TkMaterialFxFlags(datatype):
 @dataclass
 class TkMaterialUniform_Float(datatype):
     Values: Annotated[tuple[float, float, float, float], Field(Vector4f)]
-    ExtendedValues: Annotated[list[tuple[float, float, float, float]], Field(NMS_list[Vector4f])]
+    ExtendedValues: Annotated[np.ndarray, Field(NMS_list[Vector4f])]
     Name: Annotated[str, Field(VariableSizeString)]
 
 
 @dataclass
 class TkMaterialUniform_UInt(datatype):
     Values: Annotated[tuple[int, int, int, int], Field(Vector4i)]
-    ExtendedValues: Annotated[list[tuple[int, int, int, int]], Field(NMS_list[Vector4i])]
+    ExtendedValues: Annotated[np.ndarray, Field(NMS_list[Vector4i])]
     Name: Annotated[str, Field(VariableSizeString)]
 
 
@@ -197,23 +221,26 @@ class TkMeshMetaData(datatype):
 class TkGeometryData(datatype):
     PositionVertexLayout: Annotated[TkVertexLayout, Field(TkVertexLayout)]
     VertexLayout: Annotated[TkVertexLayout, Field(TkVertexLayout)]
-    BoundHullVertEd: Annotated[list[int], Field(NMS_list[bt.int32, 1])]
-    BoundHullVerts: Annotated[list[tuple[float, float, float, float]], Field(NMS_list[Vector4f, 1])]
-    BoundHullVertSt: Annotated[list[int], Field(NMS_list[bt.int32, 1])]
-    # TODO: See if it's possible to read directly with numpy.
-    IndexBuffer: Annotated[list[int], Field(NMS_list[bt.int32, 1])]
+    BoundHullVertEd: Annotated[np.ndarray, Field(NMS_list[bt.int32, 1], deferred_loading=True)]
+    BoundHullVerts: Annotated[np.ndarray, Field(NMS_list[Vector4f, 1])]
+    BoundHullVertSt: Annotated[np.ndarray, Field(NMS_list[bt.int32, 1], deferred_loading=True)]
+    IndexBuffer: Annotated[np.ndarray, Field(NMS_list[bt.int32, 1])]
     JointBindings: Annotated[list[TkJointBindingData], Field(NMS_list[TkJointBindingData, 1])]
-    JointExtents: Annotated[list[TkJointExtentData], Field(NMS_list[TkJointExtentData, 1])]
-    JointMirrorAxes: Annotated[list[TkJointMirrorAxis], Field(NMS_list[TkJointMirrorAxis, 1])]
-    JointMirrorPairs: Annotated[list[int], Field(NMS_list[bt.int32, 1])]
-    MeshAABBMax: Annotated[list[tuple[float, float, float, float]], Field(NMS_list[Vector4f, 1])]
-    MeshAABBMin: Annotated[list[tuple[float, float, float, float]], Field(NMS_list[Vector4f, 1])]
-    MeshBaseSkinMat: Annotated[list[int], Field(NMS_list[bt.int32, 1])]
-    MeshVertREnd: Annotated[list[int], Field(NMS_list[bt.int32, 1])]
-    MeshVertRStart: Annotated[list[int], Field(NMS_list[bt.int32, 1])]
-    ProcGenNodeNames: Annotated[list[str], Field(NMS_list[VariableSizeString, 1])]
-    ProcGenParentId: Annotated[list[int], Field(NMS_list[bt.int32, 1])]
-    SkinMatrixLayout: Annotated[list[int], Field(NMS_list[bt.int32, 1])]
+    JointExtents: Annotated[
+        list[TkJointExtentData], Field(NMS_list[TkJointExtentData, 1], deferred_loading=True)
+    ]
+    JointMirrorAxes: Annotated[
+        list[TkJointMirrorAxis], Field(NMS_list[TkJointMirrorAxis, 1], deferred_loading=True)
+    ]
+    JointMirrorPairs: Annotated[np.ndarray, Field(NMS_list[bt.int32, 1], deferred_loading=True)]
+    MeshAABBMax: Annotated[np.ndarray, Field(NMS_list[Vector4f, 1], deferred_loading=True)]
+    MeshAABBMin: Annotated[np.ndarray, Field(NMS_list[Vector4f, 1], deferred_loading=True)]
+    MeshBaseSkinMat: Annotated[np.ndarray, Field(NMS_list[bt.int32, 1])]
+    MeshVertREnd: Annotated[np.ndarray, Field(NMS_list[bt.int32, 1], deferred_loading=True)]
+    MeshVertRStart: Annotated[np.ndarray, Field(NMS_list[bt.int32, 1], deferred_loading=True)]
+    ProcGenNodeNames: Annotated[list[str], Field(NMS_list[VariableSizeString, 1], deferred_loading=True)]
+    ProcGenParentId: Annotated[np.ndarray, Field(NMS_list[bt.int32, 1], deferred_loading=True)]
+    SkinMatrixLayout: Annotated[np.ndarray, Field(NMS_list[bt.int32, 1])]
     StreamMetaDataArray: Annotated[list[TkMeshMetaData], Field(NMS_list[TkMeshMetaData, 1])]
     CollisionIndexCount: Annotated[int, Field(bt.int32)]
     IndexCount: Annotated[int, Field(bt.int32)]
@@ -224,8 +251,8 @@ class TkGeometryData(datatype):
 @dataclass
 class TkMeshData(datatype):
     IdString: Annotated[str, Field(VariableSizeString[0xFEFE0101, b"\xFE"])]
-    MeshDataStream: Annotated[bytearray, Field(NMS_list[bt.uint8, 0xFEFE0101])]
-    MeshPositionDataStream: Annotated[bytearray, Field(NMS_list[bt.uint8, 0xFEFE0101])]
+    MeshDataStream: Annotated[Union[bytes, np.ndarray], Field(NMS_list[bt.uint8, 0xFEFE0101])]
+    MeshPositionDataStream: Annotated[Union[bytes, np.ndarray], Field(NMS_list[bt.uint8, 0xFEFE0101])]
     Hash: Annotated[int, Field(bt.uint64)]
     IndexDataSize: Annotated[int, Field(bt.int32)]
     VertexDataSize: Annotated[int, Field(bt.int32)]
@@ -238,15 +265,17 @@ class TkGeometryStreamData(datatype):
 
 
 # Scene related
+# Scenes can contain a very large number of nodes, so these use slots to reduce the memory used by each one.
 
 
-@dataclass
+@dataclass(slots=True)
 class TkSceneNodeAttributeData(datatype):
-    Name: Annotated[str, Field(bt.string, length=0x10)]
+    # There are only a few different attribute names, so each one is only stored once.
+    Name: Annotated[str, Field(bt.string, length=0x10, intern=True)]
     Value: Annotated[str, Field(VariableSizeString)]
 
 
-@dataclass
+@dataclass(slots=True)
 class TkTransformData(datatype):
     RotX: Annotated[float, Field(bt.single)] = 0
     RotY: Annotated[float, Field(bt.single)] = 0
@@ -259,12 +288,12 @@ class TkTransformData(datatype):
     TransZ: Annotated[float, Field(bt.single)] = 0
 
 
-@dataclass
+@dataclass(slots=True)
 class TkSceneNodeData(datatype):
     Attributes: Annotated[list[TkSceneNodeAttributeData], Field(NMS_list[TkSceneNodeAttributeData])]
     Children: list["TkSceneNodeData"]
     Name: Annotated[str, Field(VariableSizeString)]
-    Type: Annotated[str, Field(bt.string, length=0x10)]
+    Type: Annotated[str, Field(bt.string, length=0x10, intern=True)]
     Transform: Annotated[TkTransformData, Field(TkTransformData)]
     NameHash: Annotated[int, Field(bt.uint32)]
     PlatformExclusion: Annotated[int, Field(bt.int8)] = 0
@@ -279,9 +308,9 @@ TkSceneNodeData.__annotations__["Children"] = Annotated[
 
 @dataclass
 class TkAnimNodeFrameData(datatype):
-    Rotations: Annotated[list[tuple[float, float, float, float]], Field(Quaternion_list)]
-    Scales: Annotated[list[Vector4f], Field(NMS_list[Vector4f])]
-    Translations: Annotated[list[Vector4f], Field(NMS_list[Vector4f])]
+    Rotations: Annotated[np.ndarray, Field(Quaternion_list)]
+    Scales: Annotated[np.ndarray, Field(NMS_list[Vector4f])]
+    Translations: Annotated[np.ndarray, Field(NMS_list[Vector4f])]
 
 
 @dataclass
@@ -326,8 +355,10 @@ class TkModelDescriptorList(datatype):
 
 @dataclass
 class TkAttachmentData(datatype):
-    AdditionalData: Annotated[list[NMSTemplate], Field(NMS_list[NMSTemplate])]
-    Components: Annotated[list[LinkableNMSTemplate], Field(NMS_list[LinkableNMSTemplate])]
+    AdditionalData: Annotated[list[NMSTemplate], Field(NMS_list[NMSTemplate], deferred_loading=True)]
+    Components: Annotated[
+        list[LinkableNMSTemplate], Field(NMS_list[LinkableNMSTemplate], deferred_loading=True)
+    ]
 
     def iter_attachments(self, type_: Type):
         for att in self.AdditionalData:
@@ -1,9 +1,18 @@
 # geometry stream decompiler
 
+import mmap
+import os
+import sys
 from struct import pack, unpack
 
+import numpy as np
+
 from .utils import pad, read_list_header, read_list_data, list_header
 
+# The size of the chunks used to copy data between files when it can't be
+# done by the OS directly.
+COPY_CHUNK_SIZE = 1 << 20
+
 
 class TkMeshMetaData():
     def __init__(self, data=None):
@@ -98,6 +107,15 @@ class StreamData():
         self.index_data = []        # a list of bytearrays
         self.count = 0
         self.data_offsets = []
+        # The memory-mapped file if the data was read lazily.
+        self._mmap = None
+        self._mapped_fname = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
     def create(self, ids, verts, indexes):
         """
@@ -127,29 +145,71 @@ class StreamData():
         self.vertex_data = verts
         self.index_data = indexes
 
-    def read(self):
+    def read(self, lazy=False):
         """
         Read in the geometry.data.mbin file
         This will load the file into memory and place all the data in
         variables so that they can be easily manipulated
+
+        Parameters
+        ----------
+        lazy : bool
+            If True, only the metadata is read and the file is memory-mapped
+            so that the vertex and index data of each mesh is a memoryview
+            into the file. This is only read from disk when it is used, so
+            the memory used is proportional to the meshes which are accessed.
+            ``close`` should be called once the data is no longer needed.
         """
         with open(self.fname, 'rb') as f:
-            # store header
-            self.header = f.read(0x60)
-            # read TkMeshData list header
-            offset, self.count = read_list_header(f)
-            # jump to start of TkMeshData
-            f.seek(offset, 1)
-            # read in all the metadata
-            for _ in range(self.count):
-                self.metadata.append(TkMeshData(f))
+            self.header, metadata = read_metadata(f)
+            self.metadata.extend(metadata)
+            self.count = len(metadata)
+            if lazy and self.count:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._mapped_fname = self.fname
+                view = memoryview(self._mmap)
+                offset = f.tell()
+                for m in self.metadata:
+                    self.vertex_data.append(view[offset:offset + m.vertex_size])
+                    offset += m.vertex_size
+                    self.index_data.append(view[offset:offset + m.index_size])
+                    offset += m.index_size
+                return
             # read in all the vertex and index data as bytes.
             # we will do no processing
             for m in self.metadata:
                 self.vertex_data.append(f.read(m.vertex_size))
                 self.index_data.append(f.read(m.index_size))
 
+    def vertex_array(self, idx, dtype=np.uint8):
+        """ Get the vertex data of the mesh as an array without copying it. """
+        return np.frombuffer(self.vertex_data[idx], dtype)
+
+    def index_array(self, idx, dtype=np.uint16):
+        """ Get the index data of the mesh as an array without copying it. """
+        return np.frombuffer(self.index_data[idx], dtype)
+
+    def close(self):
+        """ Release the memory-mapped file if the data was read lazily. """
+        if self._mmap is None:
+            return
+        views = self.vertex_data + self.index_data
+        self.vertex_data = []
+        self.index_data = []
+        try:
+            for view in views:
+                view.release()
+            self._mmap.close()
+        except BufferError:
+            # Arrays still refer to the data, so leave the file mapped until
+            # they are garbage collected.
+            pass
+        self._mmap = None
+
     def save(self):
+        if self._mmap is not None and self.fname == self._mapped_fname:
+            # Truncating the file would invalidate the data being written.
+            raise ValueError(f'{self.fname} cannot be overwritten while it is memory-mapped')
         with open(self.fname, 'wb') as f:
             # keep a list of the locations that we need to overwrite the offset
             # of.
@@ -184,6 +244,126 @@ class StreamData():
         return new
 
 
+def read_metadata(f):
+    """ Read the header and the metadata of each mesh of a geometry stream.
+    The file is left at the start of the vertex and index data.
+    """
+    # store header
+    header = f.read(0x60)
+    # read TkMeshData list header
+    offset, count = read_list_header(f)
+    # jump to start of TkMeshData
+    f.seek(offset, 1)
+    # read in all the metadata
+    return header, [TkMeshData(f) for _ in range(count)]
+
+
+def merge_streams(fnames, out_fname):
+    """ Merge a number of geometry streams into one.
+
+    This gives the same result as adding the StreamData of each file together
+    and saving it, but only the metadata is read into memory. The vertex and
+    index data of each file is copied directly into the merged file.
+
+    Parameters
+    ----------
+    fnames : list of str
+        The paths of the geometry streams to merge.
+    out_fname : str
+        The path to write the merged geometry stream to. This cannot be one of
+        the streams being merged.
+
+    Returns
+    -------
+    metadata : list of TkMeshData
+        The metadata of every mesh in the merged stream.
+    """
+    sources = []
+    for fname in fnames:
+        with open(fname, 'rb') as f:
+            header, metadata = read_metadata(f)
+            size = sum(m.vertex_size + m.index_size for m in metadata)
+            sources.append((fname, f.tell(), size, header, metadata))
+    if not sources:
+        raise ValueError('No geometry streams to merge')
+    if os.path.exists(out_fname):
+        for fname in fnames:
+            if os.path.samefile(out_fname, fname):
+                # Opening the output would truncate the data still to be copied.
+                raise ValueError(f'{out_fname} cannot be overwritten as it is being merged')
+    metadata = [m for source in sources for m in source[4]]
+    count = len(metadata)
+
+    # Each mesh's data immediately follows the previous one's, so the offsets
+    # can be computed before anything is written.
+    start = 0x60 + 0x10
+    data_offset = start + 0xA0 * count
+    out = bytearray(sources[0][3])
+    out += list_header(0x10, count, 1)
+    for i, m in enumerate(metadata):
+        list_data_loc = start + 0xA0 * i + 0x90
+        meta = bytes(m)
+        out += meta[:0x90] + pack('<Q', data_offset - list_data_loc) + meta[0x98:]
+        data_offset += m.vertex_size + m.index_size
+
+    with open(out_fname, 'wb', buffering=0) as dst:
+        _write_all(dst, out)
+        for fname, offset, size, _, _ in sources:
+            with open(fname, 'rb') as src:
+                _copy_range(src, dst, offset, size)
+    return metadata
+
+
+def _copy_file_range(src_fd, dst_fd, offset, count):
+    return os.copy_file_range(src_fd, dst_fd, count, offset)
+
+
+def _sendfile(src_fd, dst_fd, offset, count):
+    return os.sendfile(dst_fd, src_fd, offset, count)
+
+
+_FAST_COPIES = []
+if hasattr(os, 'copy_file_range'):
+    _FAST_COPIES.append(_copy_file_range)
+# Only linux can sendfile to a regular file.
+if hasattr(os, 'sendfile') and sys.platform.startswith('linux'):
+    _FAST_COPIES.append(_sendfile)
+
+
+def _copy_range(src, dst, offset, size):
+    """ Copy ``size`` bytes from ``offset`` in the file ``src`` to the current
+    position of the unbuffered file ``dst``.
+    """
+    end = offset + size
+    for copy in _FAST_COPIES:
+        try:
+            while offset < end:
+                copied = copy(src.fileno(), dst.fileno(), offset, end - offset)
+                if copied == 0:
+                    break
+                offset += copied
+        except OSError:
+            # Not supported for these files, so try the next way. Any other
+            # error will happen again below.
+            continue
+        if offset == end:
+            return
+    src.seek(offset)
+    while offset < end:
+        chunk = src.read(min(COPY_CHUNK_SIZE, end - offset))
+        if not chunk:
+            raise ValueError(f'{src.name} is shorter than its metadata says')
+        _write_all(dst, chunk)
+        offset += len(chunk)
+
+
+def _write_all(dst, data):
+    # Unbuffered files may not write everything at once.
+    view = memoryview(data)
+    while view:
+        view = view[dst.write(view):]
+
+
 class GeometryData():
     def __init__(self, fname):
         self.fname = fname
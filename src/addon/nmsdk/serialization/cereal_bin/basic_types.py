@@ -1,6 +1,9 @@
 from io import BufferedWriter
 import struct
+import sys
+from typing import Optional
 
+from .codec import Primitive
 from .structdata import datatype, Field
 
 
@@ -75,21 +78,46 @@ class string(datatype):
     _alignment = 1
 
     @classmethod
-    def _read(cls, buf: BufferedWriter, meta: Field) -> str:
+    def _primitive(cls, meta: Optional[Field] = None) -> Optional[Primitive]:
+        if meta is not None and meta.length:
+            fmt = cls._format.format(length=meta.length)
+        elif "{" not in cls._format:
+            fmt = cls._format
+        else:
+            return None
+        encoding = (meta and meta.encoding) or "utf-8"
+        return Primitive(fmt, 1, encoding)
+
+    @classmethod
+    def _read(cls, buf: BufferedWriter, meta: Optional[Field] = None) -> str:
         cls._skip_padding(buf)
-        if meta.length:
+        if meta is not None and meta.length:
             fmt = cls._format.format(length=meta.length)
         else:
             fmt = cls._format
-        encoding = meta.encoding or "utf-8"
-        return struct.unpack(fmt, buf.read(meta.length))[0].decode(encoding).strip("\x00")
+        encoding = (meta and meta.encoding) or "utf-8"
+        value = struct.unpack(fmt, buf.read(struct.calcsize(fmt)))[0].decode(encoding).strip("\x00")
+        return sys.intern(value) if meta is not None and meta.intern else value
+
+    @classmethod
+    def _read_from(cls, view: memoryview, offset: int, meta: Optional[Field] = None) -> tuple[str, int]:
+        offset += -offset % cls._codec_plan().alignment
+        if meta is not None and meta.length:
+            length = meta.length
+        else:
+            length = struct.calcsize(cls._format)
+        encoding = (meta and meta.encoding) or "utf-8"
+        value = str(view[offset:offset + length], encoding).strip("\x00")
+        if meta is not None and meta.intern:
+            value = sys.intern(value)
+        return value, offset + length
 
     @classmethod
-    def _write(cls, buf: BufferedWriter, value: str, meta: Field):
+    def _write(cls, buf: BufferedWriter, value: str, meta: Optional[Field] = None):
         cls._write_padding(buf)
-        if meta.length:
+        if meta is not None and meta.length:
             fmt = cls._format.format(length=meta.length)
         else:
             fmt = cls._format
-        encoding = meta.encoding or "utf-8"
+        encoding = (meta and meta.encoding) or "utf-8"
         buf.write(struct.pack(fmt, value.encode(encoding)))
\ No newline at end of file
@@ -0,0 +1,46 @@
+"""Helpers to get a memoryview over the data of a file so that it can be read with ``datatype.read_from``.
+"""
+
+import mmap
+import os
+from contextlib import contextmanager
+from io import BytesIO
+from typing import BinaryIO, Iterator, Union
+
+
+@contextmanager
+def buffer_view(
+    source: Union[str, os.PathLike, BinaryIO, bytes, bytearray, memoryview],
+) -> Iterator[memoryview]:
+    """ Provide a memoryview over the entire contents of a file without copying it.
+
+    Parameters
+    ----------
+    source
+        A path, an open binary file, an in-memory ``BytesIO`` or any bytes-like object.
+        Files on disk are memory-mapped. ``BytesIO`` objects are viewed through the bytes returned by
+        ``getvalue``, which shares their data unless it has been modified, so the view stays valid after the
+        ``BytesIO`` is closed.
+        The view always starts at the beginning of the data, regardless of the current position of any file
+        object provided.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f, buffer_view(f) as view:
+            yield view
+    elif isinstance(source, BytesIO):
+        with memoryview(source.getvalue()) as view:
+            yield view
+    elif hasattr(source, "fileno"):
+        try:
+            mapped = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # Empty files cannot be mapped, so fall back to reading the file.
+            source.seek(0)
+            with memoryview(source.read()) as view:
+                yield view
+            return
+        with mapped, memoryview(mapped) as view:
+            yield view
+    else:
+        with memoryview(source) as view:
+            yield view
@@ -0,0 +1,567 @@
+"""Precompiled codec plans for datatype subclasses.
+
+Reading or writing a struct by walking its ``__annotations__`` means unpacking the field metadata, checking
+the generic origins and building struct format strings for every field of every instance.
+Instead, the first time a datatype subclass is (de)serialized its annotations are walked once and compiled
+into a ``CodecPlan`` which is cached on the class.
+Runs of adjacent fixed-size primitive fields are merged into a single precompiled ``struct.Struct`` with the
+padding between them resolved up front, and everything else is handed off to the field type directly.
+
+All offsets in a plan are relative to the start of the struct, which is always aligned to the alignment of
+the struct before it is read or written.
+"""
+
+import inspect
+import struct
+import sys
+from functools import lru_cache
+from operator import attrgetter
+from types import GenericAlias, MappingProxyType
+from typing import TYPE_CHECKING, Any, Iterable, Mapping, NamedTuple, Optional, Type, Union
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from .structdata import Field, datatype
+
+
+class Primitive(NamedTuple):
+    """ Description of how a fixed-size primitive value is packed. """
+    # The struct format (without any byte order character).
+    fmt: str
+    # The number of values the format unpacks to.
+    count: int
+    # If the value is a string, the encoding used to convert it to and from bytes.
+    encoding: Optional[str] = None
+
+
+# How the values unpacked for a field of a run are converted back to the python value.
+SCALAR = 0
+TUPLE = 1
+LIST = 2
+STRING = 3
+
+
+class RunField(NamedTuple):
+    name: str
+    kind: int
+    # Index of the first value of this field in the unpacked data.
+    index: int
+    count: int
+    encoding: Optional[str] = None
+    # Whether string values are interned.
+    intern: bool = False
+
+
+class Run:
+    """ A run of adjacent fixed-size primitive fields handled by a single ``struct.Struct``.
+
+    Any padding before and between the fields is included in the format as pad bytes.
+    """
+    __slots__ = ("struct", "fields", "names", "getter", "is_scalar")
+
+    def __init__(self, fmt: str, fields: list[RunField]):
+        self.struct = struct.Struct("<" + fmt)
+        self.fields = tuple(fields)
+        self.names = tuple(f.name for f in fields)
+        self.is_scalar = all(f.kind == SCALAR for f in fields)
+        if len(self.names) == 1:
+            name = self.names[0]
+            self.getter = lambda obj: (getattr(obj, name),)
+        else:
+            self.getter = attrgetter(*self.names)
+
+    @property
+    def name(self) -> str:
+        return ", ".join(self.names)
+
+    def read(self, buf, values: dict):
+        self.assign(self.struct.unpack(buf.read(self.struct.size)), values)
+
+    def read_from(self, view: memoryview, offset: int, values: dict) -> int:
+        self.assign(self.struct.unpack_from(view, offset), values)
+        return offset + self.struct.size
+
+    def selected(self, selection: dict) -> bool:
+        return any(name in selection for name in self.names)
+
+    def read_selected(self, buf, values: dict, selection: dict):
+        data = {}
+        self.read(buf, data)
+        values.update((name, data[name]) for name in self.names if name in selection)
+
+    def read_selected_from(self, view: memoryview, offset: int, values: dict, selection: dict) -> int:
+        data = {}
+        offset = self.read_from(view, offset, data)
+        values.update((name, data[name]) for name in self.names if name in selection)
+        return offset
+
+    def assign(self, data: tuple, values: dict):
+        """ Convert the unpacked data to the value of each field. """
+        if self.is_scalar:
+            values.update(zip(self.names, data))
+            return
+        for field in self.fields:
+            if field.kind == SCALAR:
+                values[field.name] = data[field.index]
+            elif field.kind == STRING:
+                value = data[field.index].decode(field.encoding).strip("\x00")
+                values[field.name] = sys.intern(value) if field.intern else value
+            elif field.kind == TUPLE:
+                values[field.name] = data[field.index:field.index + field.count]
+            else:
+                values[field.name] = list(data[field.index:field.index + field.count])
+
+    def write(self, buf, obj: Any):
+        vals = self.getter(obj)
+        if self.is_scalar:
+            buf.write(self.struct.pack(*vals))
+            return
+        flat = []
+        for field, val in zip(self.fields, vals):
+            if field.kind == SCALAR:
+                flat.append(val)
+            elif field.kind == STRING:
+                flat.append(val.encode(field.encoding))
+            else:
+                flat.extend(val)
+        buf.write(self.struct.pack(*flat))
+
+
+class Delegate:
+    """ A single field which is read and written by its own type. """
+    __slots__ = ("name", "type_", "meta", "write_meta", "length")
+
+    def __init__(self, name: str, type_: Type["datatype"], meta: "Field", length: Optional[int]):
+        self.name = name
+        self.type_ = type_
+        self.meta = meta
+        # Fields with a length get their metadata passed along when being written.
+        self.write_meta = meta if meta.length is not None and meta.length > 0 else None
+        # If not None, the field is a fixed-length array of elements of the type.
+        self.length = length
+
+    def read(self, buf, values: dict):
+        if self.length:
+            type_ = self.type_
+            meta = self.meta
+            values[self.name] = [type_._read(buf, meta) for _ in range(self.length)]
+        else:
+            values[self.name] = self.type_._read(buf, self.meta)
+
+    def read_from(self, view: memoryview, offset: int, values: dict) -> int:
+        type_ = self.type_
+        meta = self.meta
+        if self.length:
+            data = []
+            for _ in range(self.length):
+                value, offset = type_._read_from(view, offset, meta)
+                data.append(value)
+            values[self.name] = data
+        else:
+            values[self.name], offset = type_._read_from(view, offset, meta)
+        return offset
+
+    def selected(self, selection: dict) -> bool:
+        return self.name in selection
+
+    def read_selected(self, buf, values: dict, selection: dict):
+        sub = selection[self.name]
+        if sub is None:
+            self.read(buf, values)
+        elif self.length:
+            values[self.name] = [self.type_._read_selected(buf, sub) for _ in range(self.length)]
+        else:
+            values[self.name] = self.type_._read_selected(buf, sub)
+
+    def read_selected_from(self, view: memoryview, offset: int, values: dict, selection: dict) -> int:
+        sub = selection[self.name]
+        if sub is None:
+            return self.read_from(view, offset, values)
+        if self.length:
+            data = []
+            for _ in range(self.length):
+                value, offset = self.type_._read_selected_from(view, offset, sub)
+                data.append(value)
+            values[self.name] = data
+        else:
+            values[self.name], offset = self.type_._read_selected_from(view, offset, sub)
+        return offset
+
+    def write(self, buf, obj: Any):
+        val = getattr(obj, self.name)
+        if self.write_meta is not None:
+            if isinstance(val, list):
+                for v in val:
+                    self.type_._write(buf, v)
+            else:
+                self.type_._write(buf, val, self.write_meta)
+        else:
+            self.type_._write(buf, val)
+
+
+class Layout(NamedTuple):
+    """ The static layout of a datatype subclass. """
+    alignment: int
+    # The number of bytes from the start to the end of the last field, excluding any trailing padding.
+    extent: Optional[int]
+    # The number of bytes including trailing padding, which is the distance between elements in a list.
+    size: Optional[int]
+    # The offset of each field relative to the start of the struct. Empty for non-struct types.
+    offsets: Optional[Mapping[str, int]]
+    # Whether every value of the type is written in exactly ``size`` bytes, with no data anywhere else.
+    fixed: bool
+
+
+class CodecPlan:
+    """ The compiled (de)serialization information for a single datatype subclass.
+
+    Plans are created once per class by ``compile_plan`` and must not be modified afterwards.
+    """
+    __slots__ = (
+        "cls", "steps", "names", "offsets", "field_offsets", "alignment", "extent", "deserializes",
+        "deserializes_from", "deserializes_deferred", "deserializes_selected", "serializes", "defers",
+        "struct", "slotted",
+    )
+
+    def __init__(self, cls: Type["datatype"]):
+        self.cls = cls
+        self.alignment: int = type_alignment(cls)
+        # The steps used to read and write the fields of a struct type. Empty for non-struct types.
+        self.steps: tuple = ()
+        # The names of all the fields of a struct type.
+        self.names: tuple[str, ...] = ()
+        # The offset of the start of each step relative to the start of the struct, or None if they can't all
+        # be determined statically.
+        self.offsets: Optional[tuple[int, ...]] = None
+        # The offset of each field relative to the start of the struct, if they can all be determined.
+        self.field_offsets: Optional[dict[str, int]] = None
+        # The number of bytes from the start of the type to the end of its last field (excluding any
+        # trailing padding), or None if it cannot be determined statically.
+        self.extent: Optional[int] = getattr(cls, "_size", None)
+        # Whether the type provides its own deserialize/serialize methods, and whether the serialize method
+        # is a generator which writes some data at the end of the buffer.
+        self.deserializes = overrides(cls, "deserialize")
+        self.deserializes_from = overrides(cls, "deserialize_from")
+        self.deserializes_deferred = overrides(cls, "deserialize_deferred")
+        self.deserializes_selected = overrides(cls, "deserialize_selected")
+        self.serializes = overrides(cls, "serialize")
+        self.defers = self.serializes and inspect.isgeneratorfunction(cls.serialize)
+        # Whether instances store their fields in slots instead of a __dict__.
+        self.slotted = not any("__dict__" in vars(base) for base in cls.__mro__)
+        # Precompiled struct for types with a fixed format.
+        self.struct: Optional[struct.Struct] = None
+        fmt = getattr(cls, "_format", None)
+        if fmt is not None and "{" not in fmt:
+            self.struct = struct.Struct(fmt)
+
+    def new(self, values: dict) -> Any:
+        """ Create an instance with the given field values without calling ``__init__``. """
+        cls = self.cls
+        obj = cls.__new__(cls)
+        if self.slotted:
+            for name, value in values.items():
+                setattr(obj, name, value)
+        else:
+            obj.__dict__.update(values)
+        return obj
+
+    def read(self, buf):
+        cls = self.cls
+        values = {}
+        try:
+            for step in self.steps:
+                step.read(buf, values)
+        except Exception:
+            print(f"Error reading {cls.__name__}.{step.name} at offset 0x{buf.tell():X}")
+            raise
+        return self.new(values)
+
+    def read_from(self, view: memoryview, offset: int) -> tuple[Any, int]:
+        cls = self.cls
+        values = {}
+        try:
+            for step in self.steps:
+                offset = step.read_from(view, offset, values)
+        except Exception:
+            print(f"Error reading {cls.__name__}.{step.name} at offset 0x{offset:X}")
+            raise
+        return self.new(values), offset
+
+    def read_selected(self, buf, selection: dict):
+        """ Read only the fields in the selection, skipping over the others.
+
+        Fields which aren't selected are set to None.
+        """
+        if self.offsets is None:
+            return self._filter(self.read(buf), selection)
+        values = dict.fromkeys(self.names)
+        start = buf.tell()
+        for step, offset in zip(self.steps, self.offsets):
+            if step.selected(selection):
+                buf.seek(start + offset)
+                step.read_selected(buf, values, selection)
+        buf.seek(start + self.extent)
+        return self.new(values)
+
+    def read_selected_from(self, view: memoryview, offset: int, selection: dict) -> tuple[Any, int]:
+        if self.offsets is None:
+            obj, offset = self.read_from(view, offset)
+            return self._filter(obj, selection), offset
+        values = dict.fromkeys(self.names)
+        for step, step_offset in zip(self.steps, self.offsets):
+            if step.selected(selection):
+                step.read_selected_from(view, offset + step_offset, values, selection)
+        return self.new(values), offset + self.extent
+
+    def _filter(self, obj: Any, selection: dict) -> Any:
+        for name in self.names:
+            if name not in selection:
+                setattr(obj, name, None)
+        return obj
+
+    def write(self, buf, obj: Any):
+        for step in self.steps:
+            step.write(buf, obj)
+
+
+def overrides(cls: Type["datatype"], method: str) -> bool:
+    """ Determine whether the class overrides the given method of the base ``datatype`` class. """
+    from .structdata import datatype
+    return getattr(cls, method).__func__ is not getattr(datatype, method).__func__
+
+
+def type_alignment(cls: Type["datatype"]) -> int:
+    """ Determine the alignment of the type from its fields, unless it is specified explicitly. """
+    if hasattr(cls, "_alignment"):
+        return cls._alignment
+    alignment = 1
+    for _, _, meta in fields(cls):
+        alignment = max(alignment, meta.datatype.alignment)
+    return alignment
+
+
+def is_struct(cls: Type["datatype"]) -> bool:
+    """ Whether the type is a struct read field-by-field from its annotations. """
+    return not (
+        hasattr(cls, "_format")
+        or overrides(cls, "deserialize")
+        or overrides(cls, "deserialize_from")
+        or overrides(cls, "_read")
+    )
+
+
+def fields(cls: Type["datatype"]):
+    """ Iterate over the (name, annotation, Field) of each serialized field of a struct. """
+    for name, pytype in cls.__annotations__.items():
+        if name.startswith("_"):
+            continue
+        try:
+            meta: "Field" = pytype.__metadata__[0]
+        except (AttributeError, IndexError):
+            raise TypeError(f"{cls.__name__}.{name} ({pytype}) is missing its Field metadata") from None
+        yield name, pytype, meta
+
+
+def is_array(pytype: Any, meta: "Field") -> bool:
+    """ Whether the field is a fixed-length array of its datatype. """
+    origin = pytype.__origin__
+    return bool(isinstance(origin, GenericAlias) and issubclass(origin.__origin__, list) and meta.length)
+
+
+def get_plan(cls: Type["datatype"]) -> CodecPlan:
+    """ Get the cached plan for the class, compiling it first if required. """
+    try:
+        return cls.__dict__["_plan"]
+    except KeyError:
+        plan = compile_plan(cls)
+        cls._plan = plan
+        return plan
+
+
+def compile_plan(cls: Type["datatype"]) -> CodecPlan:
+    plan = CodecPlan(cls)
+    if not is_struct(cls):
+        return plan
+
+    steps = []
+    offsets: list[Optional[int]] = []
+    field_offsets: dict[str, int] = {}
+    run_fmt = ""
+    run_fields: list[RunField] = []
+    run_values = 0
+    # Current offset relative to the start of the struct, or None once it can't be known statically.
+    offset: Optional[int] = 0
+
+    def flush():
+        nonlocal run_fmt, run_fields, run_values
+        if run_fields:
+            steps.append(Run(run_fmt, run_fields))
+        run_fmt = ""
+        run_fields = []
+        run_values = 0
+
+    for name, pytype, meta in fields(cls):
+        type_ = meta.datatype
+        alignment = type_.alignment
+        array = is_array(pytype, meta)
+        prim = type_._primitive(meta)
+        if array and prim is not None and (prim.count != 1 or prim.encoding is not None):
+            prim = None
+        if offset is not None and prim is not None:
+            if not run_fields:
+                offsets.append(offset)
+            padding = -offset % alignment
+            field_offsets[name] = offset + padding
+            if padding:
+                run_fmt += f"{padding}x"
+            if array:
+                count = meta.length
+                run_fmt += prim.fmt * count
+                kind = LIST
+            else:
+                count = prim.count
+                run_fmt += prim.fmt
+                if prim.encoding is not None:
+                    kind = STRING
+                elif count == 1:
+                    kind = SCALAR
+                else:
+                    kind = TUPLE
+            run_fields.append(RunField(name, kind, run_values, count, prim.encoding, meta.intern))
+            run_values += count
+            offset += padding + struct.calcsize("<" + prim.fmt) * (meta.length if array else 1)
+            continue
+        flush()
+        offsets.append(offset)
+        steps.append(Delegate(name, type_, meta, meta.length if array else None))
+        if offset is not None:
+            extent = _extent(type_, meta)
+            if extent is None:
+                offset = None
+            else:
+                padding = -offset % alignment
+                field_offsets[name] = offset + padding
+                if array:
+                    # Every element is aligned, so pad the extent up to the alignment between each one.
+                    stride = extent + (-extent % alignment)
+                    extent = stride * (meta.length - 1) + extent
+                offset += padding + extent
+    flush()
+
+    plan.steps = tuple(steps)
+    plan.names = tuple(name for name, _, _ in fields(cls))
+    plan.extent = offset
+    if offset is not None:
+        plan.offsets = tuple(offsets)
+        plan.field_offsets = field_offsets
+    return plan
+
+
+def get_layout(cls: Type["datatype"]) -> Layout:
+    """ Get the cached layout of the class, determining it first if required. """
+    try:
+        return cls.__dict__["_layout"]
+    except KeyError:
+        pass
+    plan = get_plan(cls)
+    if is_struct(cls):
+        extent = plan.extent
+        offsets = None if plan.field_offsets is None else MappingProxyType(plan.field_offsets)
+        fixed = extent is not None and all(_is_fixed(meta.datatype, meta) for _, _, meta in fields(cls))
+    else:
+        extent = _extent(cls, None)
+        offsets = MappingProxyType({})
+        fixed = cls._primitive() is not None
+    size = None if extent is None else extent + (-extent % plan.alignment)
+    layout = Layout(plan.alignment, extent, size, offsets, fixed)
+    cls._layout = layout
+    return layout
+
+
+def struct_dtype(cls: Type["datatype"]) -> Optional[np.dtype]:
+    """ Create an aligned structured numpy dtype with the same layout as the struct.
+
+    This is only possible for fixed size structs whose fields are all numbers, or arrays or structs of them.
+    Returns None for any other type.
+    """
+    layout = get_layout(cls)
+    if not (is_struct(cls) and layout.fixed and layout.offsets is not None):
+        return None
+    names, formats = [], []
+    for name, pytype, meta in fields(cls):
+        type_ = meta.datatype
+        shape = (meta.length, ) if is_array(pytype, meta) else ()
+        prim = type_._primitive(meta)
+        if prim is not None:
+            if prim.encoding is not None or len(set(prim.fmt)) != 1:
+                return None
+            base = np.dtype("<" + prim.fmt[0])
+            if base.itemsize * prim.count != struct.calcsize("<" + prim.fmt):
+                return None
+            if prim.count != 1:
+                shape += (prim.count, )
+        else:
+            base = type_.dtype()
+            if base is None:
+                return None
+        names.append(name)
+        formats.append((base, shape) if shape else base)
+    return np.dtype({
+        "names": names,
+        "formats": formats,
+        "offsets": [layout.offsets[name] for name in names],
+        "itemsize": layout.size,
+    })
+
+
+def _is_fixed(type_: Type["datatype"], meta: "Field") -> bool:
+    return type_._primitive(meta) is not None or (is_struct(type_) and get_layout(type_).fixed)
+
+
+def selection(cls: Type["datatype"], paths: Union[str, Iterable[str]]) -> Mapping[str, Optional[Mapping]]:
+    """ Convert dotted field paths into a tree of the fields to select from the struct.
+
+    Each field maps to either None if it should be read entirely, or the selection of its own fields.
+    For fields which are lists of structs the selection is applied to each element.
+    The tree is cached, so it is read-only.
+    """
+    if isinstance(paths, str):
+        paths = (paths, )
+    return _selection(cls, frozenset(paths))
+
+
+@lru_cache(maxsize=None)
+def _selection(cls: Type["datatype"], paths: frozenset[str]) -> Mapping[str, Optional[Mapping]]:
+    types = {name: meta.datatype for name, _, meta in fields(cls)}
+    children: dict[str, set[str]] = {}
+    whole: set[str] = set()
+    for path in paths:
+        name, _, rest = path.partition(".")
+        if name not in types:
+            raise ValueError(f"{cls.__name__} has no field {name!r}")
+        if rest:
+            children.setdefault(name, set()).add(rest)
+        else:
+            whole.add(name)
+    tree: dict[str, Optional[Mapping]] = dict.fromkeys(whole)
+    for name, rest in children.items():
+        if name in whole:
+            continue
+        type_ = types[name]
+        # Select from the elements of lists.
+        type_ = getattr(type_, "_list_type", type_)
+        if not is_struct(type_):
+            raise ValueError(f"{cls.__name__}.{name} has no fields to select from")
+        tree[name] = _selection(type_, frozenset(rest))
+    return MappingProxyType(tree)
+
+
+def _extent(type_: Type["datatype"], meta: Optional["Field"]) -> Optional[int]:
+    """ The number of bytes occupied by a value of the type, excluding any trailing padding. """
+    prim = type_._primitive(meta)
+    if prim is not None:
+        return struct.calcsize("<" + prim.fmt)
+    if is_struct(type_):
+        return get_plan(type_).extent
+    return getattr(type_, "_size", None)
@@ -0,0 +1,312 @@
+"""Generated (de)serialization functions for datatype subclasses.
+
+This is an alternative engine to looping over the steps of a ``CodecPlan``. The first time a struct is
+(de)serialized the source of its ``read``, ``read_from`` and ``write`` functions is generated from its plan
+and ``exec``'d, in the same way ``dataclasses`` generates ``__init__``.
+The struct formats, field offsets and padding are inlined as constants, and the fields which are pointers
+(lists, strings etc.) and sub-structs call straight into the methods which handle them instead of going
+through the generic ``_read``/``_write`` dispatch.
+
+As with the plans, the start of a struct is assumed to be aligned to the alignment of the struct.
+"""
+
+import linecache
+import sys
+from typing import TYPE_CHECKING, Any, Callable, Optional, Type
+
+from .codec import LIST, SCALAR, STRING, TUPLE, Delegate, Run, _extent, get_plan, is_struct
+from .writer import write_context
+
+if TYPE_CHECKING:
+    from .structdata import datatype
+
+
+class GeneratedCodec:
+    """ The generated functions used to (de)serialize a single datatype subclass. """
+    __slots__ = ("cls", "source", "read", "read_from", "write")
+
+    def __init__(self, cls: Type["datatype"], source: str, namespace: dict):
+        self.cls = cls
+        self.source = source
+        self.read: Callable[[Any], Any] = namespace["read"]
+        self.read_from: Callable[[memoryview, int], tuple[Any, int]] = namespace["read_from"]
+        self.write: Callable[[Any, Any], None] = namespace["write"]
+
+
+def get_generated(cls: Type["datatype"]) -> GeneratedCodec:
+    """ Get the cached generated functions for the class, generating them first if required. """
+    try:
+        return cls.__dict__["_generated"]
+    except KeyError:
+        generated = generate(cls)
+        cls._generated = generated
+        return generated
+
+
+def generate(cls: Type["datatype"]) -> GeneratedCodec:
+    if not is_struct(cls):
+        raise TypeError(f"Cannot generate code for {cls.__name__} as it is not a struct")
+    builder = _Builder(cls)
+    source = "\n".join(builder.read() + builder.read_from() + builder.write()) + "\n"
+    filename = f"<cereal_bin generated {cls.__module__}.{cls.__qualname__}>"
+    namespace = dict(builder.globals)
+    exec(compile(source, filename, "exec"), namespace)
+    # Register the source so that tracebacks through the generated code show the line which failed.
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    return GeneratedCodec(cls, source, namespace)
+
+
+class _Field:
+    """ A delegated field along with where it is located in the struct. """
+    __slots__ = ("step", "index", "alignment", "offset", "extent")
+
+    def __init__(self, step: Delegate, index: int, offset: Optional[int]):
+        self.step = step
+        self.index = index
+        self.alignment = step.type_.alignment
+        # The offset of the field (including any padding before it) if it is known statically.
+        self.offset = None if offset is None else offset + (-offset % self.alignment)
+        self.extent = _extent(step.type_, step.meta)
+        if self.extent is not None and step.length:
+            stride = self.extent + (-self.extent % self.alignment)
+            self.extent = stride * (step.length - 1) + self.extent
+
+
+class _Builder:
+    def __init__(self, cls: Type["datatype"]):
+        self.cls = cls
+        self.plan = get_plan(cls)
+        self.globals: dict[str, Any] = {"_cls": cls, "_new": cls.__new__, "_intern": sys.intern}
+        # The static offset of the start of each step, or None once it can no longer be known.
+        self.offsets: list[Optional[int]] = []
+        offset = 0
+        for step in self.plan.steps:
+            self.offsets.append(offset)
+            if offset is None:
+                continue
+            if isinstance(step, Run):
+                offset += step.struct.size
+            else:
+                field = _Field(step, 0, offset)
+                offset = None if field.extent is None else field.offset + field.extent
+
+    def const(self, name: str, value: Any) -> str:
+        self.globals[name] = value
+        return name
+
+    def fields(self):
+        for idx, (step, offset) in enumerate(zip(self.plan.steps, self.offsets)):
+            if isinstance(step, Run):
+                yield step, idx, offset
+            else:
+                yield _Field(step, idx, offset), idx, offset
+
+    def delegated(self, field: _Field) -> tuple[str, str]:
+        """ Add the type and metadata of a delegated field to the globals. """
+        idx = field.index
+        return self.const(f"_T{idx}", field.step.type_), self.const(f"_M{idx}", field.step.meta)
+
+    def nested(self, field: _Field) -> Optional[GeneratedCodec]:
+        """ The generated functions of the field if it is a sub-struct, otherwise None. """
+        type_ = field.step.type_
+        plan = type_._codec_plan()
+        if field.step.length or not is_struct(type_) or plan.serializes:
+            return None
+        return get_generated(type_)
+
+    def build_object(self) -> list[str]:
+        lines = ["    obj = _new(_cls)"]
+        if self.plan.slotted:
+            lines.extend(f"    obj.{name} = f_{name}" for name in self.plan.names)
+        else:
+            values = ", ".join(f"{name!r}: f_{name}" for name in self.plan.names)
+            lines.append(f"    obj.__dict__.update({{{values}}})")
+        return lines
+
+    # Reading from a stream.
+
+    def read(self) -> list[str]:
+        lines = ["def read(buf):", "    _read = buf.read"]
+        for field, idx, offset in self.fields():
+            if isinstance(field, Run):
+                self.const(f"_S{idx}", field.struct.unpack)
+                lines.extend(self.unpack_run(field, f"_S{idx}(_read({field.struct.size}))"))
+                continue
+            lines.extend(self.read_padding(field, offset))
+            name = field.step.name
+            type_name, meta_name = self.delegated(field)
+            plan = field.step.type_._codec_plan()
+            if field.step.length:
+                reads = f"{type_name}._read(buf, {meta_name}) for _ in range({field.step.length})"
+                lines.append(f"    f_{name} = [{reads}]")
+            elif (generated := self.nested(field)) is not None:
+                lines.append(f"    f_{name} = {self.const(f'_R{idx}', generated.read)}(buf)")
+            elif plan.deserializes:
+                lines.append(f"    f_{name} = {self.const(f'_R{idx}', field.step.type_.deserialize)}(buf)")
+            else:
+                lines.append(f"    f_{name} = {type_name}._read(buf, {meta_name})")
+        lines.extend(self.build_object())
+        lines.extend(["    return obj", ""])
+        return lines
+
+    def read_padding(self, field: _Field, offset: Optional[int]) -> list[str]:
+        """ Skip the padding before a delegated field in a stream. """
+        if field.alignment == 1:
+            return []
+        if offset is not None:
+            padding = field.offset - offset
+            return [f"    buf.seek({padding}, 1)"] if padding else []
+        return [
+            f"    _pad = buf.tell() % {field.alignment}",
+            "    if _pad:",
+            f"        buf.seek({field.alignment} - _pad, 1)",
+        ]
+
+    def unpack_run(self, run: Run, expr: str) -> list[str]:
+        """ Unpack the values of a run and convert them to the value of each field. """
+        if run.is_scalar:
+            targets = "".join(f"f_{name}, " for name in run.names)
+            return [f"    {targets}= {expr}"]
+        lines = [f"    _d = {expr}"]
+        for field in run.fields:
+            if field.kind == SCALAR:
+                value = f"_d[{field.index}]"
+            elif field.kind == STRING:
+                value = f"_d[{field.index}].decode({field.encoding!r}).strip('\\x00')"
+                if field.intern:
+                    value = f"_intern({value})"
+            elif field.kind == TUPLE:
+                value = f"_d[{field.index}:{field.index + field.count}]"
+            elif field.kind == LIST:
+                value = f"list(_d[{field.index}:{field.index + field.count}])"
+            lines.append(f"    f_{field.name} = {value}")
+        return lines
+
+    # Reading from memory.
+
+    def read_from(self) -> list[str]:
+        lines = ["def read_from(view, offset):"]
+        # While the offset of each step is known, ``offset`` stays at the start of the struct and the position
+        # of each field is given relative to it. Once it isn't known, ``offset`` is the current position.
+        end = 0
+        for field, idx, offset in self.fields():
+            if isinstance(field, Run):
+                self.const(f"_F{idx}", field.struct.unpack_from)
+                lines.extend(self.unpack_run(field, f"_F{idx}(view, {self.position(offset)})"))
+                end = offset + field.struct.size
+                continue
+            name = field.step.name
+            type_name, meta_name = self.delegated(field)
+            # Whether the offset after the field needs to be kept.
+            advances = field.offset is None or field.extent is None
+            target = f"f_{name}, offset" if advances else f"f_{name}, _"
+            plan = field.step.type_._codec_plan()
+            if field.step.length:
+                if field.offset is not None:
+                    lines.append(f"    _offset = {self.position(offset)}")
+                else:
+                    lines.append("    _offset = offset")
+                lines.extend([
+                    f"    f_{name} = []",
+                    f"    for _ in range({field.step.length}):",
+                    f"        _v, _offset = {type_name}._read_from(view, _offset, {meta_name})",
+                    f"        f_{name}.append(_v)",
+                ])
+                if advances:
+                    lines.append("    offset = _offset")
+            elif field.offset is None:
+                lines.append(f"    {target} = {type_name}._read_from(view, offset, {meta_name})")
+            else:
+                position = self.position(field.offset)
+                if (generated := self.nested(field)) is not None:
+                    func = self.const(f"_RF{idx}", generated.read_from)
+                elif field.step.meta.deferred_loading and plan.deserializes_deferred:
+                    func = self.const(f"_RF{idx}", field.step.type_.deserialize_deferred)
+                elif plan.deserializes_from:
+                    func = self.const(f"_RF{idx}", field.step.type_.deserialize_from)
+                else:
+                    func = None
+                if func is not None:
+                    lines.append(f"    {target} = {func}(view, {position})")
+                else:
+                    lines.append(f"    {target} = {type_name}._read_from(view, {position}, {meta_name})")
+            if not advances:
+                end = field.offset + field.extent
+            else:
+                end = None
+        lines.extend(self.build_object())
+        lines.extend([f"    return obj, {self.position(end)}", ""])
+        return lines
+
+    @staticmethod
+    def position(offset: Optional[int]) -> str:
+        if offset is None:
+            return "offset"
+        return f"offset + {offset}" if offset else "offset"
+
+    # Writing.
+
+    def write(self) -> list[str]:
+        lines = ["def write(buf, obj):", "    _write = buf.write"]
+        if any(isinstance(step, Delegate) and step.type_._codec_plan().defers for step in self.plan.steps):
+            self.const("_context", write_context.get)
+            lines.extend([
+                "    _ctx = _context()",
+                "    if _ctx is None:",
+                f"        raise RuntimeError('{self.cls.__name__} can only be written as part of a write')",
+                "    _deferred = _ctx.deferred.append",
+            ])
+        for field, idx, offset in self.fields():
+            if isinstance(field, Run):
+                pack = self.const(f"_P{idx}", field.struct.pack)
+                values = ", ".join(self.pack_value(f) for f in field.fields)
+                lines.append(f"    _write({pack}({values}))")
+                continue
+            name = field.step.name
+            type_name, meta_name = self.delegated(field)
+            plan = field.step.type_._codec_plan()
+            generated = self.nested(field)
+            if field.step.write_meta is not None:
+                lines.extend([
+                    f"    _v = obj.{name}",
+                    "    if isinstance(_v, list):",
+                    "        for _e in _v:",
+                    f"            {type_name}._write(buf, _e)",
+                    "    else:",
+                    f"        {type_name}._write(buf, _v, {meta_name})",
+                ])
+            elif generated is not None or plan.defers:
+                lines.extend(self.write_padding(field, offset))
+                if generated is not None:
+                    lines.append(f"    {self.const(f'_W{idx}', generated.write)}(buf, obj.{name})")
+                else:
+                    lines.extend([
+                        f"    _gen = {self.const(f'_W{idx}', field.step.type_.serialize)}(buf, obj.{name})",
+                        "    next(_gen)",
+                        "    _deferred(_gen)",
+                    ])
+            else:
+                lines.append(f"    {type_name}._write(buf, obj.{name})")
+        lines.append("")
+        return lines
+
+    def write_padding(self, field: _Field, offset: Optional[int]) -> list[str]:
+        if field.alignment == 1:
+            return []
+        if offset is not None:
+            padding = field.offset - offset
+            return [f"    _write({bytes(padding)!r})"] if padding else []
+        return [
+            f"    _pad = buf.tell() % {field.alignment}",
+            "    if _pad:",
+            f"        _write(bytes({field.alignment} - _pad))",
+        ]
+
+    @staticmethod
+    def pack_value(field) -> str:
+        if field.kind == SCALAR:
+            return f"obj.{field.name}"
+        elif field.kind == STRING:
+            return f"obj.{field.name}.encode({field.encoding!r})"
+        return f"*obj.{field.name}"
+
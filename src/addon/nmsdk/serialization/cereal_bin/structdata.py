@@ -1,36 +1,50 @@
-import inspect
+import os
 import struct
 from dataclasses import dataclass
 from io import BufferedReader, BufferedWriter, BytesIO
+from mmap import mmap
 from types import GenericAlias
-from typing import Any, Optional, Type, TypeVar, Union
+from typing import Any, BinaryIO, Iterable, Optional, Type, TypeVar, Union
+
+import numpy as np
+
+from .codec import (
+    CodecPlan,
+    Layout,
+    Primitive,
+    get_layout,
+    get_plan,
+    overrides,
+    selection,
+    struct_dtype,
+)
+from .codegen import GeneratedCodec, get_generated
+from .writer import ForwardSink, LayoutSink, WriteContext, write_context
 
 T = TypeVar("T", bound="datatype")
 N = TypeVar("N", bound=int)
 
+# The engine used to (de)serialize structs. One of:
+#   "plan": Loop over the steps of the precompiled codec plans (see codec.py).
+#   "codegen": Call functions generated from the codec plans (see codegen.py).
+#   "walk": Walk the annotations for every instance. This is kept as the reference implementation the other
+#       engines can be compared to.
+# The default can be changed with the NMSDK_CODEC_ENGINE environment variable.
+CODEC_ENGINES = ("plan", "codegen", "walk")
+CODEC_ENGINE = os.environ.get("NMSDK_CODEC_ENGINE", "plan")
+if CODEC_ENGINE not in CODEC_ENGINES:
+    raise ValueError(f"Invalid NMSDK_CODEC_ENGINE {CODEC_ENGINE!r}. Must be one of {CODEC_ENGINES}")
+
 
 class AlignedData(type):
     @property
-    def alignment(cls):
-        if hasattr(cls, "_alignment"):
-            return cls._alignment
-        alignment_ = 1
-        for name, type_ in cls.__annotations__.items():
-            if name.startswith("_"):
-                continue
-            meta: Field = type_.__metadata__[0]
-            type_: datatype = meta.datatype
-            if name.startswith("_"):
-                continue
-            if type_.alignment > alignment_:
-                alignment_ = type_.alignment
-            if alignment_ == 0x10:
-                return alignment_
-        return alignment_
+    def alignment(cls) -> int:
+        return cls._codec_plan().alignment
 
 
 class datatype(metaclass=AlignedData):
-    _deferred_structs = []
+    # Subclasses may use slots to store their fields.
+    __slots__ = ()
 
     @property
     def alignment(self):
@@ -40,72 +54,140 @@ class datatype(metaclass=AlignedData):
             return type(self).alignment
 
     @classmethod
-    def total_size(cls: "datatype"):
-        if hasattr(cls, "_size"):
-            return cls._size
-        _max_alignment = 0
-        _current_pos = 0
-        for name, type_ in cls.__annotations__.items():
-            if name.startswith("_"):
-                continue
-            if hasattr(type_, "_alignment"):
-                _alignment = type_._alignment
-                _max_alignment = max(_max_alignment, _alignment)
-                if _current_pos % _alignment != 0:
-                    _current_pos += (_alignment - (_current_pos % _alignment))
-
-            if hasattr(type_, "_size"):
-                _current_pos += type_._size
-            else:
-                if issubclass(type_, datatype):
-                    _current_pos += type_.total_size()
+    def layout(cls) -> Layout:
+        """ The static layout of the type. This is determined the first time it's needed and then cached. """
+        try:
+            return cls.__dict__["_layout"]
+        except KeyError:
+            return get_layout(cls)
+
+    @classmethod
+    def dtype(cls) -> Optional[np.dtype]:
+        """ A structured numpy dtype matching the layout of the type, if it is a fixed size struct of numbers.
+
+        Lists of these types are read as numpy record arrays instead of lists of instances.
+        """
+        try:
+            return cls.__dict__["_dtype"]
+        except KeyError:
+            dtype = struct_dtype(cls)
+            cls._dtype = dtype
+            return dtype
+
+    @classmethod
+    def total_size(cls) -> Optional[int]:
+        """ The number of bytes a value of this type takes up in place, including any trailing padding.
+
+        This doesn't include any data pointed to by lists or strings. Returns None if the size is not static.
+        """
+        return cls.layout().size
 
     @property
-    def size(self):
-        if hasattr(self, "_size"):
-            return self._size
-        _size = 0
-        for name, type_ in self.__annotations__.items():
-            if name.startswith("_"):
-                continue
-            try:
-                _size += type_.size
-            except:
-                print(name)
-                raise
+    def size(self) -> int:
+        """ The total number of bytes this value will be serialized as, including all pointed to data. """
+        sink = LayoutSink()
+        self._write_top(sink, WriteContext({}))
+        return sink.end
 
     @classmethod
     def deserialize(cls, buf: BufferedReader):
         raise NotImplementedError
 
+    @classmethod
+    def deserialize_from(cls, view: memoryview, offset: int) -> tuple[Any, int]:
+        """ Deserialize the value located at ``offset`` in ``view``.
+
+        This is the counterpart to ``deserialize`` used when reading from memory. It must return the value
+        and the offset immediately after the data read in place.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def deserialize_deferred(cls, view: memoryview, offset: int) -> tuple[Any, int]:
+        """ Deserialize a field marked with ``deferred_loading`` located at ``offset`` in ``view``.
+
+        Types supporting this should return a proxy which only reads the data once it is accessed. The proxy
+        may keep a reference to the object ``view`` was created from, but not to ``view`` itself.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def deserialize_selected(cls, buf: BufferedReader, selection: dict) -> Any:
+        """ Deserialize only the selected fields of the struct(s) contained in this type.
+
+        ``selection`` is a tree of field names as created by ``codec.selection``. Types implementing this must
+        also implement ``deserialize_selected_from``.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def deserialize_selected_from(cls, view: memoryview, offset: int, selection: dict) -> tuple[Any, int]:
+        raise NotImplementedError
+
     @classmethod
     def serialize(cls, buf: BufferedWriter, value: Any):
         raise NotImplementedError
 
     @classmethod
     def _write_padding(cls, buf: BufferedWriter):
-        if (misalignment := buf.tell() % cls.alignment) != 0:
-            padding = b"\x00" * (cls.alignment - misalignment)
+        alignment = cls._codec_plan().alignment
+        if (misalignment := buf.tell() % alignment) != 0:
+            padding = b"\x00" * (alignment - misalignment)
             buf.write(padding)
 
     @classmethod
     def _skip_padding(cls, buf: BufferedReader):
-        if (misalignment := buf.tell() % cls.alignment) != 0:
-            buf.seek(cls.alignment - misalignment, 1)
+        alignment = cls._codec_plan().alignment
+        if (misalignment := buf.tell() % alignment) != 0:
+            buf.seek(alignment - misalignment, 1)
+
+    @classmethod
+    def _codec_plan(cls) -> CodecPlan:
+        try:
+            return cls.__dict__["_plan"]
+        except KeyError:
+            return get_plan(cls)
+
+    @classmethod
+    def _codec(cls) -> Union[CodecPlan, GeneratedCodec]:
+        """ The plan or generated functions used to (de)serialize the struct, according to CODEC_ENGINE. """
+        if CODEC_ENGINE == "codegen":
+            try:
+                return cls.__dict__["_generated"]
+            except KeyError:
+                return get_generated(cls)
+        return cls._codec_plan()
+
+    @classmethod
+    def _primitive(cls, meta: Optional["Field"] = None) -> Optional[Primitive]:
+        """ Return how a value of this type is packed if it is a fixed-size primitive, otherwise None. """
+        fmt = getattr(cls, "_format", None)
+        plan = cls._codec_plan()
+        if fmt is None or plan.struct is None or plan.deserializes or plan.deserializes_from:
+            return None
+        if overrides(cls, "_read"):
+            return None
+        fmt = fmt.lstrip("<")
+        return Primitive(fmt, len(plan.struct.unpack(bytes(plan.struct.size))))
 
     @classmethod
     def _write(cls, buf: BufferedWriter, value: Any, meta: Optional["Field"] = None):
         cls._write_padding(buf)
-        try:
-            if inspect.isgeneratorfunction(cls.serialize):
-                gen = cls.serialize(buf, value)
-                next(gen)
-                cls._deferred_structs.append(gen)
-            else:
-                cls.serialize(buf, value)
-            return
-        except (NotImplementedError, AttributeError):
-            pass
+        plan = cls._codec_plan()
+        if plan.serializes:
+            try:
+                if plan.defers:
+                    ctx = write_context.get()
+                    if ctx is None:
+                        raise RuntimeError(f"{cls.__name__} can only be written as part of a struct")
+                    gen = cls.serialize(buf, value)
+                    next(gen)
+                    ctx.deferred.append(gen)
+                else:
+                    cls.serialize(buf, value)
+                return
+            except (NotImplementedError, AttributeError):
+                pass
         if hasattr(cls, "_format"):
             if meta and meta.length is not None:
                 fmt = cls._format.format(meta.length)
@@ -119,6 +201,8 @@ class datatype(metaclass=AlignedData):
                         buf.write(struct.pack("<" + fmt, *value))
                     else:
                         buf.write(struct.pack("<" + fmt * len(value), *value))
+                elif plan.struct is not None:
+                    buf.write(plan.struct.pack(value))
                 else:
                     buf.write(struct.pack(fmt, value))
             except struct.error:
@@ -127,9 +211,91 @@ class datatype(metaclass=AlignedData):
         elif isinstance(value, datatype):
             value.write(buf, False)
 
-    def write(self, buf: Optional[BufferedWriter] = None, _is_top: bool = True) -> BufferedWriter:
+    def write(
+        self,
+        buf: Optional[BufferedWriter] = None,
+        _is_top: bool = True,
+        offsets: Optional[dict[int, int]] = None,
+    ) -> BufferedWriter:
+        """ Write the struct, and anything it points to, to the buffer.
+
+        Parameters
+        ----------
+        buf
+            The buffer to write to. If not provided a new ``BytesIO`` is used.
+        offsets
+            If provided, the position in ``buf`` of the data of every pointer (list, string etc.) which has
+            data is added to this, keyed by the position of the pointer's header.
+
+        Returns
+        -------
+        The buffer written to.
+        """
         if buf is None:
             buf = BytesIO()
+        if _is_top:
+            self._write_top(buf, WriteContext(offsets=offsets))
+        else:
+            self._write_fields(buf)
+        return buf
+
+    def write_forward(
+        self, out: BinaryIO, start: Optional[int] = None, offsets: Optional[dict[int, int]] = None
+    ) -> int:
+        """ Write to a stream sequentially without ever seeking it.
+
+        The layout of the data is determined first so that every header can be written with its final
+        offset, which means ``out`` can be anything with a ``write`` method, such as a pipe or socket.
+        The output is identical to ``write``.
+
+        Parameters
+        ----------
+        out
+            The stream to write to.
+        start
+            The position in the file of the start of the data. This is required for the alignment of the data
+            to be correct. If not provided, the current position of ``out`` is used if possible, otherwise 0.
+        offsets
+            As for ``write``. The positions are relative to the start of the file, as given by ``start``.
+
+        Returns
+        -------
+        The number of bytes written.
+        """
+        if start is None:
+            try:
+                start = out.tell()
+            except (AttributeError, OSError):
+                start = 0
+        layout = {}
+        self._write_top(LayoutSink(start), WriteContext(layout))
+        sink = ForwardSink(out, start)
+        self._write_top(sink, WriteContext(layout, forward=True, offsets=offsets))
+        return sink.pos - start
+
+    def _write_top(self, buf: BufferedWriter, ctx: WriteContext):
+        token = write_context.set(ctx)
+        try:
+            self._write_fields(buf)
+            # Any deferred writes may add more, which are handled by this same loop.
+            for dv in ctx.deferred:
+                try:
+                    # Move to the end of the file every time
+                    buf.seek(0, 2)
+                    next(dv)
+                except StopIteration:
+                    pass
+                dv.close()
+        finally:
+            write_context.reset(token)
+
+    def _write_fields(self, buf: BufferedWriter):
+        if CODEC_ENGINE == "walk":
+            self._walk_write(buf)
+        else:
+            type(self)._codec().write(buf, self)
+
+    def _walk_write(self, buf: BufferedWriter):
         for name, type_ in self.__annotations__.items():
             if name.startswith("_"):
                 continue
@@ -144,43 +310,129 @@ class datatype(metaclass=AlignedData):
                     type_._write(buf, val, meta)
             else:
                 type_._write(buf, val)
-        if _is_top:
-            for dv in self._deferred_structs:
-                try:
-                    # Move to the end of the file every time
-                    buf.seek(0, 2)
-                    next(dv)
-                except StopIteration:
-                    pass
-                dv.close()
-        return buf
 
     @classmethod
     def _read(cls, buf: BufferedReader, meta: Optional["Field"] = None):
         # Align ourselves.
         cls._skip_padding(buf)
-        try:
-            return cls.deserialize(buf)
-        except NotImplementedError:
-            pass
-        if hasattr(cls, "_format"):
+        plan = cls._codec_plan()
+        if plan.deserializes:
+            try:
+                return cls.deserialize(buf)
+            except NotImplementedError:
+                pass
+        if plan.struct is not None:
+            d = plan.struct.unpack(buf.read(plan.struct.size))
+            if len(d) == 1:
+                return d[0]
+            else:
+                return d
+        elif hasattr(cls, "_format"):
             if meta and meta.length is not None:
                 fmt = cls._format.format(length=meta.length)
             else:
                 fmt = cls._format
-            try:
-                d = struct.unpack(fmt, buf.read(struct.calcsize(fmt)))
-                if len(d) == 1:
-                    return d[0]
-                else:
-                    return d
-            except struct.error:
-                raise
+            d = struct.unpack(fmt, buf.read(struct.calcsize(fmt)))
+            if len(d) == 1:
+                return d[0]
+            else:
+                return d
         else:
             return cls.read(buf)
 
     @classmethod
-    def read(cls: Type[T], buf: Union[BytesIO, BufferedReader]) -> T:
+    def _read_from(cls, view: memoryview, offset: int, meta: Optional["Field"] = None) -> tuple[Any, int]:
+        plan = cls._codec_plan()
+        # Align ourselves.
+        offset += -offset % plan.alignment
+        if meta is not None and meta.deferred_loading and plan.deserializes_deferred:
+            return cls.deserialize_deferred(view, offset)
+        if plan.deserializes_from:
+            return cls.deserialize_from(view, offset)
+        elif plan.deserializes:
+            raise NotImplementedError(f"{cls.__name__} cannot be deserialized from memory")
+        if plan.struct is not None:
+            d = plan.struct.unpack_from(view, offset)
+            offset += plan.struct.size
+        elif hasattr(cls, "_format"):
+            if meta and meta.length is not None:
+                fmt = cls._format.format(length=meta.length)
+            else:
+                fmt = cls._format
+            d = struct.unpack_from(fmt, view, offset)
+            offset += struct.calcsize(fmt)
+        else:
+            return cls.read_from(view, offset)
+        if len(d) == 1:
+            return d[0], offset
+        else:
+            return d, offset
+
+    @classmethod
+    def _read_selected(cls, buf: BufferedReader, selection: dict):
+        cls._skip_padding(buf)
+        plan = cls._codec_plan()
+        if plan.deserializes_selected:
+            return cls.deserialize_selected(buf, selection)
+        return plan.read_selected(buf, selection)
+
+    @classmethod
+    def _read_selected_from(cls, view: memoryview, offset: int, selection: dict) -> tuple[Any, int]:
+        plan = cls._codec_plan()
+        offset += -offset % plan.alignment
+        if plan.deserializes_selected:
+            return cls.deserialize_selected_from(view, offset, selection)
+        return plan.read_selected_from(view, offset, selection)
+
+    @classmethod
+    def read_from(
+        cls: Type[T], view: memoryview, offset: int = 0, only: Union[str, Iterable[str], None] = None
+    ) -> tuple[T, int]:
+        """ Read an instance located at ``offset`` in ``view``.
+
+        Any pointers are followed using their offset within ``view`` instead of seeking, so the data is never
+        copied. Returns the instance and the offset immediately after it.
+        See ``read`` for the meaning of ``only``.
+        """
+        if only is not None:
+            return cls._codec_plan().read_selected_from(view, offset, selection(cls, only))
+        return cls._codec().read_from(view, offset)
+
+    @classmethod
+    def from_buffer(
+        cls: Type[T],
+        data: Union[bytes, bytearray, memoryview, mmap],
+        offset: int = 0,
+        only: Union[str, Iterable[str], None] = None,
+    ) -> T:
+        """ Read an instance from any object supporting the buffer protocol. """
+        with memoryview(data) as view:
+            return cls.read_from(view, offset, only)[0]
+
+    @classmethod
+    def read(
+        cls: Type[T], buf: Union[BytesIO, BufferedReader], only: Union[str, Iterable[str], None] = None
+    ) -> T:
+        """ Read an instance from the current position of ``buf``.
+
+        Parameters
+        ----------
+        buf
+            The buffer to read from.
+        only
+            If provided, only the fields with these names are read and all other fields are None.
+            Fields of sub-structs can be selected with a dotted path such as ``"VertexLayout.Stride"``, and
+            for lists of structs the selection is applied to every element.
+            Any unselected fields are skipped over without reading them or following any of their pointers.
+        """
+        if only is not None:
+            return cls._codec_plan().read_selected(buf, selection(cls, only))
+        if CODEC_ENGINE == "walk":
+            return cls._walk_read(buf)
+        return cls._codec().read(buf)
+
+    @classmethod
+    def _walk_read(cls: Type[T], buf: Union[BytesIO, BufferedReader]) -> T:
         cls_ = cls.__new__(cls)
         for name, pytype in cls_.__annotations__.items():
             if name.startswith("_"):
@@ -214,4 +466,9 @@ class Field:
     datatype: Type[datatype]
     length: Optional[int] = None
     encoding: Optional[str] = None
+    # Whether the field should only be deserialized once it is accessed. This is only supported by some types
+    # (such as NMS_list) when reading from a buffer, and is ignored otherwise.
     deferred_loading: bool = False
+    # Whether string values should be interned. This saves memory for strings which are repeated a lot, such
+    # as the names of scene node attributes.
+    intern: bool = False
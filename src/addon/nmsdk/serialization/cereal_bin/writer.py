@@ -0,0 +1,127 @@
+"""State shared by everything written as part of a single top-level ``datatype.write``.
+
+Pointer types (lists, strings etc.) are written in two parts: a header in place, and their data at the end of
+the buffer once the rest of the struct has been written. Serializers do this by writing the header with
+``write_placeholder``, yielding, and then calling ``patch`` with the final header values once the data has
+been written.
+
+Normally ``patch`` seeks back to the header and overwrites it. For forward-only writing the entire write is
+first run against a ``LayoutSink``, which only counts bytes and records the patches. The write is then run a
+second time against a ``ForwardSink``, where each placeholder is written with its patch already applied so
+the output never needs to be seeked.
+
+Serializers also report where the data of each pointer was written with ``record_offset``, so that callers
+of the top-level write can find the data in the output without reading it back.
+"""
+
+import io
+from contextvars import ContextVar
+from typing import Any, BinaryIO, Generator, Optional
+
+
+class WriteContext:
+    __slots__ = ("deferred", "layout", "forward", "offsets")
+
+    def __init__(
+        self,
+        layout: Optional[dict[int, bytes]] = None,
+        forward: bool = False,
+        offsets: Optional[dict[int, int]] = None,
+    ):
+        # The serializers which still need to write their data at the end of the buffer.
+        self.deferred: list[Generator] = []
+        # If not None, the patches to apply to the placeholder at each position.
+        self.layout = layout
+        # Whether the layout has already been determined and the placeholders are written with it applied.
+        self.forward = forward
+        # If not None, the position of the data of each pointer, keyed by the position of its header.
+        self.offsets = offsets
+
+
+# The context of the current top-level write. Each top-level write gets its own context so that writes may
+# happen concurrently or be nested.
+write_context: ContextVar[Optional[WriteContext]] = ContextVar("write_context", default=None)
+
+
+def write_placeholder(buf: BinaryIO, data: bytes):
+    """ Write the header of a pointer type which will be patched once its data has been written. """
+    ctx = write_context.get()
+    if ctx is not None and ctx.forward:
+        patched = ctx.layout.get(buf.tell())
+        if patched is not None:
+            data = patched + data[len(patched):]
+    buf.write(data)
+
+
+def patch(buf: BinaryIO, pos: int, data: bytes):
+    """ Overwrite the start of the placeholder at ``pos`` with ``data``.
+
+    The buffer is left in an unspecified position.
+    """
+    ctx = write_context.get()
+    if ctx is not None and ctx.layout is not None:
+        if not ctx.forward:
+            ctx.layout[pos] = data
+        return
+    buf.seek(pos)
+    buf.write(data)
+
+
+def record_offset(header: int, data: int):
+    """ Record that the data of the pointer whose header is at ``header`` was written at ``data``. """
+    ctx = write_context.get()
+    if ctx is not None and ctx.offsets is not None:
+        ctx.offsets[header] = data
+
+
+class LayoutSink:
+    """ A buffer which only keeps track of the amount of data written to it. """
+
+    def __init__(self, start: int = 0):
+        self.pos = start
+        self.end = start
+
+    def write(self, data: Any) -> int:
+        size = memoryview(data).nbytes
+        self.pos += size
+        self.end = max(self.end, self.pos)
+        return size
+
+    def tell(self) -> int:
+        return self.pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_END:
+            self.pos = self.end + offset
+        elif whence == io.SEEK_CUR:
+            self.pos += offset
+        else:
+            self.pos = offset
+        return self.pos
+
+
+class ForwardSink:
+    """ Pass data through to a stream which can only be written sequentially. """
+
+    def __init__(self, out: BinaryIO, start: int = 0):
+        self.out = out
+        self.pos = start
+
+    def write(self, data: Any) -> int:
+        self.out.write(data)
+        size = memoryview(data).nbytes
+        self.pos += size
+        return size
+
+    def tell(self) -> int:
+        return self.pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        # Data is always appended, so the only valid seeks are to where we already are.
+        if whence == io.SEEK_END or whence == io.SEEK_CUR:
+            target = self.pos + offset
+        else:
+            target = offset
+        if target != self.pos:
+            raise io.UnsupportedOperation(f"Cannot seek to 0x{target:X} while writing forward")
+        return self.pos
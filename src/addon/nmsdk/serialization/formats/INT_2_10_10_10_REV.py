@@ -79,3 +79,16 @@ def write_int_2_10_10_10_rev(verts):
     for i in range(4):
         out = out | (newverts[i] << i * 10)
     return struct.pack('<I', out)
+
+
+def np_write_int_2_10_10_10_rev(verts) -> np.ndarray:
+    """ Optimized version of ``write_int_2_10_10_10_rev``.
+    The input is an array of vectors (only the x, y and z components are used) and this will return an
+    array of little-endian 32 bit ints, one per vector, which are identical to what the scalar version writes.
+    """
+    # Truncate towards zero and take the two's complement of negative values
+    # exactly like the scalar version does.
+    a = np.trunc(np.asarray(verts, dtype=np.float64)[..., :3] * 511).astype(np.int64)
+    a = np.where(a < 0, (-a ^ SEL_0) + 1, a)
+    out = a[..., 0] | (a[..., 1] << 10) | (a[..., 2] << 20) | (1 << 30)
+    return out.astype("<u4")
@@ -1,7 +1,13 @@
+from .blend import np_write_blend_data  # noqa
 from .half import binary16 as write_half  # noqa
 from .half import bytes_to_half  # noqa
+from .half import np_write_half  # noqa
 from .INT_2_10_10_10_REV import write_int_2_10_10_10_rev  # noqa
 from .INT_2_10_10_10_REV import bytes_to_int_2_10_10_10_rev  # noqa
 from .INT_2_10_10_10_REV import np_read_int_2_10_10_10_rev  # noqa
+from .INT_2_10_10_10_REV import np_write_int_2_10_10_10_rev  # noqa
 from .ubyte import bytes_to_ubyte  # noqa
 from .ubyte import ubytes_to_bytes  # noqa
+from .ubyte import np_write_ubytes  # noqa
+from .vertex_layout import np_write_vertex_layout  # noqa
+from .vertex_layout import vertex_dtype  # noqa
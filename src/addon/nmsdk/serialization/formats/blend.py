@@ -0,0 +1,45 @@
+# Encode the joint indices and weights of skinned vertices.
+
+import numpy as np
+
+from .half import np_write_half
+from .ubyte import np_write_ubytes
+
+
+def np_write_blend_data(indices, weights, size=4) -> tuple:
+    """ Generate the BlendIndex and BlendWeight streams of skinned vertices.
+
+    Parameters
+    ----------
+    indices : array_like
+        Array with the indices of the joints (into the skin matrix layout of
+        the mesh) which influence each vertex. Unused influences should have
+        a weight of 0.
+    weights : array_like
+        Array of the same shape with the weight of each influence.
+    size : int
+        The number of influences to write for each vertex. If a vertex has
+        more than this then only the ones with the largest weights are kept.
+
+    Returns
+    -------
+    blend_indices : np.ndarray
+        Array of unsigned bytes with ``size`` columns.
+    blend_weights : np.ndarray
+        Array of halves with ``size`` columns. The weights of each vertex are
+        normalised to add up to 1 and sorted from largest to smallest.
+    """
+    indices = np.asarray(indices)
+    weights = np.asarray(weights, dtype=np.float64)
+    if indices.shape != weights.shape:
+        raise ValueError('The indices and weights must have the same shape.')
+    # Sort the influences of each vertex by weight, largest first.
+    order = np.argsort(-weights, axis=-1, kind='stable')[..., :size]
+    indices = np.take_along_axis(indices, order, axis=-1)
+    weights = np.take_along_axis(weights, order, axis=-1)
+    indices = np.where(weights > 0, indices, 0)
+    total = weights.sum(axis=-1, keepdims=True)
+    weights = np.divide(weights, total, out=np.zeros_like(weights), where=total > 0)
+    blend_weights = np.zeros(weights.shape[:-1] + (size, ), '<f2')
+    blend_weights[..., :weights.shape[-1]] = np_write_half(weights)
+    return np_write_ubytes(indices, size), blend_weights
@@ -9,6 +9,8 @@ from __future__ import division
 import struct
 from math import copysign, frexp, isinf, isnan, trunc
 
+import numpy as np
+
 NEGATIVE_INFINITY = b'\x00\xfc'
 POSITIVE_INFINITY = b'\x00\x7c'
 POSITIVE_ZERO = b'\x00\x00'
@@ -66,6 +68,17 @@ def binary16(f):
     return struct.pack('<H', (sign << 15) | (e16 << 10) | f16)
 
 
+def np_write_half(values) -> np.ndarray:
+    """ Convert an array of floats to binary16 all at once.
+
+    Unlike ``binary16`` the values are rounded to the nearest half (with ties
+    going to even), and any which are too large become infinity.
+    Returns an array of little-endian halves with the same shape.
+    """
+    with np.errstate(over="ignore"):
+        return np.asarray(values).astype("<f2")
+
+
 def bytes_to_half(bytes_) -> tuple:
     """ Read an array of bytes into a list of half's."""
     fmt = '<' + 'H' * (len(bytes_) // 2)
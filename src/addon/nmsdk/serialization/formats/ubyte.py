@@ -1,5 +1,7 @@
 import struct
 
+import numpy as np
+
 
 def bytes_to_ubyte(bytes_: bytes) -> tuple:
     """ Read an array of bytes into a list of unsigned bytes. """
@@ -36,3 +38,30 @@ def ubytes_to_bytes(lst: list, target_length=4) -> bytes:
         lst = list(lst)
     lst.extend([0] * extra_zeros)
     return struct.pack(fmt, *lst)
+
+
+def np_write_ubytes(values, target_length=4) -> np.ndarray:
+    """ Optimized version of ``ubytes_to_bytes`` for an array of lists.
+
+    Parameters
+    ----------
+    values : array_like
+        Array of lists of integers in the range [0, 255].
+    target_length : int
+        Number of bytes to write for each list. Lists shorter than this are
+        padded with zeros.
+
+    Returns
+    -------
+    arr : np.ndarray
+        Array of unsigned bytes with ``target_length`` columns.
+    """
+    values = np.asarray(values)
+    if target_length < values.shape[-1]:
+        raise ValueError('Target length must be equal to or greater than '
+                         'input list length.')
+    if values.size and (values.min() < 0 or values.max() > 255):
+        raise ValueError('Values must be in the range [0, 255].')
+    out = np.zeros(values.shape[:-1] + (target_length, ), np.uint8)
+    out[..., :values.shape[-1]] = values
+    return out
@@ -0,0 +1,74 @@
+# Write the interleaved vertex data described by a TkVertexLayout.
+
+from typing import Mapping
+
+import numpy as np
+
+from .half import np_write_half
+from .INT_2_10_10_10_REV import np_write_int_2_10_10_10_rev
+from .ubyte import np_write_ubytes
+
+# The OpenGL types used by the vertex elements.
+GL_UNSIGNED_BYTE = 5121
+GL_HALF_FLOAT = 5131
+GL_INT_2_10_10_10_REV = 36255
+
+
+def _element_format(element):
+    if element.Type == GL_HALF_FLOAT:
+        return ('<f2', (element.Size, ))
+    elif element.Type == GL_INT_2_10_10_10_REV:
+        # All the components are packed into a single int.
+        return '<u4'
+    elif element.Type == GL_UNSIGNED_BYTE:
+        return ('u1', (element.Size, ))
+    raise ValueError(f'Unsupported vertex element type {element.Type}')
+
+
+def vertex_dtype(layout) -> np.dtype:
+    """ The structured dtype of a vertex described by the TkVertexLayout.
+    The fields are named by the semantic ID of each element.
+    """
+    elements = layout.VertexElements
+    return np.dtype({
+        'names': [str(element.SemanticID) for element in elements],
+        'formats': [_element_format(element) for element in elements],
+        'offsets': [element.Offset for element in elements],
+        'itemsize': layout.Stride,
+    })
+
+
+def np_write_vertex_layout(layout, count: int, streams: Mapping[int, list]) -> np.ndarray:
+    """ Interleave the vertex data for each element of the TkVertexLayout.
+
+    Parameters
+    ----------
+    layout : TkVertexLayout
+        The layout of the vertex data.
+    count : int
+        The number of vertices to write.
+    streams : dict
+        The data for each element, keyed by semantic ID. These must contain
+        at least ``count`` vertices each. Elements with no data are written
+        as zeros.
+
+    Returns
+    -------
+    arr : np.ndarray
+        A structured array with ``vertex_dtype(layout)`` as its dtype.
+    """
+    out = np.zeros(count, vertex_dtype(layout))
+    if count == 0:
+        return out
+    for element in layout.VertexElements:
+        stream = streams.get(element.SemanticID)
+        if stream is None:
+            continue
+        name = str(element.SemanticID)
+        if element.Type == GL_HALF_FLOAT:
+            out[name] = np_write_half(stream[:count])
+        elif element.Type == GL_INT_2_10_10_10_REV:
+            out[name] = np_write_int_2_10_10_10_rev(stream[:count])
+        else:
+            out[name] = np_write_ubytes(stream[:count], element.Size)
+    return out
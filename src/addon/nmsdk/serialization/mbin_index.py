@@ -0,0 +1,173 @@
+"""An index of the MBIN files in an unpacked PCBANKS directory or in the game's pak files.
+
+The 0x20 byte ``MBINHeader`` at the start of every MBIN contains the namehash of the top-level struct, so the
+type of a file can be determined by reading just its header instead of deserializing it. The headers are read
+in parallel and stored along with the size and modification time of each file, so that the index can be saved
+and later brought up to date by only reading the files which have changed since.
+"""
+
+import json
+import os
+import os.path as op
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, NamedTuple, Optional, Union
+
+from .NMS_Structures.NMS_types import MBINHeader
+from .NMS_Structures.Structures import NAMEHASH_MAPPING
+
+# The magic, version, MBIN version, namehash, GUID and timestamp of an MBINHeader.
+_HEADER = struct.Struct("<QHHIQQ")
+_MAGIC = MBINHeader.header_magic
+_INDEX_VERSION = 1
+# Geometry files have an extra .PC suffix.
+_MBIN_SUFFIXES = (".MBIN", ".MBIN.PC")
+
+
+class MBINInfo(NamedTuple):
+    namehash: int
+    guid: int
+    # The uncompressed size of the file.
+    size: int
+    # The modification time of the file, or of the pak containing it.
+    mtime: float
+    # The name of the pak the file is in, or None if it's a loose file.
+    pak: Optional[str] = None
+
+
+def _is_mbin_path(path: str) -> bool:
+    return path.upper().endswith(_MBIN_SUFFIXES)
+
+
+def read_header(data: bytes) -> Optional[tuple[int, int]]:
+    """ Get the namehash and GUID from the start of an MBIN, or None if it doesn't have a valid header. """
+    if len(data) < _HEADER.size:
+        return None
+    magic, _, _, namehash, guid, _ = _HEADER.unpack_from(data)
+    if magic != _MAGIC:
+        return None
+    return namehash, guid
+
+
+def read_file_header(fpath: str) -> Optional[tuple[int, int]]:
+    """ Get the namehash and GUID of an MBIN file, reading only its header. """
+    try:
+        with open(fpath, "rb") as f:
+            return read_header(f.read(_HEADER.size))
+    except OSError:
+        return None
+
+
+class MBINIndex:
+    """ A mapping of the path of each MBIN to its MBINInfo.
+
+    Paths of loose files are relative to the scanned directory and use forward slashes, and paths of files in
+    paks are as they are in the pak.
+    """
+    def __init__(self, files: Optional[dict[str, MBINInfo]] = None):
+        self.files: dict[str, MBINInfo] = files or {}
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.files
+
+    def __getitem__(self, path: str) -> MBINInfo:
+        return self.files[path]
+
+    @classmethod
+    def load(cls, fpath: str) -> "MBINIndex":
+        with open(fpath) as f:
+            data = json.load(f)
+        if data.get("version") != _INDEX_VERSION:
+            return cls()
+        return cls({path: MBINInfo(*info) for path, info in data["files"].items()})
+
+    def save(self, fpath: str):
+        with open(fpath, "w") as f:
+            json.dump({"version": _INDEX_VERSION, "files": self.files}, f)
+
+    def find(self, struct: Union[str, int, None] = None, min_size: int = 0) -> list[str]:
+        """ The paths of all the files with the given top-level struct (by name or namehash) and size. """
+        if isinstance(struct, str):
+            struct = NAMEHASH_MAPPING[struct]
+        return [
+            path for path, info in self.files.items()
+            if (struct is None or info.namehash == struct) and info.size >= min_size
+        ]
+
+    def scan_directory(self, root: str, workers: Optional[int] = None) -> int:
+        """ Update the loose files in the index from the MBINs in the directory.
+
+        Only the files which are new or whose size or modification time has changed are read. Returns the
+        number of files read.
+        """
+        stats = {}
+        for path, entry in _walk(root):
+            if _is_mbin_path(path):
+                stat = entry.stat()
+                stats[path] = (stat.st_size, stat.st_mtime)
+        files = {path: info for path, info in self.files.items() if info.pak is not None}
+        changed = []
+        for path, (size, mtime) in stats.items():
+            info = self.files.get(path)
+            if info is not None and info.pak is None and info.size == size and info.mtime == mtime:
+                files[path] = info
+            else:
+                changed.append(path)
+        with ThreadPoolExecutor(workers) as pool:
+            headers = pool.map(read_file_header, [op.join(root, path) for path in changed])
+            for path, header in zip(changed, headers):
+                if header is not None:
+                    files[path] = MBINInfo(*header, *stats[path])
+        self.files = files
+        return len(changed)
+
+    def scan_paks(self, pcbanks_dir: str, workers: Optional[int] = None) -> int:
+        """ Update the files in the index from the MBINs in the pak files in the directory.
+
+        Only the paks which are new or which have been modified are read. Returns the number of paks read.
+        """
+        paks = {
+            fname: op.getmtime(op.join(pcbanks_dir, fname))
+            for fname in os.listdir(pcbanks_dir) if fname.lower().endswith(".pak")
+        }
+        indexed = {info.pak: info.mtime for info in self.files.values() if info.pak is not None}
+        changed = {fname for fname, mtime in paks.items() if indexed.get(fname) != mtime}
+        files = {
+            path: info for path, info in self.files.items()
+            if info.pak is None or (info.pak in paks and info.pak not in changed)
+        }
+        with ThreadPoolExecutor(workers) as pool:
+            changed = sorted(changed)
+            results = pool.map(lambda fname: _scan_pak(op.join(pcbanks_dir, fname)), changed)
+            for fname, entries in zip(changed, results):
+                for path, header, size in entries:
+                    files[path] = MBINInfo(*header, size, paks[fname], fname)
+        self.files = files
+        return len(changed)
+
+
+def _walk(root: str, prefix: str = "") -> Iterable[tuple[str, os.DirEntry]]:
+    with os.scandir(root) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                # Skip hidden directories such as the .scene_vfs.
+                if not entry.name.startswith("."):
+                    yield from _walk(entry.path, prefix + entry.name + "/")
+            elif entry.is_file():
+                yield prefix + entry.name, entry
+
+
+def _scan_pak(fpath: str) -> list[tuple[str, tuple[int, int], int]]:
+    """ Read the header of every MBIN in the pak. """
+    from hgpaktool import HGPAKFile
+
+    entries = []
+    with HGPAKFile(fpath) as pak:
+        mbins = [path for path in pak.files if _is_mbin_path(path)]
+        for path, data in pak.extract(mbins, max_bytes=_HEADER.size):
+            if (header := read_header(data)) is not None:
+                entries.append((path, header, pak.files[path].size))
+    return entries
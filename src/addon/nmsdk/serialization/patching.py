@@ -0,0 +1,206 @@
+"""Edit individual fields of an MBIN file without reserializing it.
+
+Fields are located by a dotted path from the top-level struct, where the elements of lists (and fixed-size
+arrays) are selected by their index, eg. ``Children[2].Attributes[0].Value`` or ``Transform.TransX``.
+Only the headers of the lists along the path are read to find the field.
+
+Fixed-size values (numbers, fixed length strings and structs of them) are always overwritten in place.
+Strings and lists are written in place if the new value fits in the space used by the existing one, otherwise
+the new value is appended to the end of the file and the header pointing to it is updated. The space used by
+the old value is left in the file unused.
+
+Shortening a string keeps the size of its allocation in its header, so a later longer value can still reuse
+it. The count in the header of a list is its length though, so the patcher remembers the space each list it
+has written was allocated instead. A list which was shortened (or emptied) can grow back into its original
+space with the same patcher, but that space is given up once the file is reopened.
+"""
+
+import io
+import re
+import struct
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Iterator, NamedTuple, Optional, Type
+
+from .cereal_bin.codec import _extent, _is_fixed, fields, get_layout, is_array, is_struct
+from .cereal_bin.structdata import Field, datatype
+from .NMS_Structures import Structures
+from .NMS_Structures.NMS_types import HEADER, MBINHeader, NMS_list, VariableSizeString
+
+_PATH_PART = re.compile(r"(\w+)(?:\[(\d+)\])?")
+
+
+class FieldLocation(NamedTuple):
+    """ Where a field is in the file, and how it is (de)serialized. """
+    type_: Type[datatype]
+    meta: Field
+    offset: int
+
+
+def struct_for_namehash(namehash: int) -> Type[datatype]:
+    """ Get the struct with the given namehash. """
+    for name, value in Structures.NAMEHASH_MAPPING.items():
+        if value == namehash:
+            return getattr(Structures, name)
+    raise ValueError(f"Unknown struct namehash 0x{namehash:X}")
+
+
+class MBINPatcher:
+    """ Read and patch the fields of an MBIN in place.
+
+    Parameters
+    ----------
+    buf
+        The MBIN data. This must be readable, writable and seekable.
+    root
+        The type of the top-level struct. If not provided this is determined from the namehash in the header.
+    start
+        The offset of the top-level struct.
+    """
+    def __init__(self, buf: BinaryIO, root: Optional[Type[datatype]] = None, start: int = MBINHeader._size):
+        self.buf = buf
+        if root is None:
+            buf.seek(0)
+            root = struct_for_namehash(MBINHeader.read(buf).header_namehash)
+        self.root = root
+        self.start = start
+        # The start and capacity (in elements) of the data of each list which has been set, keyed by the
+        # offset of its header.
+        self._list_slots: dict[int, tuple[int, int]] = {}
+
+    @classmethod
+    @contextmanager
+    def open(cls, path: str, root: Optional[Type[datatype]] = None) -> Iterator["MBINPatcher"]:
+        """ Patch the MBIN file at the given path. """
+        with open(path, "r+b") as f:
+            yield cls(f, root)
+
+    def locate(self, path: str) -> FieldLocation:
+        """ Find the field with the given path. """
+        type_, meta, offset = self.root, Field(self.root), self.start
+        for part in path.split("."):
+            match = _PATH_PART.fullmatch(part)
+            if match is None:
+                raise ValueError(f"Invalid field path {path!r}")
+            name, idx = match.groups()
+            struct_fields = {n: (pytype, m) for n, pytype, m in fields(type_)} if is_struct(type_) else {}
+            if name not in struct_fields:
+                raise ValueError(f"{type_.__name__} has no field {name!r}")
+            offsets = get_layout(type_).offsets
+            if offsets is None:
+                raise ValueError(f"The fields of {type_.__name__} are not at fixed offsets")
+            pytype, meta = struct_fields[name]
+            type_ = meta.datatype
+            offset += offsets[name]
+            if idx is not None:
+                type_, meta, offset = self._element(path, type_, pytype, meta, offset, int(idx))
+        return FieldLocation(type_, meta, offset)
+
+    def _element(
+        self, path: str, type_: Type[datatype], pytype: Any, meta: Field, offset: int, idx: int
+    ) -> FieldLocation:
+        if issubclass(type_, NMS_list) and type_ is not NMS_list:
+            ptr, count, _ = self._read_header(offset)
+            if idx >= count:
+                raise IndexError(f"{path}: index {idx} is out of range for a list of {count} elements")
+            element = type_._list_type
+            size = get_layout(element).size
+            if size is None:
+                raise ValueError(f"{path}: the elements of lists of {element.__name__} are not a fixed size")
+            start = offset + ptr
+            start += -start % element.alignment
+            return FieldLocation(element, Field(element), start + idx * size)
+        if is_array(pytype, meta):
+            if idx >= meta.length:
+                raise IndexError(f"{path}: index {idx} is out of range for an array of length {meta.length}")
+            extent = _extent(type_, meta)
+            return FieldLocation(type_, meta, offset + idx * (extent + (-extent % type_.alignment)))
+        raise ValueError(f"{path}: {type_.__name__} cannot be indexed")
+
+    def get(self, path: str) -> Any:
+        """ Read the value of the field with the given path. """
+        loc = self.locate(path)
+        self.buf.seek(loc.offset)
+        return loc.type_._read(self.buf, loc.meta)
+
+    def set(self, path: str, value: Any) -> bool:
+        """ Set the value of the field with the given path.
+
+        Returns whether the value was written in place. If not, it was appended to the end of the file.
+        """
+        loc = self.locate(path)
+        type_ = loc.type_
+        if issubclass(type_, VariableSizeString):
+            return self._set_string(loc, value)
+        if issubclass(type_, NMS_list):
+            return self._set_list(path, loc, value)
+        if not _is_fixed(type_, loc.meta):
+            raise ValueError(f"{path}: values of {type_.__name__} cannot be patched")
+        prim = type_._primitive(loc.meta)
+        if prim is not None and prim.encoding is not None:
+            # Fixed length strings are otherwise silently truncated.
+            size = struct.calcsize("<" + prim.fmt)
+            if len(value.encode(prim.encoding)) > size:
+                raise ValueError(f"{path}: {value!r} is longer than {size} bytes")
+        out = io.BytesIO()
+        type_._write(out, value, loc.meta)
+        self._write_at(loc.offset, out.getvalue())
+        return True
+
+    def _set_string(self, loc: FieldLocation, value: Any) -> bool:
+        type_ = loc.type_
+        ptr, size, _ = self._read_header(loc.offset)
+        value = str(value)
+        if not value:
+            self._write_at(loc.offset, struct.pack("<QI", 0, 0))
+            return True
+        data = value.encode() + b"\x00"
+        if len(data) <= size:
+            # The size is left as the size of the existing allocation so that it can still be reused later.
+            self._write_at(loc.offset + ptr, data + bytes(size - len(data)))
+            return True
+        pad_with = type_._pad_with or b"\x00"
+        offset = self._append(data, 8 if type_._pad_with else 1, pad_with)
+        self._write_at(loc.offset, struct.pack("<QI", offset - loc.offset, len(data)))
+        return False
+
+    def _set_list(self, path: str, loc: FieldLocation, value: Any) -> bool:
+        type_ = loc.type_
+        element = type_._list_type
+        if not _is_fixed(element, Field(element)):
+            raise ValueError(f"{path}: lists of {element.__name__} cannot be patched, they contain pointers")
+        out = io.BytesIO()
+        count = type_._write_elements(out, value) if len(value) else 0
+        data = out.getvalue()
+        slot = self._list_slots.get(loc.offset)
+        if slot is None:
+            ptr, old_count, _ = self._read_header(loc.offset)
+            start = loc.offset + ptr
+            slot = (start + -start % element.alignment, old_count)
+            self._list_slots[loc.offset] = slot
+        start, capacity = slot
+        if count == 0:
+            self._write_at(loc.offset, struct.pack("<QI", 0, 0))
+            return True
+        if count <= capacity:
+            self._write_at(start, data + bytes(capacity * get_layout(element).size - len(data)))
+            self._write_at(loc.offset, struct.pack("<QI", start - loc.offset, count))
+            return True
+        offset = self._append(data, element.alignment)
+        self._list_slots[loc.offset] = (offset, count)
+        self._write_at(loc.offset, struct.pack("<QI", offset - loc.offset, count))
+        return False
+
+    def _read_header(self, offset: int) -> tuple[int, int, int]:
+        self.buf.seek(offset)
+        return HEADER.unpack(self.buf.read(HEADER.size))
+
+    def _write_at(self, offset: int, data: bytes):
+        self.buf.seek(offset)
+        self.buf.write(data)
+
+    def _append(self, data: bytes, alignment: int, pad_with: bytes = b"\x00") -> int:
+        """ Append the data to the end of the file and return the offset it was written at. """
+        end = self.buf.seek(0, io.SEEK_END)
+        padding = -end % alignment
+        self.buf.write(pad_with * padding + data)
+        return end + padding
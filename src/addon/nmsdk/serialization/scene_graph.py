@@ -0,0 +1,119 @@
+"""A flattened representation of a TkSceneNodeData tree.
+
+Instead of an object per node, every property of the nodes is stored in a column indexed by the position of
+the node in a pre-order traversal of the tree (the order the nodes are rendered in). This means that the nodes
+in the subtree of node ``i`` are always the range ``i:ends[i]``, and the parent of a node always has a lower
+index than the node itself.
+"""
+
+from typing import Iterator, Optional
+
+import numpy as np
+
+from .NMS_Structures.Structures import TkSceneNodeData, TkTransformData
+
+
+class SceneGraph():
+    """ The columns of a scene, built in a single pass over a deserialized TkSceneNodeData tree.
+
+    Attributes
+    ----------
+    parents
+        The index of the parent of each node, or -1 for the root.
+    ends
+        The index one past the last node in the subtree of each node.
+    names
+        The name of each node.
+    types
+        The type of each node.
+    transforms
+        The transform of each node as a structured array with the fields of TkTransformData.
+    attribute_offsets
+        The attributes of node ``i`` are ``attribute_offsets[i]:attribute_offsets[i + 1]`` in
+        ``attribute_names`` and ``attribute_values``.
+    """
+    def __init__(self, root: TkSceneNodeData):
+        parents = []
+        names = []
+        types = []
+        transforms = []
+        attribute_offsets = [0]
+        attribute_names = []
+        attribute_values = []
+        stack = [(root, -1)]
+        while stack:
+            node, parent = stack.pop()
+            parents.append(parent)
+            names.append(node.Name)
+            types.append(node.Type)
+            t = node.Transform
+            transforms.append(
+                (t.RotX, t.RotY, t.RotZ, t.ScaleX, t.ScaleY, t.ScaleZ, t.TransX, t.TransY, t.TransZ)
+            )
+            for attribute in node.Attributes:
+                attribute_names.append(attribute.Name)
+                attribute_values.append(attribute.Value)
+            attribute_offsets.append(len(attribute_names))
+            # Push the children in reverse so that they are popped in order.
+            idx = len(parents) - 1
+            stack.extend((child, idx) for child in reversed(node.Children))
+
+        # Every node after the root is in the subtree of its parent, so the subtree sizes can be accumulated
+        # back up the tree by going through the nodes in reverse.
+        sizes = [1] * len(parents)
+        for idx in range(len(parents) - 1, 0, -1):
+            sizes[parents[idx]] += sizes[idx]
+
+        self.parents = np.array(parents, dtype=np.int32)
+        self.ends = np.arange(len(parents), dtype=np.int32) + np.array(sizes, dtype=np.int32)
+        self.names = np.array(names, dtype=object)
+        self.types = np.array(types, dtype=object)
+        self.transforms = np.array(transforms, dtype=TkTransformData.dtype())
+        self.attribute_offsets = np.array(attribute_offsets, dtype=np.int32)
+        self.attribute_names = np.array(attribute_names, dtype=object)
+        self.attribute_values = np.array(attribute_values, dtype=object)
+        self._index = self._build_index()
+
+    def __len__(self) -> int:
+        return len(self.parents)
+
+    def _build_index(self) -> dict[str, int]:
+        index = {}
+        for idx, name in enumerate(self.names):
+            # Sanitize input ID for safety
+            if isinstance(name, str):
+                index.setdefault(name.upper(), idx)
+        return index
+
+    def index(self, name: str) -> Optional[int]:
+        """ The index of the first node with the given name (ignoring case), or None if there isn't one. """
+        return self._index.get(name.upper())
+
+    def rename(self, idx: int, name: Optional[str]):
+        """ Change the name of a node. """
+        self.names[idx] = name
+        self._index = self._build_index()
+
+    def children(self, idx: int) -> Iterator[int]:
+        """ The indexes of the direct children of the node. """
+        child = idx + 1
+        end = self.ends[idx]
+        while child < end:
+            yield child
+            child = int(self.ends[child])
+
+    def of_type(self, type_: str) -> np.ndarray:
+        """ The indexes of all the nodes of the given type, in render order. """
+        return np.flatnonzero(self.types == type_)
+
+    def attributes(self, idx: int) -> dict[str, str]:
+        """ The attributes of the node. If any are repeated the last value is used. """
+        start, end = self.attribute_offsets[idx], self.attribute_offsets[idx + 1]
+        return dict(zip(self.attribute_names[start:end], self.attribute_values[start:end]))
+
+    def attribute(self, idx: int, name: str) -> Optional[str]:
+        """ The value of the attribute of the node with the given name, or None if it doesn't have one. """
+        for i in range(self.attribute_offsets[idx + 1] - 1, self.attribute_offsets[idx] - 1, -1):
+            if self.attribute_names[i] == name:
+                return self.attribute_values[i]
+        return None
@@ -1,37 +1,28 @@
 from array import array
-from typing import List
 
-from ..NMS.LOOKUPS import REV_SEMANTICS, SERIALIZE_FMT_MAP
-from .formats import ubytes_to_bytes, write_half, write_int_2_10_10_10_rev
+from ..NMS.LOOKUPS import SEMANTICS
+from .formats import np_write_vertex_layout
+from .NMS_Structures.Structures import TkVertexLayout
 
 
-def serialize_vertex_stream(requires: List[int], count: int, **kwargs):
+def serialize_vertex_stream(layout: TkVertexLayout, count: int, **kwargs):
     """
     Return a serialized version of the vertex data
 
     Parameters
     ----------
-    requires
-        A list of required data streams. This will be pre-determined from the
+    layout
+        The layout of the vertex data. This will be pre-determined from the
         entire file so that we don't end up having the stream for one mesh not
         include something.
+    count
+        The number of vertices.
+    kwargs
+        The data for each element of the layout, keyed by the name of its
+        semantic (eg. Vertices, UVs, Normals).
     """
-    data = bytearray()
-    if count != 0:
-        for i in range(count):
-            for stream_type in requires:
-                stream_name = REV_SEMANTICS[stream_type]
-                if SERIALIZE_FMT_MAP[stream_type] == 0:
-                    for val in kwargs[stream_name][i]:        # probably slow!!
-                        data.extend(write_half(val))
-                elif SERIALIZE_FMT_MAP[stream_type] == 1:
-                    data.extend(write_int_2_10_10_10_rev(kwargs[stream_name][i]))
-                elif SERIALIZE_FMT_MAP[stream_type] == 2:
-                    data.extend(ubytes_to_bytes(kwargs[stream_name][i]))
-        return data
-    else:
-        # return empty data
-        return b''
+    streams = {SEMANTICS[name]: stream for name, stream in kwargs.items()}
+    return np_write_vertex_layout(layout, count, streams).tobytes()
 
 
 def serialize_index_stream(indexes: array) -> bytes:
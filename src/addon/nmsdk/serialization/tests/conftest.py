@@ -0,0 +1,17 @@
+import os.path as op
+import sys
+
+import pytest
+
+# Make the serialization code importable as a package without importing the blender addon itself.
+_nmsdk_dir = op.dirname(op.dirname(op.dirname(op.abspath(__file__))))
+if _nmsdk_dir not in sys.path:
+    sys.path.insert(0, _nmsdk_dir)
+
+
+@pytest.fixture
+def lists():
+    """ Read lists as python lists so that structs can be compared directly. """
+    from serialization.NMS_Structures.NMS_types import python_lists
+    with python_lists():
+        yield
@@ -0,0 +1,106 @@
+import struct
+from io import BytesIO
+
+import pytest
+from serialization.cereal_bin.buffers import buffer_view
+from serialization.NMS_Structures import MBINHeader
+from serialization.NMS_Structures.NMS_types import Quaternion_list
+from serialization.NMS_Structures.Structures import (
+    NAMEHASH_MAPPING,
+    TkGeometryData,
+    TkJointBindingData,
+    TkMeshMetaData,
+    TkVertexElement,
+    TkVertexLayout,
+)
+
+from .test_codec import make_material, make_scene
+
+
+def make_geometry() -> TkGeometryData:
+    layout = TkVertexLayout(
+        [TkVertexElement(0, 0x140B, 0, 0, 0, 4), TkVertexElement(0, 0x140B, 0, 8, 1, 4)],
+        0,
+        2,
+        0x10,
+    )
+    return TkGeometryData(
+        PositionVertexLayout=layout,
+        VertexLayout=layout,
+        BoundHullVertEd=[3],
+        BoundHullVerts=[(0.0, 1.0, 2.0, 1.0), (3.0, 4.0, 5.0, 1.0)],
+        BoundHullVertSt=[0],
+        IndexBuffer=list(range(12)),
+        JointBindings=[TkJointBindingData([0.5] * 16, [0.25] * 4, [1.0] * 3, [2.0] * 3)],
+        JointExtents=[],
+        JointMirrorAxes=[],
+        JointMirrorPairs=[],
+        MeshAABBMax=[(1.0, 1.0, 1.0, 1.0)],
+        MeshAABBMin=[(-1.0, -1.0, -1.0, 1.0)],
+        MeshBaseSkinMat=[0],
+        MeshVertREnd=[11],
+        MeshVertRStart=[0],
+        ProcGenNodeNames=["NODE_A", "NODE_B"],
+        ProcGenParentId=[-1, 0],
+        SkinMatrixLayout=[],
+        StreamMetaDataArray=[TkMeshMetaData("MESH", 0x10, 0, 0x18, 0x18, 0x40, 0x58, 0x20, False)],
+        CollisionIndexCount=0,
+        IndexCount=12,
+        Indices16Bit=1,
+        VertexCount=4,
+    )
+
+
+@pytest.mark.parametrize("obj", [make_scene(), make_material(), make_geometry()])
+def test_from_buffer_matches_read(obj, lists):
+    """ Reading from a memoryview should give the same object as reading from a stream. """
+    data = obj.write().getvalue()
+    cls = type(obj)
+    assert cls.from_buffer(data) == cls.read(BytesIO(data)) == obj
+    # The struct may also start part way into the buffer.
+    assert cls.from_buffer(bytes(0x20) + data, 0x20) == obj
+
+
+def test_quaternion_list_from_buffer(lists):
+    values = [(0x3FFF, 0x0001, 0x8000), (0xFFFF, 0x7FFF, 0x4000), (0x1234, 0xC321, 0x0F0F)]
+    payload = b"".join(struct.pack("<HHH", *v) for v in values)
+    data = struct.pack("<QII", 0x10, 3 * len(values), 0xAAAAAA01) + payload
+    expected = Quaternion_list.deserialize(BytesIO(data))
+    assert Quaternion_list.deserialize_from(memoryview(data), 0) == (expected, 0x10)
+
+
+@pytest.mark.parametrize("kind", ["path", "file", "bytesio", "bytes"])
+def test_buffer_view(tmp_path, kind):
+    geometry = make_geometry()
+    header = MBINHeader(header_namehash=NAMEHASH_MAPPING["TkGeometryData"])
+    data = header.write().getvalue() + geometry.write().getvalue()
+    path = tmp_path / "TEST.GEOMETRY.MBIN"
+    path.write_bytes(data)
+
+    def check(source):
+        with buffer_view(source) as view:
+            assert MBINHeader.from_buffer(view) == header
+            # Compare the written data since the lists are read as arrays.
+            read = TkGeometryData.from_buffer(view, MBINHeader._size)
+            assert read.write().getvalue() == geometry.write().getvalue()
+
+    if kind == "path":
+        check(str(path))
+    elif kind == "file":
+        with open(path, "rb") as f:
+            f.seek(0x10)
+            check(f)
+    elif kind == "bytesio":
+        buf = BytesIO(data)
+        check(buf)
+        # The buffer must be released so that the BytesIO can be resized again.
+        buf.write(b"\x00")
+    else:
+        check(data)
+
+
+def test_buffer_view_empty_file(tmp_path):
+    path = tmp_path / "EMPTY.MBIN"
+    path.write_bytes(b"")
+    with buffer_view(path) as view:
+        assert len(view) == 0
@@ -0,0 +1,129 @@
+from io import BytesIO
+
+import pytest
+from serialization.cereal_bin import structdata
+from serialization.cereal_bin.codec import Delegate, Run
+from serialization.NMS_Structures.Structures import (
+    TkJointBindingData,
+    TkMaterialData,
+    TkMaterialSampler,
+    TkMaterialUniform_Float,
+    TkSceneNodeAttributeData,
+    TkSceneNodeData,
+    TkTransformData,
+)
+
+
+@pytest.fixture
+def walk():
+    """ Use the reflective annotation walk instead of the codec plans. """
+    structdata.CODEC_ENGINE = "walk"
+    yield
+    structdata.CODEC_ENGINE = "plan"
+
+
+def make_scene(depth: int = 2, idx: int = 0) -> TkSceneNodeData:
+    return TkSceneNodeData(
+        Attributes=[
+            TkSceneNodeAttributeData("GEOMETRY", f"MODELS/TEST{idx}.GEOMETRY.MBIN"),
+            TkSceneNodeAttributeData("BATCHSTART", str(idx)),
+        ],
+        Children=[make_scene(depth - 1, 3 * idx + i + 1) for i in range(3)] if depth else [],
+        Name=f"Node{idx}",
+        Type="MESH",
+        Transform=TkTransformData(1.5, 2, 3, TransZ=-4),
+        NameHash=idx,
+        PlatformExclusion=1,
+    )
+
+
+def make_material() -> TkMaterialData:
+    return TkMaterialData(
+        Flags=[],
+        FxFlags=[],
+        Link="",
+        Metamaterial="",
+        Name="TESTMAT",
+        Samplers=[
+            TkMaterialSampler("", "TEXTURES/TEST.DDS", "gDiffuseMap", 0, 1, 2, False, True, True, True),
+        ],
+        Shader="SHADERS/UBERSHADER.SHADER.BIN",
+        Uniforms_Float=[
+            TkMaterialUniform_Float((1.0, 2.0, 3.0, 4.0), [(0.5, 0.5, 0.5, 0.5)], "gMaterialColourVec4"),
+        ],
+        Uniforms_UInt=[],
+        ShaderMillDataHash=-12345,
+        TransparencyLayerID=-1,
+        Class="Opaque",
+        CastShadow=True,
+        CreateFur=False,
+        DisableZTest=False,
+        EnableLodFade=True,
+    )
+
+
+@pytest.mark.parametrize("obj", [make_scene(), make_material()])
+def test_plan_matches_walk(obj, walk, lists):
+    """ Ensure the codec plans produce the same bytes and objects as the reflective walk. """
+    walked = obj.write().getvalue()
+    walk_read = type(obj).read(BytesIO(walked))
+    structdata.CODEC_ENGINE = "plan"
+    planned = obj.write().getvalue()
+    assert planned == walked
+    assert type(obj).read(BytesIO(planned)) == walk_read == obj
+
+
+def test_merged_runs():
+    """ Adjacent fixed-size fields should be merged into a single struct with the padding resolved. """
+    steps = TkTransformData._codec_plan().steps
+    assert len(steps) == 1 and isinstance(steps[0], Run)
+    assert steps[0].struct.size == 0x24
+
+    steps = TkJointBindingData._codec_plan().steps
+    assert len(steps) == 1
+    assert steps[0].struct.size == 0x68
+
+    # Attribute name is a fixed string, then a 8-byte aligned variable size string.
+    steps = TkSceneNodeAttributeData._codec_plan().steps
+    assert [type(s) for s in steps] == [Run, Delegate]
+    assert TkSceneNodeAttributeData._codec_plan().extent == 0x20
+
+
+def test_plan_is_cached():
+    plan = TkSceneNodeData._codec_plan()
+    make_scene(0).write()
+    assert TkSceneNodeData._codec_plan() is plan
+    # Subclasses get their own plan.
+
+    class Sub(TkTransformData):
+        pass
+    assert Sub._codec_plan() is not TkTransformData._codec_plan()
+    assert Sub._codec_plan().cls is Sub
+
+
+def test_layout():
+    layout = TkTransformData.layout()
+    assert layout.alignment == 4
+    assert layout.size == TkTransformData.total_size() == 0x24
+    assert layout.fixed
+    assert layout.offsets["RotX"] == 0 and layout.offsets["TransZ"] == 0x20
+    assert TkTransformData.layout() is layout
+
+    assert TkJointBindingData.layout().fixed
+    assert TkJointBindingData.total_size() == 0x68
+
+    layout = TkSceneNodeAttributeData.layout()
+    assert not layout.fixed
+    assert layout.alignment == 8
+    assert dict(layout.offsets) == {"Name": 0, "Value": 0x10}
+    assert layout.size == 0x20
+
+    layout = TkSceneNodeData.layout()
+    assert not layout.fixed
+    assert layout.offsets["Transform"] == 0x40
+    assert layout.size == 0x70
+
+
+@pytest.mark.parametrize("obj", [make_scene(), make_material()])
+def test_instance_size(obj):
+    assert obj.size == len(obj.write().getvalue())
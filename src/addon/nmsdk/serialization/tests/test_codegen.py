@@ -0,0 +1,55 @@
+from io import BytesIO
+
+import pytest
+from serialization.cereal_bin import structdata
+from serialization.cereal_bin.codegen import get_generated
+from serialization.NMS_Structures.Structures import (
+    TkSceneNodeAttributeData,
+    TkSceneNodeData,
+    TkTransformData,
+)
+
+from .test_buffers import make_geometry
+from .test_codec import make_material, make_scene
+
+
+@pytest.fixture
+def codegen():
+    """ Use the generated functions instead of the codec plans. """
+    structdata.CODEC_ENGINE = "codegen"
+    yield
+    structdata.CODEC_ENGINE = "plan"
+
+
+@pytest.mark.parametrize("obj", [make_scene(), make_material(), make_geometry()])
+def test_codegen_matches_plan(obj, lists):
+    planned = obj.write().getvalue()
+    plan_read = type(obj).read(BytesIO(planned))
+    structdata.CODEC_ENGINE = "codegen"
+    try:
+        generated = obj.write().getvalue()
+        assert generated == planned
+        assert type(obj).read(BytesIO(generated)) == plan_read
+        assert type(obj).from_buffer(generated) == plan_read
+    finally:
+        structdata.CODEC_ENGINE = "plan"
+
+
+def test_generated_source():
+    """ The formats and offsets should be inlined into the generated source. """
+    source = get_generated(TkSceneNodeData).source
+    # The Transform is a sub-struct at a fixed offset which is read with its own generated function.
+    assert "offset + 64)" in source
+    assert "NameHash" in source
+    assert get_generated(TkSceneNodeData) is get_generated(TkSceneNodeData)
+    # Every field of the transform is unpacked by a single struct.
+    assert get_generated(TkTransformData).source.count("_S0(") == 1
+
+
+def test_generated_traceback(codegen):
+    """ Errors in the generated code should point to the line of the field being written. """
+    obj = TkSceneNodeAttributeData("GEOMETRY", 1234)
+    obj.Name = None
+    with pytest.raises(AttributeError) as e:
+        obj.write()
+    assert "obj.Name.encode" in str(e.traceback[-1].statement)
@@ -0,0 +1,105 @@
+from io import BytesIO
+
+import numpy as np
+import pytest
+from serialization.cereal_bin.buffers import buffer_view
+from serialization.NMS_Structures.NMS_types import DeferredList, python_lists
+from serialization.NMS_Structures.Structures import TkGeometryData, TkJointExtentData
+
+from .test_buffers import make_geometry
+
+
+@pytest.fixture
+def geometry() -> TkGeometryData:
+    geometry = make_geometry()
+    geometry.JointExtents = [
+        TkJointExtentData([i, 0.0, 0.0], [1.0, 1.0, 1.0], [-1.0, -1.0, -1.0], [0.5, 0.5, 0.5])
+        for i in range(4)
+    ]
+    geometry.ProcGenNodeNames = ["NODE_A", "NODE_BB", "NODE_CCC"]
+    return geometry
+
+
+def test_deferred_fields(geometry):
+    data = geometry.write().getvalue()
+    # Read lists of structs as lists so that the elements are read individually.
+    with python_lists():
+        read = TkGeometryData.from_buffer(data)
+    assert isinstance(read.JointExtents, DeferredList)
+    assert isinstance(read.MeshAABBMax, DeferredList)
+    # Fields without deferred loading are read as normal.
+    assert isinstance(read.IndexBuffer, list)
+    # Empty lists are never deferred.
+    assert read.JointMirrorAxes == []
+
+    assert len(read.JointExtents) == 4
+    assert read.JointExtents[2] == geometry.JointExtents[2]
+    assert read.JointExtents[-1] == geometry.JointExtents[-1]
+    assert read.ProcGenNodeNames[1] == "NODE_BB"
+    assert not read.JointExtents.loaded
+    with pytest.raises(IndexError):
+        read.JointExtents[4]
+
+    # Changes made to elements read individually are kept once the whole list is loaded.
+    read.JointExtents[1].JointExtentCenter = [5.0, 5.0, 5.0]
+    assert list(read.JointExtents)[1].JointExtentCenter == [5.0, 5.0, 5.0]
+    assert read.JointExtents.loaded
+    read.JointExtents[1].JointExtentCenter = [1.0, 0.0, 0.0]
+
+    assert np.array_equal(read.MeshAABBMax, [(1.0, 1.0, 1.0, 1.0)])
+    assert read.write().getvalue() == data
+
+
+def test_deferred_write_without_loading(geometry):
+    data = geometry.write().getvalue()
+    assert TkGeometryData.from_buffer(data).write().getvalue() == data
+
+
+def test_deferred_equality(geometry, lists):
+    read = TkGeometryData.from_buffer(geometry.write().getvalue())
+    assert read == geometry
+
+
+def test_deferred_keeps_list_setting(geometry):
+    data = geometry.write().getvalue()
+    with python_lists():
+        read = TkGeometryData.from_buffer(data)
+    assert read.MeshVertRStart.load() == [0]
+
+
+def test_not_deferred(geometry):
+    data = geometry.write().getvalue()
+    # Reading from a stream or from a partial view loads everything immediately.
+    assert not isinstance(TkGeometryData.read(BytesIO(data)).JointExtents, DeferredList)
+    read, _ = TkGeometryData.read_from(memoryview(bytes(0x10) + data)[0x10:])
+    assert not isinstance(read.JointExtents, DeferredList)
+
+
+def test_deferred_closed_source(geometry, tmp_path):
+    path = tmp_path / "TEST.GEOMETRY.MBIN"
+    path.write_bytes(geometry.write().getvalue())
+    with buffer_view(path) as view:
+        read = TkGeometryData.from_buffer(view)
+        assert read.ProcGenNodeNames[0] == geometry.ProcGenNodeNames[0]
+    with pytest.raises(ValueError, match="is closed"):
+        read.ProcGenNodeNames.load()
+    with pytest.raises(ValueError, match="is closed"):
+        read.MeshAABBMax[0]
+
+
+def test_deferred_closed_bytesio(geometry):
+    data = geometry.write().getvalue()
+    with BytesIO(data) as f, buffer_view(f) as view:
+        read = TkGeometryData.from_buffer(view)
+    # The data of the BytesIO is kept alive by the list.
+    assert isinstance(read.MeshVertRStart, DeferredList)
+    assert list(read.MeshVertRStart.load()) == list(geometry.MeshVertRStart)
+    assert read.ProcGenNodeNames[2] == geometry.ProcGenNodeNames[2]
+    assert read.write().getvalue() == data
+    # The internal buffer of a BytesIO can't be kept, so lists read from it aren't deferred.
+    f = BytesIO(data)
+    with f.getbuffer() as view:
+        read = TkGeometryData.from_buffer(view)
+    f.close()
+    assert not isinstance(read.MeshVertRStart, DeferredList)
+    assert read.write().getvalue() == data
@@ -1,5 +1,9 @@
 import struct
-from formats.half import binary16, _float_from_unsigned16, EXAMPLE_NAN
+
+import numpy as np
+from formats.half import (
+    binary16, bytes_to_half, np_write_half, _float_from_unsigned16, EXAMPLE_NAN
+)
 
 
 def test_wp_half_precision_examples():
@@ -49,3 +53,40 @@ def test_all_bits(N=16):
         f = _float_from_unsigned16(unsigned)
         got = binary16(f)
         assert got == binary or got == EXAMPLE_NAN
+
+
+def test_np_write_half_all_bits():
+    """ Every half should be written as itself. """
+    unsigned = np.arange(2**16, dtype=np.uint16)
+    floats = [_float_from_unsigned16(int(n)) for n in unsigned]
+    got = np_write_half(floats)
+    assert got.dtype == np.dtype("<f2")
+    nan = np.isnan(floats)
+    assert np.array_equal(got.view("<u2")[~nan], unsigned[~nan])
+    assert np.all(np.isnan(got[nan]))
+    assert bytes_to_half(got[~nan].tobytes()) == tuple(f for f, n in zip(floats, nan) if not n)
+
+
+def test_np_write_half_rounding():
+    """ Values are rounded to the nearest half (ties to even), unlike ``binary16`` which truncates. """
+    ulp = 2**-10
+    for f, expected in [
+            (1 + 0.75 * ulp, 1 + ulp),
+            (1 + 0.25 * ulp, 1.),
+            (1 + 0.5 * ulp, 1.),  # tie, to the even significand
+            (1 + 1.5 * ulp, 1 + 2 * ulp),  # tie, to the even significand
+            (-(1 + 0.75 * ulp), -(1 + ulp)),
+            (65519., 65504.),
+            (65520., float('inf')),
+            (1e9, float('inf')),
+            (-1e9, float('-inf'))]:
+        assert bytes_to_half(np_write_half([f]).tobytes()) == (expected, )
+    assert binary16(1 + 0.75 * ulp) == binary16(1.)
+
+    # The rounding should match python's own conversion to halves.
+    values = np.random.default_rng(0).normal(scale=100, size=(1000, 4))
+    expected = b"".join(struct.pack("<e", v) for v in values.flat)
+    assert np_write_half(values).tobytes() == expected
+    values = values.astype(np.float32)
+    expected = b"".join(struct.pack("<e", v) for v in values.flat)
+    assert np_write_half(values).tobytes() == expected
@@ -1,4 +1,5 @@
-from formats import write_int_2_10_10_10_rev, bytes_to_int_2_10_10_10_rev
+import numpy as np
+from formats import write_int_2_10_10_10_rev, bytes_to_int_2_10_10_10_rev, np_write_int_2_10_10_10_rev
 
 
 def test_consistency():
@@ -13,3 +14,22 @@ def test_consistency():
     data = bytes_to_int_2_10_10_10_rev(byte_data)
     assert write_int_2_10_10_10_rev(data) == byte_data
     assert data == [0, 0, 0, 1]
+
+
+def test_np_write_matches_scalar():
+    """ Ensure that the vectorized writer gives exactly the same data as the scalar one.
+    """
+    for byte_data in (b'\xb3\x61\x43\x76', b'\x00\x00\x00\x40'):
+        data = bytes_to_int_2_10_10_10_rev(byte_data)
+        assert np_write_int_2_10_10_10_rev([data]).tobytes() == byte_data
+
+    rng = np.random.default_rng(0)
+    verts = rng.uniform(-1, 1, (1000, 4))
+    # Include the extremes and values which are truncated towards zero.
+    verts[:8, :3] = [[1, -1, 0], [-1, 1, -0.0], [0.5, -0.5, 1 / 511], [-1 / 511, 0.999, -0.999],
+                     [1.5 / 511, -1.5 / 511, 0.5 / 511], [-0.5 / 511, 0, 0], [1, 1, 1], [-1, -1, -1]]
+    expected = b''.join(write_int_2_10_10_10_rev(v) for v in verts.tolist())
+    assert np_write_int_2_10_10_10_rev(verts).tobytes() == expected
+    # Normals only have 3 components and the w component is always written as 1.
+    assert np_write_int_2_10_10_10_rev(verts[:, :3]).tobytes() == expected
+    assert np_write_int_2_10_10_10_rev(verts.tolist()).dtype == np.dtype('<u4')
@@ -0,0 +1,57 @@
+import os
+
+from serialization.mbin_index import MBINIndex, MBINInfo, read_header
+from serialization.NMS_Structures import MBINHeader
+from serialization.NMS_Structures.Structures import NAMEHASH_MAPPING
+
+
+def write_mbin(path, struct: str, guid: int = 0, size: int = 0):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    header = MBINHeader(header_namehash=NAMEHASH_MAPPING[struct], header_guid=guid)
+    path.write_bytes(header.write().getvalue() + bytes(size))
+
+
+def test_read_header():
+    data = MBINHeader(header_namehash=0x1234, header_guid=0x5678).write().getvalue()
+    assert read_header(data) == (0x1234, 0x5678)
+    assert read_header(data[:0x10]) is None
+    assert read_header(bytes(0x20)) is None
+
+
+def test_scan_directory(tmp_path):
+    write_mbin(tmp_path / "MODELS" / "TEST.SCENE.MBIN", "TkSceneNodeData", 1)
+    write_mbin(tmp_path / "MODELS" / "TEST.GEOMETRY.MBIN.PC", "TkGeometryData", 2, 0x1000)
+    write_mbin(tmp_path / "MODELS" / "TEST" / "IDLE.ANIM.MBIN", "TkAnimMetadata", 3, 0x100)
+    write_mbin(tmp_path / ".scene_vfs" / "HIDDEN.MBIN", "TkSceneNodeData")
+    (tmp_path / "MODELS" / "NOT_AN.MBIN").write_bytes(b"not an mbin")
+    (tmp_path / "MODELS" / "TEST.DDS").write_bytes(bytes(0x100))
+
+    index = MBINIndex()
+    assert index.scan_directory(str(tmp_path), workers=2) == 4
+    assert sorted(index.files) == [
+        "MODELS/TEST.GEOMETRY.MBIN.PC", "MODELS/TEST.SCENE.MBIN", "MODELS/TEST/IDLE.ANIM.MBIN"
+    ]
+    info = index["MODELS/TEST/IDLE.ANIM.MBIN"]
+    assert info.namehash == NAMEHASH_MAPPING["TkAnimMetadata"]
+    assert info.guid == 3
+    assert info.size == 0x120
+    assert info.pak is None
+    assert index.find("TkAnimMetadata") == ["MODELS/TEST/IDLE.ANIM.MBIN"]
+    large = index.find(min_size=0x100)
+    assert sorted(large) == ["MODELS/TEST.GEOMETRY.MBIN.PC", "MODELS/TEST/IDLE.ANIM.MBIN"]
+    assert index.find("TkGeometryData", min_size=0x1000) == ["MODELS/TEST.GEOMETRY.MBIN.PC"]
+    assert index.find(NAMEHASH_MAPPING["TkSceneNodeData"]) == ["MODELS/TEST.SCENE.MBIN"]
+
+    # Saving and loading gives back the same index.
+    index.save(str(tmp_path / "index.json"))
+    loaded = MBINIndex.load(str(tmp_path / "index.json"))
+    assert loaded.files == index.files
+    assert all(isinstance(info, MBINInfo) for info in loaded.files.values())
+
+    # Only new or modified files are read again, and deleted files are removed.
+    assert loaded.scan_directory(str(tmp_path)) == 1
+    write_mbin(tmp_path / "MODELS" / "TEST.SCENE.MBIN", "TkSceneNodeData", 4, 0x10)
+    os.remove(tmp_path / "MODELS" / "TEST" / "IDLE.ANIM.MBIN")
+    assert loaded.scan_directory(str(tmp_path)) == 2
+    assert sorted(loaded.files) == ["MODELS/TEST.GEOMETRY.MBIN.PC", "MODELS/TEST.SCENE.MBIN"]
+    assert loaded["MODELS/TEST.SCENE.MBIN"].guid == 4
@@ -0,0 +1,195 @@
+import struct
+from io import BytesIO
+from math import sqrt
+
+import numpy as np
+import pytest
+from serialization.cereal_bin import basic_types as bt
+from serialization.NMS_Structures.NMS_types import NMS_list, Quaternion_list, Vector4f, python_lists
+from serialization.NMS_Structures.Structures import (
+    TkAnimMetadata,
+    TkAnimNodeData,
+    TkAnimNodeFrameData,
+    TkGeometryData,
+    TkJointBindingData,
+    TkMeshData,
+    TkMeshMetaData,
+    TkSceneNodeAttributeData,
+    TkVertexElement,
+)
+from serialization.utils import compress_quats, decompress_quat, decompress_quats
+
+from .test_buffers import make_geometry
+
+
+@pytest.fixture(params=["stream", "buffer"])
+def read(request):
+    if request.param == "stream":
+        return lambda cls, data: cls.read(BytesIO(data))
+    return lambda cls, data: cls.from_buffer(data)
+
+
+def test_geometry_arrays(read):
+    geometry = make_geometry()
+    data = geometry.write().getvalue()
+    arrays = read(TkGeometryData, data)
+    assert arrays.IndexBuffer.dtype == np.int32
+    assert arrays.IndexBuffer.tolist() == geometry.IndexBuffer
+    assert arrays.BoundHullVerts.dtype == np.float32
+    assert arrays.BoundHullVerts.shape == (2, 4)
+    assert [tuple(x) for x in arrays.BoundHullVerts.tolist()] == geometry.BoundHullVerts
+    assert arrays.SkinMatrixLayout.shape == (0, )
+    # Lists of structs and strings are unaffected.
+    assert arrays.ProcGenNodeNames == geometry.ProcGenNodeNames
+    # Writing the arrays back gives the same data.
+    assert arrays.write().getvalue() == data
+    # The arrays don't refer to the source data.
+    arrays.IndexBuffer[0] = 100
+    assert arrays.IndexBuffer.flags.owndata
+
+    with python_lists():
+        assert read(TkGeometryData, data) == geometry
+
+
+def test_write_arrays():
+    geometry = make_geometry()
+    data = geometry.write().getvalue()
+    geometry.IndexBuffer = np.arange(12, dtype=np.uint32)
+    geometry.BoundHullVerts = np.array(geometry.BoundHullVerts, dtype=np.float64)
+    assert geometry.write().getvalue() == data
+
+
+def test_write_bytes():
+    """ Byte lists can be written directly from bytes. """
+    mesh = TkMeshData("MESH", b"\x01\x02\x03", bytearray(b"\x04\x05"), 1, 2, 3, 4)
+    data = mesh.write().getvalue()
+    mesh.MeshDataStream = [1, 2, 3]
+    mesh.MeshPositionDataStream = [4, 5]
+    assert mesh.write().getvalue() == data
+    read = TkMeshData.from_buffer(data)
+    assert read.MeshDataStream.dtype == np.uint8
+    assert read.MeshDataStream.tobytes() == b"\x01\x02\x03"
+
+
+def test_array_info():
+    assert NMS_list[bt.int32]._array_info() == (np.dtype("<i4"), 1)
+    assert NMS_list[Vector4f]._array_info() == (np.dtype("<f4"), 4)
+    assert NMS_list[TkMeshData]._array_info() is None
+
+
+def test_struct_dtype():
+    dtype = TkJointBindingData.dtype()
+    assert dtype.itemsize == 0x68
+    assert dtype.names == ("InvBindMatrix", "BindRotate", "BindScale", "BindTranslate")
+    assert dtype["InvBindMatrix"].shape == (16, )
+    assert dtype.fields["BindScale"][1] == 0x50
+
+    dtype = TkVertexElement.dtype()
+    assert dtype.itemsize == 0xC
+    assert dtype["Normalise"] == np.int8
+    # Structs with pointers or strings can't be represented.
+    assert TkMeshMetaData.dtype() is None
+    assert TkSceneNodeAttributeData.dtype() is None
+
+
+def test_struct_lists(read):
+    geometry = make_geometry()
+    data = geometry.write().getvalue()
+    arrays = read(TkGeometryData, data)
+    bindings = arrays.JointBindings
+    assert isinstance(bindings, np.recarray)
+    assert bindings[0].InvBindMatrix.tolist() == geometry.JointBindings[0].InvBindMatrix
+    assert bindings.BindScale.shape == (1, 3)
+    assert [ve.Offset for ve in arrays.VertexLayout.VertexElements] == [0, 8]
+    assert arrays.write().getvalue() == data
+    # Lists of instances and record arrays are written identically.
+    geometry.JointBindings = bindings
+    assert geometry.write().getvalue() == data
+
+
+def test_decompress_quats():
+    """ The vectorized decompression must be identical to the scalar one. """
+    rng = np.random.default_rng(0)
+    data = rng.integers(0, 0x10000, size=(0x10000, 3), dtype=np.uint16)
+    # Include every value of each component.
+    for i in range(3):
+        data[:, i] = np.arange(0x10000)[rng.permutation(0x10000)]
+    quats = decompress_quats(data)
+    assert quats.shape == (0x10000, 4) and quats.dtype == np.float64
+    expected = np.array([decompress_quat(*q) for q in data.tolist()])
+    assert np.array_equal(quats.view(np.uint64), expected.view(np.uint64))
+
+
+def test_decompress_quats_rounding():
+    """ The w component is computed with ``**`` as decompress_quat always has, not by multiplying. """
+    values = [(c - 0x3FFF) * (1 / 0x3FFF) * (1 / sqrt(2)) for c in range(0x8000)]
+    differ = [c for c, value in enumerate(values) if value ** 2 != value * value]
+    data = np.array([(c, 0x3FFF, 0x3FFF) for c in differ], dtype=np.uint16)
+    expected = [sqrt(max(0, 1 - values[c] ** 2)) for c in differ]
+    assert [decompress_quat(*q)[3] for q in data.tolist()] == expected
+    assert decompress_quats(data)[:, 3].tolist() == expected
+
+
+@pytest.mark.parametrize("source", ["stream", "buffer"])
+def test_quaternion_list(source):
+    def read(cls, data):
+        if source == "stream":
+            return cls.deserialize(BytesIO(data))
+        return cls.deserialize_from(memoryview(data), 0)[0]
+
+    values = [(0x3FFF, 0x0001, 0x8000), (0xFFFF, 0x7FFF, 0x4000), (0x1234, 0xC321, 0x0F0F)]
+    payload = b"".join(struct.pack("<HHH", *v) for v in values)
+    data = struct.pack("<QII", 0x10, 3 * len(values), 0xAAAAAA01) + payload
+    quats = read(Quaternion_list, data)
+    assert quats.shape == (3, 4)
+    assert quats.tolist() == [list(decompress_quat(*v)) for v in values]
+    with python_lists():
+        assert read(Quaternion_list, data) == [decompress_quat(*v) for v in values]
+    assert read(Quaternion_list, struct.pack("<QII", 0x10, 0, 0xAAAAAA01)).shape == (0, 4)
+
+
+def unit_quats(count: int) -> np.ndarray:
+    quats = np.random.default_rng(0).normal(size=(count, 4))
+    return quats / np.linalg.norm(quats, axis=1)[:, None]
+
+
+def test_compress_quats():
+    quats = unit_quats(10000)
+    # Include quaternions whose largest component is negative, and each of the basis quaternions.
+    quats[:4] = -np.eye(4)
+    data = compress_quats(quats)
+    assert data.shape == (10000, 3) and data.dtype == np.uint16
+    decoded = decompress_quats(data)
+    # q and -q are the same rotation.
+    error = np.minimum(np.abs(decoded - quats).max(axis=1), np.abs(decoded + quats).max(axis=1))
+    assert error.max() < 1e-4
+    assert np.array_equal(decoded[:4], np.eye(4))
+    # Compressed data which is already canonical is unchanged by a round trip.
+    assert np.array_equal(compress_quats(decoded[:4]), data[:4])
+
+
+def test_anim_metadata():
+    """ Animations can be written as MBIN and read back. """
+    scales = np.ones((2, 4), np.float32)
+    translations = np.zeros((1, 4), np.float32)
+    frames = [TkAnimNodeFrameData(unit_quats(3) * (-1) ** i, scales, translations) for i in range(5)]
+    anim = TkAnimMetadata(
+        StillFrameData=TkAnimNodeFrameData(np.eye(4)[3:], scales, translations),
+        AnimFrameData=frames,
+        NodeData=[TkAnimNodeData("Root", 0, 0, 3), TkAnimNodeData("Joint1", 1, 2, 0)],
+        FrameCount=5,
+        NodeCount=2,
+        Has30HzFrames=True,
+    )
+    data = anim.write().getvalue()
+    for read in (TkAnimMetadata.read(BytesIO(data)), TkAnimMetadata.from_buffer(data)):
+        assert [n.Node for n in read.NodeData] == ["Root", "Joint1"]
+        assert read.FrameCount == 5 and read.Has30HzFrames
+        assert np.array_equal(read.StillFrameData.Rotations, [[0, 0, 0, 1]])
+        for frame, orig in zip(read.AnimFrameData, frames):
+            assert frame.Rotations.shape == (3, 4)
+            assert np.allclose(np.abs((frame.Rotations * orig.Rotations).sum(axis=1)), 1)
+            assert np.array_equal(frame.Scales, orig.Scales)
+        # Writing what was read gives the same data.
+        assert read.write().getvalue() == data
+    assert anim.size == len(data)
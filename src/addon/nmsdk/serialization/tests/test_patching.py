@@ -0,0 +1,127 @@
+from io import BytesIO
+
+import numpy as np
+import pytest
+from serialization.NMS_Structures import MBINHeader
+from serialization.NMS_Structures.Structures import (
+    NAMEHASH_MAPPING,
+    TkGeometryData,
+    TkMaterialData,
+    TkSceneNodeData,
+    TkTransformData,
+)
+from serialization.patching import MBINPatcher
+
+from .test_buffers import make_geometry
+from .test_codec import make_material, make_scene
+
+
+def mbin(obj) -> BytesIO:
+    buf = BytesIO()
+    MBINHeader(header_namehash=NAMEHASH_MAPPING[type(obj).__name__]).write(buf)
+    obj.write(buf)
+    return buf
+
+
+def reread(buf: BytesIO, cls):
+    return cls.from_buffer(buf.getvalue(), MBINHeader._size)
+
+
+def test_fixed_fields(lists):
+    scene = make_scene()
+    buf = mbin(scene)
+    size = len(buf.getvalue())
+    patcher = MBINPatcher(buf)
+    assert patcher.root is TkSceneNodeData
+    assert patcher.get("Children[1].Transform.TransZ") == -4
+    assert patcher.set("Children[1].Transform.TransZ", 10)
+    assert patcher.set("Children[2].Children[0].Transform", TkTransformData(ScaleX=2))
+    assert patcher.set("Children[0].Attributes[1].Name", "BATCHCOUNT")
+    assert patcher.set("Type", "LOCATOR")
+    scene.Children[1].Transform.TransZ = 10
+    scene.Children[2].Children[0].Transform = TkTransformData(ScaleX=2)
+    scene.Children[0].Attributes[1].Name = "BATCHCOUNT"
+    scene.Type = "LOCATOR"
+    assert reread(buf, TkSceneNodeData) == scene
+    # Nothing should have been written beyond the original data.
+    assert len(buf.getvalue()) == size
+    assert buf.getvalue() == mbin(scene).getvalue()
+
+
+def test_strings(lists):
+    scene = make_scene()
+    buf = mbin(scene)
+    size = len(buf.getvalue())
+    patcher = MBINPatcher(buf)
+    assert patcher.get("Children[0].Attributes[0].Value") == "MODELS/TEST1.GEOMETRY.MBIN"
+    # Shorter strings are written in place.
+    assert patcher.set("Children[0].Attributes[0].Value", "MODELS/A.MBIN")
+    assert len(buf.getvalue()) == size
+    # Longer ones are appended.
+    assert not patcher.set("Children[2].Name", "A_MUCH_LONGER_NAME_THAN_BEFORE")
+    assert len(buf.getvalue()) > size
+    assert patcher.set("Name", "")
+    scene.Children[0].Attributes[0].Value = "MODELS/A.MBIN"
+    scene.Children[2].Name = "A_MUCH_LONGER_NAME_THAN_BEFORE"
+    scene.Name = ""
+    assert reread(buf, TkSceneNodeData) == scene
+    # The previous allocation is kept, so a string longer than the new value but no longer than the original
+    # still fits.
+    assert patcher.set("Children[0].Attributes[0].Value", "MODELS/TEST9.GEOMETRY.MBIN")
+    assert patcher.get("Children[0].Attributes[0].Value") == "MODELS/TEST9.GEOMETRY.MBIN"
+
+
+def test_lists():
+    geometry = make_geometry()
+    buf = mbin(geometry)
+    patcher = MBINPatcher(buf)
+    assert patcher.root is TkGeometryData
+    assert patcher.set("IndexBuffer", np.arange(6, dtype=np.int32))
+    assert patcher.get("IndexBuffer").tolist() == list(range(6))
+    assert not patcher.set("BoundHullVerts", np.ones((3, 4), dtype=np.float32))
+    assert patcher.set("JointBindings[0].InvBindMatrix[3]", 7.0)
+    assert patcher.set("MeshVertREnd[0]", 23)
+    assert patcher.set("SkinMatrixLayout", [])
+    result = reread(buf, TkGeometryData)
+    assert result.IndexBuffer.tolist() == list(range(6))
+    assert result.BoundHullVerts.tolist() == [[1.0] * 4] * 3
+    assert list(result.JointBindings[0].InvBindMatrix) == [0.5] * 3 + [7.0] + [0.5] * 12
+    assert list(result.MeshVertREnd) == [23]
+    assert list(result.ProcGenNodeNames) == geometry.ProcGenNodeNames
+    assert result.StreamMetaDataArray == geometry.StreamMetaDataArray
+
+
+def test_errors():
+    patcher = MBINPatcher(mbin(make_material()), TkMaterialData)
+    with pytest.raises(ValueError, match="no field"):
+        patcher.locate("Missing")
+    with pytest.raises(ValueError, match="no field"):
+        patcher.locate("Name.Value")
+    with pytest.raises(IndexError):
+        patcher.locate("Samplers[1]")
+    with pytest.raises(ValueError, match="cannot be indexed"):
+        patcher.locate("Name[0]")
+    with pytest.raises(ValueError, match="longer than"):
+        patcher.set("Class", "A" * 0x21)
+    with pytest.raises(ValueError, match="contain pointers"):
+        patcher.set("Samplers", [])
+
+
+def test_shortened_list_is_reused():
+    buf = mbin(make_geometry())
+    patcher = MBINPatcher(buf)
+    size = len(buf.getvalue())
+    assert patcher.set("IndexBuffer", np.arange(2, dtype=np.int32))
+    assert patcher.get("IndexBuffer").tolist() == [0, 1]
+    # Growing back into the original space, even after emptying the list, doesn't append anything.
+    assert patcher.set("IndexBuffer", [])
+    assert patcher.set("IndexBuffer", np.arange(12, dtype=np.int32))
+    assert len(buf.getvalue()) == size
+    assert reread(buf, TkGeometryData).IndexBuffer.tolist() == list(range(12))
+    # Lists which were appended are reused too.
+    assert not patcher.set("BoundHullVerts", np.ones((3, 4), dtype=np.float32))
+    size = len(buf.getvalue())
+    assert patcher.set("BoundHullVerts", np.zeros((1, 4), dtype=np.float32))
+    assert patcher.set("BoundHullVerts", np.full((3, 4), 2, dtype=np.float32))
+    assert len(buf.getvalue()) == size
+    assert reread(buf, TkGeometryData).BoundHullVerts.tolist() == [[2.0] * 4] * 3
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from serialization.NMS_Structures.Structures import TkSceneNodeAttributeData, TkSceneNodeData, TkTransformData
+from serialization.scene_graph import SceneGraph
+
+
+def make_node(name, type_="LOCATOR", children=(), **attributes):
+    return TkSceneNodeData(
+        Attributes=[TkSceneNodeAttributeData(k, v) for k, v in attributes.items()],
+        Children=list(children),
+        Name=name,
+        Type=type_,
+        Transform=TkTransformData(TransX=len(name), RotY=90),
+        NameHash=0,
+    )
+
+
+def pre_order(node, parent=None):
+    yield node, parent
+    for child in node.Children:
+        yield from pre_order(child, node)
+
+
+@pytest.fixture
+def scene():
+    return make_node("MODELS/TEST", "MODEL", [
+        make_node("Body", "MESH", [
+            make_node("Joint1", "JOINT", [make_node("Joint2", "JOINT")], JOINTINDEX="1"),
+        ], BATCHSTART="0", BATCHCOUNT="36"),
+        make_node("Light", "LIGHT", INTENSITY="100"),
+        make_node("Locator", children=[make_node("Joint3", "JOINT")]),
+    ], GEOMETRY="MODELS/TEST.GEOMETRY.MBIN")
+
+
+def test_columns(scene):
+    graph = SceneGraph(scene)
+    nodes = list(pre_order(scene))
+    assert len(graph) == len(nodes)
+    assert list(graph.names) == [node.Name for node, _ in nodes]
+    assert list(graph.types) == [node.Type for node, _ in nodes]
+    order = [node for node, _ in nodes]
+    assert list(graph.parents) == [-1 if parent is None else order.index(parent) for _, parent in nodes]
+    assert list(graph.transforms["TransX"]) == [len(node.Name) for node, _ in nodes]
+    assert np.all(graph.transforms["RotY"] == 90)
+    assert np.all(graph.transforms["ScaleZ"] == 1)
+    for idx, (node, _) in enumerate(nodes):
+        # The subtree of each node is the range of nodes up to its end.
+        assert list(graph.names[idx:graph.ends[idx]]) == [n.Name for n, _ in pre_order(node)]
+        assert [graph.names[i] for i in graph.children(idx)] == [child.Name for child in node.Children]
+        assert graph.attributes(idx) == {x.Name: x.Value for x in node.Attributes}
+
+
+def test_lookups(scene):
+    graph = SceneGraph(scene)
+    assert list(graph.names[graph.of_type("JOINT")]) == ["Joint1", "Joint2", "Joint3"]
+    assert len(graph.of_type("COLLISION")) == 0
+    assert graph.index("light") == 4
+    assert graph.index("Missing") is None
+    assert graph.attribute(0, "GEOMETRY") == "MODELS/TEST.GEOMETRY.MBIN"
+    assert graph.attribute(1, "BATCHCOUNT") == "36"
+    assert graph.attribute(1, "GEOMETRY") is None
+    graph.rename(0, None)
+    assert graph.names[0] is None
+    assert graph.index("MODELS/TEST") is None
+    graph.rename(4, "Lamp")
+    assert graph.index("LAMP") == 4
+    assert graph.index("Light") is None
+
+
+def test_single_node():
+    graph = SceneGraph(make_node("Root"))
+    assert len(graph) == 1
+    assert list(graph.ends) == [1]
+    assert list(graph.children(0)) == []
+    assert graph.attributes(0) == {}
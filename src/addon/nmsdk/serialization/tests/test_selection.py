@@ -0,0 +1,77 @@
+from io import BytesIO
+
+import pytest
+from serialization.cereal_bin.codec import selection
+from serialization.NMS_Structures.Structures import TkGeometryData, TkMaterialData, TkSceneNodeData
+
+from .test_buffers import make_geometry
+from .test_codec import make_material, make_scene
+
+
+@pytest.fixture(params=["stream", "buffer"])
+def read(request):
+    if request.param == "stream":
+        return lambda cls, data, only: cls.read(BytesIO(data), only=only)
+    return lambda cls, data, only: cls.from_buffer(data, only=only)
+
+
+def test_select_fields(read):
+    geometry = make_geometry()
+    data = geometry.write().getvalue()
+    selected = read(TkGeometryData, data, {"StreamMetaDataArray", "VertexLayout.Stride", "VertexCount"})
+    assert selected.StreamMetaDataArray == geometry.StreamMetaDataArray
+    assert selected.VertexCount == geometry.VertexCount
+    assert selected.VertexLayout.Stride == geometry.VertexLayout.Stride
+    assert selected.VertexLayout.VertexElements is None
+    assert selected.IndexBuffer is None
+    assert selected.PositionVertexLayout is None
+
+
+def test_select_list_elements(read):
+    scene = make_scene()
+    selected = read(TkSceneNodeData, scene.write().getvalue(), ["Attributes", "Children.Attributes", "Name"])
+    assert selected.Name == scene.Name
+    assert selected.Attributes == scene.Attributes
+    assert selected.Transform is None
+    assert len(selected.Children) == 3
+    for child, orig in zip(selected.Children, scene.Children):
+        assert child.Attributes == orig.Attributes
+        assert child.Name is None
+        assert child.Children is None
+
+
+def test_select_material_samplers(read):
+    material = make_material()
+    selected = read(TkMaterialData, material.write().getvalue(), "Samplers.Map")
+    assert [s.Map for s in selected.Samplers] == ["TEXTURES/TEST.DDS"]
+    assert selected.Samplers[0].Name is None
+    assert selected.Name is None
+
+
+def test_select_stream_position():
+    """ The stream should end up after the struct so that anything following it can still be read. """
+    data = make_scene(0).write().getvalue()
+    buf = BytesIO(data)
+    TkSceneNodeData.read(buf, only={"Name"})
+    pos = buf.tell()
+    buf.seek(0)
+    TkSceneNodeData.read(buf, only={"Children"})
+    assert buf.tell() == pos
+
+
+def test_invalid_selection():
+    data = make_scene(0).write().getvalue()
+    with pytest.raises(ValueError):
+        TkSceneNodeData.from_buffer(data, only={"Missing"})
+    with pytest.raises(ValueError):
+        TkSceneNodeData.from_buffer(data, only={"Name.Value"})
+
+
+def test_selection_is_read_only():
+    tree = selection(TkGeometryData, {"VertexLayout.Stride", "IndexBuffer"})
+    assert tree == {"VertexLayout": {"Stride": None}, "IndexBuffer": None}
+    with pytest.raises(TypeError):
+        tree["IndexBuffer"] = {}
+    with pytest.raises(TypeError):
+        tree["VertexLayout"]["PlatformData"] = None
+    assert selection(TkGeometryData, ["IndexBuffer", "VertexLayout.Stride"]) is tree
@@ -0,0 +1,120 @@
+import mmap
+
+import numpy as np
+import pytest
+from serialization import StreamCompiler
+from serialization.StreamCompiler import StreamData, merge_streams
+
+
+@pytest.fixture
+def stream_file(tmp_path):
+    fname = str(tmp_path / "TEST.GEOMETRY.DATA.MBIN.PC")
+    data = StreamData(fname)
+    verts = [np.arange(i * 16, (i + 1) * 16, dtype=np.uint8).tobytes() for i in range(3)]
+    indexes = [np.arange(i, i + 6, dtype=np.uint16).tobytes() for i in range(3)]
+    data.create({f"MESH{i}": {"hash": i} for i in range(3)}, verts, indexes)
+    data.save()
+    return fname, verts, indexes
+
+
+def test_lazy_read(stream_file):
+    fname, verts, indexes = stream_file
+    eager = StreamData(fname)
+    eager.read()
+    assert eager.vertex_data == verts
+    assert eager.index_data == indexes
+
+    with StreamData(fname) as lazy:
+        lazy.read(lazy=True)
+        assert lazy.count == 3
+        assert [m.hash for m in lazy.metadata] == [0, 1, 2]
+        # The data is a view into the mapped file rather than a copy.
+        assert all(isinstance(view, memoryview) for view in lazy.vertex_data + lazy.index_data)
+        assert isinstance(lazy.vertex_data[0].obj, mmap.mmap)
+        assert [bytes(view) for view in lazy.vertex_data] == verts
+        assert [bytes(view) for view in lazy.index_data] == indexes
+        assert lazy.index_array(2).tolist() == list(range(2, 8))
+        assert lazy.vertex_array(1, np.uint32).tobytes() == verts[1]
+        with pytest.raises(ValueError, match="memory-mapped"):
+            lazy.save()
+        # The lazily read data can be written out again.
+        lazy.fname = fname + ".copy"
+        lazy.save()
+    assert lazy.vertex_data == []
+    with open(fname, "rb") as f, open(fname + ".copy", "rb") as g:
+        assert f.read() == g.read()
+
+
+def test_close_with_arrays(stream_file):
+    fname, verts, _ = stream_file
+    lazy = StreamData(fname)
+    lazy.read(lazy=True)
+    arr = lazy.vertex_array(0)
+    # The file stays mapped while arrays still refer to it.
+    lazy.close()
+    assert arr.tobytes() == verts[0]
+
+
+def make_stream(fname, n, sizes):
+    data = StreamData(fname)
+    rng = np.random.default_rng(n)
+    verts = [rng.integers(0, 256, size, dtype=np.uint8).tobytes() for size in sizes]
+    indexes = [rng.integers(0, 256, size // 4, dtype=np.uint8).tobytes() for size in sizes]
+    data.create({f"STREAM{n}_MESH{i}": {"hash": n * 100 + i} for i in range(len(sizes))}, verts, indexes)
+    data.save()
+    return fname
+
+
+@pytest.mark.parametrize("fast_copies", [True, False])
+def test_merge_streams(tmp_path, monkeypatch, fast_copies):
+    if not fast_copies:
+        monkeypatch.setattr(StreamCompiler, "_FAST_COPIES", [])
+        monkeypatch.setattr(StreamCompiler, "COPY_CHUNK_SIZE", 100)
+    fnames = [
+        make_stream(str(tmp_path / f"{n}.DATA"), n, [64 * (i + 1) for i in range(n + 1)]) for n in range(4)
+    ]
+    # Build the expected result in memory.
+    combined = None
+    for fname in fnames:
+        data = StreamData(fname)
+        data.read()
+        combined = data if combined is None else combined + data
+    combined.fname = str(tmp_path / "EXPECTED.DATA")
+    combined.save()
+
+    out = str(tmp_path / "MERGED.DATA")
+    metadata = merge_streams(fnames, out)
+    assert [m.hash for m in metadata] == [n * 100 + i for n in range(4) for i in range(n + 1)]
+    with open(out, "rb") as f, open(combined.fname, "rb") as g:
+        assert f.read() == g.read()
+
+    merged = StreamData(out)
+    merged.read()
+    assert merged.count == 10
+    assert merged.vertex_data == combined.vertex_data
+
+
+def test_merge_errors(tmp_path, stream_file):
+    fname, _, _ = stream_file
+    with pytest.raises(ValueError, match="No geometry streams"):
+        merge_streams([], str(tmp_path / "MERGED.DATA"))
+    # Truncate the data of the last mesh.
+    with open(fname, "r+b") as f:
+        f.truncate(f.seek(0, 2) - 1)
+    with pytest.raises(ValueError, match="shorter"):
+        merge_streams([fname], str(tmp_path / "MERGED.DATA"))
+
+
+def test_merge_into_source(tmp_path):
+    fnames = [make_stream(str(tmp_path / f"{n}.DATA"), n, [64, 128]) for n in range(2)]
+    with open(fnames[0], "rb") as f:
+        original = f.read()
+    with pytest.raises(ValueError, match="being merged"):
+        merge_streams(fnames, fnames[0])
+    # The same file under a different path is also caught.
+    link = tmp_path / "LINK.DATA"
+    link.hardlink_to(fnames[0])
+    with pytest.raises(ValueError, match="being merged"):
+        merge_streams(fnames, str(link))
+    with open(fnames[0], "rb") as f:
+        assert f.read() == original
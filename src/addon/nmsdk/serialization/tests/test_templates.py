@@ -0,0 +1,77 @@
+import struct
+from io import BytesIO
+
+import pytest
+from serialization.cereal_bin import structdata
+from serialization.NMS_Structures.Structures import (
+    NAMEHASH_MAPPING,
+    LinkableNMSTemplate,
+    TkAttachmentData,
+    TkModelDescriptorList,
+    TkResourceDescriptorData,
+    TkResourceDescriptorList,
+    TkTransformData,
+)
+
+from .test_codec import make_material, make_scene
+
+
+def make_descriptor(depth: int = 2) -> TkModelDescriptorList:
+    """ A descriptor where each part has another descriptor as its child. """
+    descriptors = []
+    for idx in range(2):
+        children = [make_descriptor(depth - 1)] if depth else []
+        name = f"_PART_{depth}{idx}"
+        descriptors.append(
+            TkResourceDescriptorData(name, children, [f"MODELS/{name}.SCENE.MBIN"], 0.0, name.title())
+        )
+    return TkModelDescriptorList([TkResourceDescriptorList(descriptors, f"_TYPE{depth}")])
+
+
+@pytest.fixture(params=["plan", "codegen"])
+def engine(request):
+    structdata.CODEC_ENGINE = request.param
+    yield
+    structdata.CODEC_ENGINE = "plan"
+
+
+def test_descriptor(engine, lists):
+    descriptor = make_descriptor()
+    data = descriptor.write().getvalue()
+    assert TkModelDescriptorList.read(BytesIO(data)) == descriptor
+    assert TkModelDescriptorList.from_buffer(data) == descriptor
+    assert descriptor.size == len(data)
+
+
+def test_template_header():
+    descriptor = make_descriptor(1)
+    data = descriptor.write().getvalue()
+    child = descriptor.List[0].Descriptors[0]
+    # The Children list of the first descriptor data comes after the header of the descriptor lists, the
+    # descriptor list and the Id of the descriptor data.
+    pos = 0x10 + 0x20 + 0x20
+    offset, count, _ = struct.unpack_from("<QII", data, pos)
+    assert count == 1
+    pos += offset
+    offset, namehash, end = struct.unpack_from("<QII", data, pos)
+    assert namehash == NAMEHASH_MAPPING["TkModelDescriptorList"]
+    assert end == 0xEEEEEE01
+    assert (pos + offset) % 8 == 0
+    assert TkModelDescriptorList.from_buffer(data, pos + offset) == child.Children[0]
+
+
+def test_attachment(engine, lists):
+    attachment = TkAttachmentData(
+        AdditionalData=[make_material(), None, make_scene(1)],
+        Components=[LinkableNMSTemplate(make_descriptor(0), ""), LinkableNMSTemplate(None, "LINKED")],
+    )
+    data = attachment.write().getvalue()
+    read = TkAttachmentData.read(BytesIO(data))
+    assert read == attachment
+    assert TkAttachmentData.from_buffer(data) == attachment
+    assert list(read.iter_attachments(TkModelDescriptorList)) == [attachment.Components[0].Template]
+
+
+def test_unknown_template():
+    with pytest.raises(ValueError, match="TkTransformData"):
+        TkAttachmentData([TkTransformData()], []).write()
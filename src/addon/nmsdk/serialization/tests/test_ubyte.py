@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+from formats import np_write_ubytes, ubytes_to_bytes
+
+
+def test_np_write_matches_scalar():
+    """ Ensure that the vectorized writer gives exactly the same data as the scalar one.
+    """
+    rng = np.random.default_rng(0)
+    for width in (1, 3, 4):
+        colours = [tuple(v) for v in rng.integers(0, 256, (100, width)).tolist()]
+        expected = b''.join(ubytes_to_bytes(c) for c in colours)
+        assert np_write_ubytes(colours).tobytes() == expected
+        assert np_write_ubytes(np.array(colours, np.int32)).tobytes() == expected
+    assert np_write_ubytes([(1, 2)], 2).tobytes() == ubytes_to_bytes([1, 2], 2)
+
+
+def test_np_write_errors():
+    with pytest.raises(ValueError, match='Target length'):
+        np_write_ubytes([(1, 2, 3, 4, 5)])
+    with pytest.raises(ValueError, match='range'):
+        np_write_ubytes([(0, 256, 0)])
+    with pytest.raises(ValueError, match='range'):
+        np_write_ubytes([(0, -1, 0)])
@@ -0,0 +1,139 @@
+import numpy as np
+import pytest
+from serialization.formats import (
+    np_write_blend_data,
+    np_write_vertex_layout,
+    ubytes_to_bytes,
+    vertex_dtype,
+    write_half,
+    write_int_2_10_10_10_rev,
+)
+from serialization.formats.vertex_layout import GL_HALF_FLOAT, GL_INT_2_10_10_10_REV, GL_UNSIGNED_BYTE
+from serialization.NMS_Structures.Structures import TkVertexElement, TkVertexLayout
+
+VERTS, UVS, NORMS, TANGS, COLOURS, BLENDINDEX, BLENDWEIGHT = range(7)
+
+
+def make_layout(elements, stride):
+    return TkVertexLayout(
+        VertexElements=[
+            TkVertexElement(SemanticID=sid, Size=4, Type=type_, Offset=offset, Normalise=0, Instancing=0)
+            for sid, type_, offset in elements
+        ],
+        PlatformData=0,
+        ElementCount=len(elements),
+        Stride=stride,
+    )
+
+
+# The layouts as created by the exporter.
+POSITION_LAYOUT = make_layout([(VERTS, GL_HALF_FLOAT, 0), (UVS, GL_HALF_FLOAT, 8)], 0x10)
+VERTEX_LAYOUT = make_layout(
+    [(NORMS, GL_INT_2_10_10_10_REV, 0), (TANGS, GL_INT_2_10_10_10_REV, 4), (COLOURS, GL_UNSIGNED_BYTE, 8)],
+    0xC,
+)
+
+
+def make_streams(count):
+    rng = np.random.default_rng(0)
+
+    def halves(size):
+        # Use values which are exact halves as the vectorized version rounds differently.
+        values = rng.uniform(-10, 10, (count, size)).astype(np.float16).astype(float)
+        return [tuple(v) for v in values.tolist()]
+
+    def normals():
+        return [tuple(v) + (1, ) for v in rng.uniform(-1, 1, (count, 3)).tolist()]
+
+    return {
+        VERTS: halves(4),
+        UVS: halves(4),
+        NORMS: normals(),
+        TANGS: normals(),
+        COLOURS: [tuple(v) for v in rng.integers(0, 256, (count, 3)).tolist()],
+    }
+
+
+def write_per_vertex(requires, count, streams):
+    """ Write the vertex data one value at a time as the exporter used to. """
+    data = bytearray()
+    for i in range(count):
+        for sid in requires:
+            if sid in (VERTS, UVS):
+                for val in streams[sid][i]:
+                    data.extend(write_half(val))
+            elif sid in (NORMS, TANGS):
+                data.extend(write_int_2_10_10_10_rev(streams[sid][i]))
+            else:
+                data.extend(ubytes_to_bytes(streams[sid][i]))
+    return bytes(data)
+
+
+@pytest.mark.parametrize("count", [1, 100])
+def test_matches_per_vertex(count):
+    streams = make_streams(count)
+    for layout, requires in ((POSITION_LAYOUT, [VERTS, UVS]), (VERTEX_LAYOUT, [NORMS, TANGS, COLOURS])):
+        arr = np_write_vertex_layout(layout, count, streams)
+        assert arr.dtype.itemsize == layout.Stride
+        assert arr.tobytes() == write_per_vertex(requires, count, streams)
+
+
+def test_dtype():
+    dtype = vertex_dtype(VERTEX_LAYOUT)
+    assert dtype.names == ("2", "3", "4")
+    assert dtype.fields["4"] == (np.dtype(("u1", (4, ))), 8)
+    # Gaps between the elements are left as zeros.
+    layout = make_layout([(NORMS, GL_INT_2_10_10_10_REV, 4)], 0xC)
+    data = np_write_vertex_layout(layout, 2, {NORMS: [(0, 0, 0, 1)] * 2}).tobytes()
+    assert data == (bytes(4) + b"\x00\x00\x00\x40" + bytes(4)) * 2
+
+
+def test_empty():
+    assert np_write_vertex_layout(VERTEX_LAYOUT, 0, {}).tobytes() == b""
+    assert np_write_vertex_layout(make_layout([], 0), 3, {}).tobytes() == b""
+    with pytest.raises(ValueError, match="Unsupported"):
+        vertex_dtype(make_layout([(NORMS, 5126, 0)], 0x10))
+
+
+def test_blend_data():
+    indices = [[3, 1, 7, 2, 5], [4, 0, 0, 0, 0], [0, 0, 0, 0, 0]]
+    weights = [[0.1, 0.5, 0.2, 0.05, 0.15], [2, 0, 0, 0, 0], [0, 0, 0, 0, 0]]
+    blend_indices, blend_weights = np_write_blend_data(indices, weights)
+    assert blend_indices.dtype == np.uint8
+    assert blend_weights.dtype == np.dtype("<f2")
+    # Only the 4 largest influences are kept, and unused ones are zeroed.
+    assert blend_indices.tolist() == [[1, 7, 5, 3], [4, 0, 0, 0], [0, 0, 0, 0]]
+    expected = np.array([[0.5, 0.2, 0.15, 0.1], [1, 0, 0, 0], [0, 0, 0, 0]])
+    expected[0] /= 0.95
+    assert blend_weights.tolist() == expected.astype(np.float16).tolist()
+    # Vertices with fewer influences are padded.
+    blend_indices, blend_weights = np_write_blend_data([[2, 1]], [[0.25, 0.75]])
+    assert blend_indices.tolist() == [[1, 2, 0, 0]]
+    assert blend_weights.tolist() == [[0.75, 0.25, 0, 0]]
+    with pytest.raises(ValueError, match="same shape"):
+        np_write_blend_data([[0, 1]], [[1]])
+
+
+def test_skinned_layout():
+    count = 10
+    streams = make_streams(count)
+    rng = np.random.default_rng(1)
+    streams[BLENDINDEX], streams[BLENDWEIGHT] = np_write_blend_data(
+        rng.integers(0, 40, (count, 6)), rng.random((count, 6))
+    )
+    elements = [
+        (NORMS, GL_INT_2_10_10_10_REV, 0), (BLENDINDEX, GL_UNSIGNED_BYTE, 4), (BLENDWEIGHT, GL_HALF_FLOAT, 8)
+    ]
+    layout = make_layout(elements, 0x10)
+    data = np_write_vertex_layout(layout, count, streams).tobytes()
+    expected = b"".join(
+        write_int_2_10_10_10_rev(streams[NORMS][i])
+        + streams[BLENDINDEX][i].tobytes()
+        + b"".join(write_half(w) for w in streams[BLENDWEIGHT][i].tolist())
+        for i in range(count)
+    )
+    assert data == expected
+    # Elements with no data are left as zeros.
+    del streams[BLENDWEIGHT]
+    data = np_write_vertex_layout(layout, count, streams)
+    assert not data["6"].any()
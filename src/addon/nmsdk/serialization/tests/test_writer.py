@@ -0,0 +1,154 @@
+import gc
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Annotated
+
+from serialization.cereal_bin.codec import get_layout
+from serialization.cereal_bin.structdata import Field, datatype
+from serialization.NMS_Structures.NMS_types import MBINHeader, VariableSizeString
+from serialization.NMS_Structures.Structures import TkGeometryStreamData, TkMeshData
+
+from .test_buffers import make_geometry
+from .test_codec import make_material, make_scene
+
+
+def make_stream_data(idx: int) -> TkGeometryStreamData:
+    return TkGeometryStreamData(
+        [TkMeshData(f"MESH{i}", bytes(range(i + idx)), bytes(i), i, 0, i + idx, i) for i in range(4)]
+    )
+
+
+def test_concurrent_writes():
+    """ Writes running at the same time must not interfere with each other. """
+    objs = [make_scene(2, i) for i in range(4)] + [make_geometry(), make_material()]
+    objs += [make_stream_data(i) for i in range(4)]
+    expected = [obj.write().getvalue() for obj in objs]
+
+    def write(idx: int) -> bytes:
+        return objs[idx % len(objs)].write().getvalue()
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(write, range(20 * len(objs))))
+    for idx, result in enumerate(results):
+        assert result == expected[idx % len(objs)]
+
+
+class Nested(VariableSizeString):
+    """ A string which does another complete write while it is being serialized. """
+    inner = []
+
+    @classmethod
+    def serialize(cls, buf, value):
+        gen = super().serialize(buf, value)
+        next(gen)
+        cls.inner.append(make_material().write().getvalue())
+        yield
+        next(gen, None)
+
+
+@dataclass
+class Plain(datatype):
+    First: Annotated[str, Field(VariableSizeString)]
+    Second: Annotated[str, Field(VariableSizeString)]
+
+
+@dataclass
+class Holder(datatype):
+    First: Annotated[str, Field(Nested)]
+    Second: Annotated[str, Field(VariableSizeString)]
+
+
+def test_nested_write():
+    """ A separate top-level write may happen while serializing another struct. """
+    assert Holder("first", "second").write().getvalue() == Plain("first", "second").write().getvalue()
+    assert Nested.inner == [make_material().write().getvalue()]
+
+
+def test_write_memory_is_released():
+    scene = make_scene(2)
+    for _ in range(10):
+        scene.write()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        for _ in range(200):
+            scene.write()
+        gc.collect()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert after - before < 10_000
+
+
+class Pipe:
+    """ A stream which can only be written to. """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(self.chunks[-1])
+
+    def getvalue(self) -> bytes:
+        return b"".join(self.chunks)
+
+
+def test_write_forward():
+    objs = [make_scene(2), make_geometry(), make_material(), make_stream_data(3), Plain("", "second")]
+    for obj in objs:
+        out = Pipe()
+        size = obj.write_forward(out)
+        assert out.getvalue() == obj.write().getvalue()
+        assert size == len(out.getvalue())
+
+
+def test_write_forward_after_header(tmp_path):
+    """ The alignment is based on the position in the file, so writing after a header must match. """
+    stream_data = make_stream_data(1)
+    expected = BytesIO()
+    MBINHeader().write(expected)
+    stream_data.write(expected)
+
+    path = tmp_path / "TEST.GEOMETRY.DATA.MBIN"
+    with open(path, "wb") as f:
+        MBINHeader().write_forward(f)
+        stream_data.write_forward(f)
+    assert path.read_bytes() == expected.getvalue()
+
+    out = Pipe()
+    MBINHeader().write_forward(out)
+    stream_data.write_forward(out, MBINHeader._size)
+    assert out.getvalue() == expected.getvalue()
+
+
+def test_write_offsets():
+    """ The offsets map the header of each list to the data written for it. """
+    stream_data = make_stream_data(1)
+    offsets = {}
+    data = stream_data.write(offsets=offsets).getvalue()
+    stream_layout = get_layout(TkGeometryStreamData)
+    mesh_layout = get_layout(TkMeshData)
+    mesh_datas_start = offsets[stream_layout.offsets["StreamDataArray"]]
+    for i, mesh_data in enumerate(stream_data.StreamDataArray):
+        entry_start = mesh_datas_start + i * mesh_layout.size
+        for name in ("MeshDataStream", "MeshPositionDataStream"):
+            header = entry_start + mesh_layout.offsets[name]
+            stream = getattr(mesh_data, name)
+            if stream:
+                assert data[offsets[header]:offsets[header] + len(stream)] == stream
+            else:
+                # Empty lists have no data written for them.
+                assert header not in offsets
+
+    # Writing forward after a header gives the positions in the file.
+    out = Pipe()
+    forward_offsets = {}
+    MBINHeader().write_forward(out)
+    stream_data.write_forward(out, MBINHeader._size, offsets=forward_offsets)
+    assert forward_offsets == {
+        header + MBINHeader._size: offset + MBINHeader._size for header, offset in offsets.items()
+    }
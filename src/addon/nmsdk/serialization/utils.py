@@ -1,7 +1,10 @@
 from io import BufferedReader
+from functools import lru_cache
 from struct import pack, unpack
 from math import sqrt
 
+import numpy as np
+
 
 def float_to_hex(num):
     """ Convert a hex value to float. """
@@ -101,7 +104,12 @@ def quat_drop_component(arr):
 
 def bytes_to_quat(data):
     """ Reads a byte array to a quaternion. """
-    c_x, c_y, c_z = unpack('<HHH', data.read(0x6))
+    return decompress_quat(*unpack('<HHH', data.read(0x6)))
+
+
+def decompress_quat(c_x: int, c_y: int, c_z: int):
+    """ Convert the three compressed components of a quaternion to the full
+    quaternion. """
     # Get most significant bit
     i_x = c_x >> 0xF
     i_y = c_y >> 0xF
@@ -129,6 +137,65 @@ def bytes_to_quat(data):
     return (0, 0, 0, 0)
 
 
+# For each dropped component, the order to take the x, y, z and w values in.
+_QUAT_ORDER = np.array([[0, 1, 2, 3], [0, 1, 3, 2], [0, 3, 1, 2], [3, 0, 1, 2]])
+
+
+@lru_cache(maxsize=None)
+def _quat_component_tables() -> tuple[np.ndarray, np.ndarray]:
+    """ The value and square of a quaternion component for each possible 15 bit compressed value.
+
+    These are computed exactly as in decompress_quat. Squaring with ``**`` uses the C pow function, which
+    isn't always correctly rounded, so neither ``x * x`` nor ``np.power`` (which multiplies) would match it.
+    """
+    values = [(c - 0x3FFF) * (1 / 0x3FFF) * (1 / sqrt(2)) for c in range(0x8000)]
+    return np.array(values), np.array([value ** 2 for value in values])
+
+
+def decompress_quats(data: np.ndarray) -> np.ndarray:
+    """ Convert an (N, 3) array of compressed quaternions to an (N, 4) array of the full quaternions.
+
+    This gives exactly the same values as calling ``decompress_quat`` on each row.
+    """
+    data = np.asarray(data, dtype=np.uint16).reshape(-1, 3)
+    dropcomponent = (data[:, 0] >> 0xF) << 1 | (data[:, 1] >> 0xF)
+    # Strip the most significant bit and look up the quaternion components.
+    values, squares = _quat_component_tables()
+    stripped = data & 0x7FFF
+    comps = np.empty((len(data), 4), dtype=np.float64)
+    comps[:, :3] = values[stripped]
+    x2, y2, z2 = squares[stripped].T
+    # This is done in the same order as in decompress_quat so that the rounding is identical.
+    w = 1 - x2 - y2 - z2
+    np.sqrt(np.maximum(w, 0, out=w), out=comps[:, 3])
+    return np.take_along_axis(comps, _QUAT_ORDER[dropcomponent], axis=1)
+
+
+# For each dropped component, the indexes of the components which are kept.
+_QUAT_KEEP = np.array([[1, 2, 3], [0, 2, 3], [0, 1, 3], [0, 1, 2]])
+
+
+def compress_quats(quats: np.ndarray) -> np.ndarray:
+    """ Convert an (N, 4) array of unit quaternions to an (N, 3) uint16 array of compressed quaternions.
+
+    This is the inverse of ``decompress_quats``. The largest component of each quaternion is dropped and the
+    other three are stored in 15 bits each, with the index of the dropped component stored in the top bits of
+    the first two. As the dropped component is always reconstructed as positive, quaternions with a negative
+    largest component are negated first, which represents the same rotation.
+    """
+    quats = np.asarray(quats, dtype=np.float64).reshape(-1, 4)
+    drop = np.abs(quats).argmax(axis=1)
+    largest = np.take_along_axis(quats, drop[:, None], axis=1)
+    kept = np.take_along_axis(quats, _QUAT_KEEP[drop], axis=1)
+    kept[largest[:, 0] < 0] *= -1
+    comps = np.rint(kept * (0x3FFF * sqrt(2)) + 0x3FFF)
+    data = np.clip(comps, 0, 0x7FFF).astype(np.uint16)
+    dropcomponent = (3 - drop).astype(np.uint16)
+    data[:, 0] |= (dropcomponent >> 1) << 0xF
+    data[:, 1] |= (dropcomponent & 1) << 0xF
+    return data
+
+
 def quat_to_hex(q):
     """ converts a quaternion to its hexadecimal representation """
     q = [int(0x3FFF * (sqrt(2) * i + 1)) for i in q]